@@ -0,0 +1,909 @@
+"""
+In-process Gmail IMAP stand-in for offline benchmarks.
+
+FakeGmail serves a synthetic corpus and speaks the subset of IMAP4rev1 and
+the Gmail extensions the tools use (UID SEARCH/FETCH/STORE/MOVE, X-GM-THRID,
+X-GM-LABELS, X-GM-RAW, APPEND with APPENDUID, SPECIAL-USE LIST, STATUS).
+Clients are imaplib.IMAP4 subclasses whose socket I/O goes to the server in
+memory, so imaplib's own command formatting and response parsing run
+unchanged; every command (and every literal continuation) counts as one round
+trip and can be delayed by an injected latency. The asyncio client
+(gmail_crew_ai.tools.aio_imap) gets in-memory streams to the same server.
+
+Usage:
+    server = FakeGmail(build_corpus(count=200, thread_depth=3))
+    with server.install():          # patches imaplib.IMAP4_SSL and the asyncio client
+        ...run tools...
+    print(server.stats)
+"""
+import asyncio
+import datetime
+import email
+import email.policy
+import imaplib
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from email.message import Message
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import format_datetime, make_msgid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CAPABILITIES = ("IMAP4rev1 UNSELECT IDLE NAMESPACE QUOTA ID XLIST CHILDREN X-GM-EXT-1 UIDPLUS "
+                "COMPRESS=DEFLATE ENABLE MOVE CONDSTORE ESEARCH UTF8=ACCEPT LIST-EXTENDED "
+                "LIST-STATUS LITERAL- SPECIAL-USE APPENDLIMIT=35651584")
+
+# Gmail's system mailboxes: name -> (LIST attributes, membership test on labels)
+SYSTEM_MAILBOXES = {
+    "INBOX": ("\\HasNoChildren", lambda labels: "\\Inbox" in labels and "\\Trash" not in labels),
+    "[Gmail]/All Mail": ("\\All \\HasNoChildren", lambda labels: "\\Trash" not in labels),
+    "[Gmail]/Drafts": ("\\Drafts \\HasNoChildren", lambda labels: "\\Draft" in labels and "\\Trash" not in labels),
+    "[Gmail]/Sent Mail": ("\\HasNoChildren \\Sent", lambda labels: "\\Sent" in labels and "\\Trash" not in labels),
+    "[Gmail]/Spam": ("\\HasNoChildren \\Junk", lambda labels: False),
+    "[Gmail]/Starred": ("\\Flagged \\HasNoChildren", lambda labels: "\\Starred" in labels and "\\Trash" not in labels),
+    "[Gmail]/Trash": ("\\HasNoChildren \\Trash", lambda labels: "\\Trash" in labels),
+}
+TRASH = "[Gmail]/Trash"
+
+_WORDS = ("project update meeting review budget schedule launch customer feedback design release "
+          "deadline contract invoice report numbers team plan travel lunch draft proposal notes").split()
+_PROMO_WORDS = "sale deal weekly offer exclusive limited members coupon discount launch".split()
+
+
+class FakeMessage:
+    """One message in the fake account: raw RFC822 bytes plus Gmail labels and flags."""
+
+    def __init__(self, uid: int, raw: bytes, thread_id: int, labels: Iterable[str] = ("\\Inbox",),
+                 flags: Iterable[str] = (), internaldate: Optional[float] = None):
+        self.uid = uid
+        self.raw = raw
+        self.thread_id = thread_id
+        self.labels = set(labels)
+        self.flags = set(flags)
+        self.internaldate = internaldate or time.time()
+        self._headers: Optional[Message] = None
+        self._bodystructure: Optional[str] = None
+        self._sections: Dict[str, bytes] = {}
+
+    @property
+    def headers(self) -> Message:
+        """Header-only parse, for searches and HEADER.FIELDS fetches."""
+        if self._headers is None:
+            self._headers = email.message_from_bytes(self.header_bytes)
+        return self._headers
+
+    def prepare(self):
+        """Precompute BODYSTRUCTURE and the leaf part bodies so serving them needs no parsing."""
+        if self._bodystructure is None:
+            parsed = email.message_from_bytes(self.raw)
+            self._bodystructure = _bodystructure(parsed)
+            self._sections = dict(_leaf_parts(parsed))
+
+    @property
+    def bodystructure(self) -> str:
+        self.prepare()
+        return self._bodystructure
+
+    def section(self, number: str) -> bytes:
+        self.prepare()
+        return self._sections.get(number, b"")
+
+    @property
+    def header_bytes(self) -> bytes:
+        end = self.raw.find(b"\r\n\r\n")
+        return self.raw[:end + 4] if end >= 0 else self.raw
+
+
+def build_corpus(count: int = 100, thread_depth: int = 1, attachment_kb: int = 0, attachment_every: int = 5,
+                 newsletter_ratio: float = 0.3, html_kb: int = 40, seed: int = 7,
+                 now: Optional[float] = None) -> List[FakeMessage]:
+    """
+    Generate `count` INBOX messages.
+
+    Personal mail comes in threads of 1..`thread_depth` messages where each
+    reply quotes its parent and only the newest message is unread. Every
+    `attachment_every`-th personal message carries a PDF of `attachment_kb`
+    KB. A `newsletter_ratio` share are HTML newsletters of about `html_kb` KB
+    (multipart/alternative, List-Unsubscribe), half of them promotions.
+    """
+    rng = random.Random(seed)
+    now = now or time.time()
+    messages: List[FakeMessage] = []
+    personal = 0
+    thread_id = 1_700_000_000_000_000_000
+
+    def sentence(words=_WORDS, n=12):
+        return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+
+    while len(messages) < count:
+        thread_id += rng.randint(1, 1000)
+        age = rng.uniform(0, 10) * 86400
+        if rng.random() < newsletter_ratio:
+            promo = rng.random() < 0.5
+            subject = (f"{rng.randint(10, 70)}% off: {sentence(_PROMO_WORDS, 4)[:-1]}" if promo
+                       else f"Community digest #{len(messages)}")
+            sender = "Shop Weekly <news@shop.example.com>" if promo else "Community <digest@community.example.org>"
+            msg = MIMEMultipart("alternative")
+            msg.attach(MIMEText(sentence(_PROMO_WORDS, 40), "plain", "utf-8"))
+            msg.attach(MIMEText(_newsletter_html(rng, html_kb), "html", "utf-8"))
+            msg["List-Unsubscribe"] = "<mailto:unsubscribe@example.com>"
+            msg["Precedence"] = "bulk"
+            chain = [(msg, subject, sender)]
+        else:
+            depth = rng.randint(1, max(1, thread_depth))
+            urgent = rng.random() < 0.2
+            subject = f"{'Urgent: ' if urgent else ''}{sentence(n=4)[:-1]}"
+            people = ["Alex Doe <alex@example.org>", "Sam Roe <sam@example.net>"]
+            chain = []
+            previous = ""
+            for position in range(depth):
+                body = "\n\n".join(sentence() for _ in range(rng.randint(2, 6)))
+                if previous:
+                    quoted = "\n".join("> " + line for line in previous.splitlines())
+                    body = f"{body}\n\nOn Mon, someone wrote:\n{quoted}"
+                text = MIMEText(body, "plain", "utf-8")
+                personal += 1
+                if attachment_kb and personal % attachment_every == 0:
+                    msg = MIMEMultipart("mixed")
+                    msg.attach(text)
+                    attachment = MIMEApplication(rng.randbytes(attachment_kb * 1024), "pdf")
+                    attachment.add_header("Content-Disposition", "attachment", filename="report.pdf")
+                    msg.attach(attachment)
+                else:
+                    msg = text
+                chain.append((msg, subject if position == 0 else f"Re: {subject}", people[position % 2]))
+                previous = body
+
+        message_ids: List[str] = []
+        for position, (msg, subject, sender) in enumerate(chain):
+            if len(messages) >= count:
+                break
+            message_id = make_msgid(domain="example.org")
+            msg["Subject"] = subject
+            msg["From"] = sender
+            msg["To"] = "bench@example.com"
+            msg["Date"] = format_datetime(_utc(now - age + position * 600))
+            msg["Message-ID"] = message_id
+            if message_ids:
+                msg["In-Reply-To"] = message_ids[-1]
+                msg["References"] = " ".join(message_ids)
+            message_ids.append(message_id)
+            newest = position == len(chain) - 1
+            raw = msg.as_bytes(policy=email.policy.SMTP)
+            messages.append(FakeMessage(len(messages) + 1, raw, thread_id,
+                                        flags=() if newest else ("\\Seen",),
+                                        internaldate=now - age + position * 600))
+    return messages
+
+
+def _utc(timestamp: float) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+def _newsletter_html(rng: random.Random, size_kb: int) -> str:
+    rows = []
+    while sum(len(row) for row in rows) < size_kb * 1024:
+        words = " ".join(rng.choice(_PROMO_WORDS) for _ in range(20))
+        rows.append(
+            f'<tr><td style="padding:8px;font-family:Arial,sans-serif;color:#333">'
+            f'<a href="https://shop.example.com/p/{rng.randint(1, 10**6)}?utm_source=mail">{words}</a>'
+            f'&nbsp;&mdash; <b>${rng.randint(5, 500)}</b></td></tr>'
+        )
+    return ('<html><head><style>td{font-size:14px}</style></head><body><table width="600">'
+            + "".join(rows)
+            + '</table><img src="https://t.example.com/open.gif" width="1" height="1"></body></html>')
+
+
+class _Literal(bytes):
+    """A literal argument of a client command."""
+
+
+_TOKEN = re.compile(rb'\s*(\(|\)|"(?:[^"\\]|\\.)*"|\x00\d+\x00|[^\s()"\[]+(?:\[[^\]]*\](?:<[\d.]+>)?)?)')
+
+
+def _parse_args(text: bytes, literals: List[bytes]) -> List[Any]:
+    """Tokenize command arguments into strings, _Literal bytes and nested lists."""
+    stack: List[List[Any]] = [[]]
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match or not match.group(1):
+            break
+        pos = match.end()
+        token = match.group(1)
+        if token == b"(":
+            stack.append([])
+        elif token == b")":
+            done = stack.pop()
+            stack[-1].append(done)
+        elif token.startswith(b'"'):
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', token[1:-1]).decode("utf-8", errors="replace"))
+        elif token.startswith(b"\x00"):
+            stack[-1].append(_Literal(literals[int(token.strip(b"\x00"))]))
+        else:
+            stack[-1].append(token.decode("utf-8", errors="replace"))
+    while len(stack) > 1:
+        done = stack.pop()
+        stack[-1].append(done)
+    return stack[0]
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _bodystructure(part: Message) -> str:
+    """RFC 3501 BODYSTRUCTURE of a parsed message or part."""
+    if part.is_multipart():
+        children = "".join(_bodystructure(child) for child in part.get_payload())
+        boundary = part.get_boundary()
+        params = f"({_quote('BOUNDARY')} {_quote(boundary)})" if boundary else "NIL"
+        return f"({children} {_quote(part.get_content_subtype().upper())} {params} NIL NIL NIL)"
+
+    params = [f"{_quote(key.upper())} {_quote(str(value))}" for key, value in part.get_params()[1:]] if part.get_params() else []
+    encoding = str(part.get("Content-Transfer-Encoding", "7BIT")).upper()
+    body = _part_body(part)
+    fields = [
+        _quote(part.get_content_maintype().upper()),
+        _quote(part.get_content_subtype().upper()),
+        f"({' '.join(params)})" if params else "NIL",
+        "NIL", "NIL",
+        _quote(encoding),
+        str(len(body)),
+    ]
+    if part.get_content_maintype() == "text":
+        fields.append(str(body.count(b"\n") + 1))
+    fields.append("NIL")  # MD5
+    disposition = part.get("Content-Disposition")
+    if disposition:
+        kind = disposition.split(";")[0].strip().upper()
+        filename = part.get_filename()
+        extra = f" ({_quote('FILENAME')} {_quote(filename)})" if filename else " NIL"
+        fields.append(f"({_quote(kind)}{extra})")
+    else:
+        fields.append("NIL")
+    fields.extend(["NIL", "NIL"])
+    return "(" + " ".join(fields) + ")"
+
+
+def _part_body(part: Message) -> bytes:
+    payload = part.get_payload()
+    if isinstance(payload, str):
+        return payload.encode("utf-8", errors="surrogateescape").replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+    return b""
+
+
+def _leaf_parts(msg: Message, prefix: str = ""):
+    """Yield (IMAP part number, body bytes) for every non-multipart part."""
+    if not msg.is_multipart():
+        yield prefix or "1", _part_body(msg)
+        return
+    for index, child in enumerate(msg.get_payload(), 1):
+        yield from _leaf_parts(child, f"{prefix}.{index}" if prefix else str(index))
+
+
+class FakeGmail:
+    """Shared mailbox state plus protocol accounting for every fake connection."""
+
+    def __init__(self, messages: Iterable[FakeMessage] = (), latency: float = 0.0, uidvalidity: int = 1):
+        self.messages: Dict[int, FakeMessage] = {message.uid: message for message in messages}
+        for message in self.messages.values():
+            message.prepare()
+        self.next_uid = max(self.messages, default=0) + 1
+        self.uidvalidity = uidvalidity
+        self.modseq = 1000
+        self.latency = latency
+        self.user_labels: set = set()
+        self.lock = threading.RLock()
+        self.stats: Counter = Counter()
+
+    # -- accounting ---------------------------------------------------------
+
+    def round_trip(self, command: str, sleep: bool = True):
+        with self.lock:
+            self.stats["round_trips"] += 1
+            self.stats[f"cmd {command}"] += 1
+        if self.latency and sleep:
+            time.sleep(self.latency)
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "round_trips": self.stats["round_trips"],
+                "connections": self.stats["connections"],
+                "bytes_to_server": self.stats["bytes_in"],
+                "bytes_to_client": self.stats["bytes_out"],
+                "commands": {key[4:]: value for key, value in sorted(self.stats.items()) if key.startswith("cmd ")},
+            }
+
+    # -- mailboxes ----------------------------------------------------------
+
+    def mailbox_names(self) -> List[str]:
+        return list(SYSTEM_MAILBOXES) + sorted(self.user_labels)
+
+    def in_mailbox(self, message: FakeMessage, mailbox: str) -> bool:
+        if mailbox.upper() == "INBOX":
+            mailbox = "INBOX"
+        if mailbox in SYSTEM_MAILBOXES:
+            return SYSTEM_MAILBOXES[mailbox][1](message.labels)
+        return mailbox in message.labels and "\\Trash" not in message.labels
+
+    def mailbox_uids(self, mailbox: str) -> List[int]:
+        return sorted(uid for uid, message in self.messages.items() if self.in_mailbox(message, mailbox))
+
+    def exists(self, mailbox: str) -> bool:
+        return mailbox.upper() == "INBOX" or mailbox in SYSTEM_MAILBOXES or mailbox in self.user_labels
+
+    # -- clients ------------------------------------------------------------
+
+    def client_class(self) -> type:
+        """An imaplib.IMAP4 subclass connected to this server."""
+        return type("FakeIMAP4_SSL", (FakeIMAP4,), {"server": self})
+
+    async def open_connection(self, host: str, port: int, ssl_context=None, timeout: Optional[float] = None):
+        """In-memory (reader, writer) streams to this server, for the asyncio client."""
+        reader = asyncio.StreamReader()
+        writer = _AsyncStreamWriter(_Session(self, blocking=False), reader, self.latency)
+        writer.flush()
+        return reader, writer
+
+    @contextmanager
+    def install(self):
+        """Route imaplib.IMAP4_SSL and AsyncIMAPClient (and so both connection pools) to this server."""
+        from gmail_crew_ai.tools.aio_imap import AsyncIMAPClient
+
+        original = imaplib.IMAP4_SSL
+        original_open = AsyncIMAPClient.__dict__["open_connection"]
+        imaplib.IMAP4_SSL = self.client_class()
+        AsyncIMAPClient.open_connection = staticmethod(self.open_connection)
+        try:
+            yield self
+        finally:
+            imaplib.IMAP4_SSL = original
+            AsyncIMAPClient.open_connection = original_open
+
+
+class FakeIMAP4(imaplib.IMAP4):
+    """imaplib client whose transport is an in-memory _Session."""
+
+    server: FakeGmail = None
+
+    def __init__(self, host: str = "imap.gmail.com", port: int = 993, *args, timeout: Optional[float] = None, **kwargs):
+        super().__init__(host, port, timeout)
+
+    def open(self, host="", port=993, timeout=None):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.file = None
+        self._session = _Session(self.server)
+
+    def read(self, size):
+        return self._session.read(size)
+
+    def readline(self):
+        return self._session.readline()
+
+    def send(self, data):
+        self._session.feed(data)
+
+    def shutdown(self):
+        self._session.closed = True
+
+
+class _AsyncStreamWriter:
+    """
+    asyncio.StreamWriter stand-in: writes go to a _Session, its replies to the paired StreamReader.
+
+    The injected latency delays each reply on the event loop instead of
+    sleeping, so pipelined commands wait out their round trips together.
+    """
+
+    def __init__(self, session: "_Session", reader: asyncio.StreamReader, latency: float = 0.0):
+        self.session = session
+        self.reader = reader
+        self.latency = latency
+        self.closed = False
+
+    def write(self, data: bytes):
+        self.session.feed(data)
+        self.flush()
+
+    def flush(self):
+        if self.session.out:
+            self._deliver(self.reader.feed_data, bytes(self.session.out))
+        self.session.out.clear()
+
+    def _deliver(self, callback, *args):
+        def deliver():
+            if not self.reader.at_eof():
+                callback(*args)
+        if self.latency:
+            asyncio.get_running_loop().call_later(self.latency, deliver)
+        else:
+            deliver()
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = self.session.closed = True
+            self._deliver(self.reader.feed_eof)
+
+    async def wait_closed(self):
+        pass
+
+
+class _Session:
+    """Server side of one connection."""
+
+    def __init__(self, server: FakeGmail, blocking: bool = True):
+        self.server = server
+        self.blocking = blocking
+        self.out = bytearray()
+        self.inbuf = bytearray()
+        self.pending: Optional[Tuple[List[bytes], List[bytes], int]] = None
+        self.partial: Optional[Tuple[List[bytes], List[bytes]]] = None
+        self.selected: Optional[str] = None
+        self.readonly = False
+        self.closed = False
+        with server.lock:
+            server.stats["connections"] += 1
+        server.round_trip("CONNECT", sleep=blocking)
+        self._write(f"* OK [CAPABILITY {CAPABILITIES}] Fake Gmail ready\r\n")
+
+    # -- transport ----------------------------------------------------------
+
+    def _write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.out += data
+        with self.server.lock:
+            self.server.stats["bytes_out"] += len(data)
+
+    def read(self, size: int) -> bytes:
+        data = bytes(self.out[:size])
+        del self.out[:size]
+        return data
+
+    def readline(self) -> bytes:
+        end = self.out.find(b"\n")
+        end = len(self.out) if end < 0 else end + 1
+        return self.read(end)
+
+    def feed(self, data: bytes):
+        with self.server.lock:
+            self.server.stats["bytes_in"] += len(data)
+        self.inbuf += data
+        while True:
+            if self.pending is not None:
+                texts, literals, size = self.pending
+                if len(self.inbuf) < size:
+                    return
+                literals.append(bytes(self.inbuf[:size]))
+                del self.inbuf[:size]
+                self.pending = None
+                self.partial = (texts, literals)
+                continue
+
+            end = self.inbuf.find(b"\r\n")
+            if end < 0:
+                return
+            line = bytes(self.inbuf[:end])
+            del self.inbuf[:end + 2]
+            texts, literals = self.partial or ([], [])
+            self.partial = None
+            literal = re.search(rb"\{(\d+)\}$", line)
+            if literal:
+                texts.append(line[:literal.start()] + b"\x00%d\x00" % len(literals))
+                self.pending = (texts, literals, int(literal.group(1)))
+                self._write("+ go ahead\r\n")
+                self.server.round_trip("continuation", sleep=self.blocking)
+                continue
+            texts.append(line)
+            self._execute(b"".join(texts), literals)
+
+    # -- commands -----------------------------------------------------------
+
+    def _execute(self, line: bytes, literals: List[bytes]):
+        tag, _, rest = line.partition(b" ")
+        name, _, args = rest.partition(b" ")
+        command = name.decode().upper()
+        uid = command == "UID"
+        if uid:
+            name, _, args = args.partition(b" ")
+            command = name.decode().upper()
+        label = f"UID {command}" if uid else command
+
+        handler = getattr(self, f"_cmd_{command.lower().replace('-', '_')}", None)
+        with self.server.lock:
+            try:
+                if handler is None:
+                    status, text = "BAD", f"Unknown command {command}"
+                else:
+                    status, text = handler(_parse_args(args, literals), uid)
+            except Exception as e:
+                status, text = "BAD", f"Could not parse command: {e}"
+        self._write(f"{tag.decode()} {status} {text}\r\n")
+        self.server.round_trip(label, sleep=self.blocking)
+
+    def _cmd_capability(self, args, uid):
+        self._write(f"* CAPABILITY {CAPABILITIES}\r\n")
+        return "OK", "Success"
+
+    def _cmd_login(self, args, uid):
+        return "OK", "bench authenticated (Success)"
+
+    def _cmd_logout(self, args, uid):
+        self._write("* BYE LOGOUT Requested\r\n")
+        return "OK", "73 good day (Success)"
+
+    def _cmd_noop(self, args, uid):
+        return "OK", "Success"
+
+    def _cmd_enable(self, args, uid):
+        return "OK", "Success"
+
+    def _cmd_select(self, args, uid, readonly=False):
+        mailbox = str(args[0])
+        if not self.server.exists(mailbox):
+            self.selected = None
+            return "NO", "[NONEXISTENT] Unknown Mailbox"
+        self.selected = mailbox
+        self.readonly = readonly
+        uids = self.server.mailbox_uids(mailbox)
+        self._write("* FLAGS (\\Answered \\Flagged \\Draft \\Deleted \\Seen)\r\n")
+        self._write(f"* OK [UIDVALIDITY {self.server.uidvalidity}] UIDs valid.\r\n")
+        self._write(f"* {len(uids)} EXISTS\r\n* 0 RECENT\r\n")
+        self._write(f"* OK [UIDNEXT {self.server.next_uid}] Predicted next UID.\r\n")
+        self._write(f"* OK [HIGHESTMODSEQ {self.server.modseq}]\r\n")
+        return "OK", f"[{'READ-ONLY' if readonly else 'READ-WRITE'}] {mailbox} selected. (Success)"
+
+    def _cmd_examine(self, args, uid):
+        return self._cmd_select(args, uid, readonly=True)
+
+    def _cmd_unselect(self, args, uid):
+        self.selected = None
+        return "OK", "Returned to authenticated state. (Success)"
+
+    def _cmd_close(self, args, uid):
+        if self.selected and not self.readonly:
+            self._expunge(report=False)
+        self.selected = None
+        return "OK", "Returned to authenticated state. (Success)"
+
+    def _cmd_list(self, args, uid):
+        pattern = str(args[1]) if len(args) > 1 else "*"
+        for name in self.server.mailbox_names():
+            if pattern not in ("*", "%") and pattern != name:
+                continue
+            attributes = SYSTEM_MAILBOXES[name][0] if name in SYSTEM_MAILBOXES else "\\HasNoChildren"
+            self._write(f'* LIST ({attributes}) "/" {_quote(name)}\r\n')
+        if pattern in ("*", "%"):
+            self._write('* LIST (\\HasChildren \\Noselect) "/" "[Gmail]"\r\n')
+        return "OK", "Success"
+
+    def _cmd_xlist(self, args, uid):
+        return self._cmd_list(args, uid)
+
+    def _cmd_status(self, args, uid):
+        mailbox = str(args[0])
+        if not self.server.exists(mailbox):
+            return "NO", "[NONEXISTENT] Unknown Mailbox"
+        uids = self.server.mailbox_uids(mailbox)
+        unseen = sum(1 for u in uids if "\\Seen" not in self.server.messages[u].flags)
+        values = {
+            "MESSAGES": len(uids), "UNSEEN": unseen, "RECENT": 0,
+            "UIDVALIDITY": self.server.uidvalidity, "UIDNEXT": self.server.next_uid,
+            "HIGHESTMODSEQ": self.server.modseq,
+        }
+        items = args[1] if len(args) > 1 and isinstance(args[1], list) else []
+        pairs = " ".join(f"{item.upper()} {values[item.upper()]}" for item in items if item.upper() in values)
+        self._write(f"* STATUS {_quote(mailbox)} ({pairs})\r\n")
+        return "OK", "Success"
+
+    def _cmd_create(self, args, uid):
+        name = str(args[0])
+        if self.server.exists(name):
+            return "NO", "[ALREADYEXISTS] Duplicate folder name (Failure)"
+        self.server.user_labels.add(name)
+        return "OK", "Success"
+
+    def _cmd_append(self, args, uid):
+        mailbox = str(args[0])
+        if not self.server.exists(mailbox):
+            return "NO", "[TRYCREATE] Folder doesn't exist. (Failure)"
+        flags = next((a for a in args[1:] if isinstance(a, list)), [])
+        raw = next((a for a in args[1:] if isinstance(a, _Literal)), b"")
+        labels = {"\\Draft"} if mailbox == "[Gmail]/Drafts" else {"\\Inbox"} if mailbox.upper() == "INBOX" else {mailbox}
+        new_uid = self.server.next_uid
+        self.server.next_uid += 1
+        self.server.modseq += 1
+        self.server.messages[new_uid] = FakeMessage(new_uid, bytes(raw), thread_id=new_uid, labels=labels,
+                                                    flags=[f for f in flags if f != "\\Recent"])
+        return "OK", f"[APPENDUID {self.server.uidvalidity} {new_uid}] (Success)"
+
+    def _cmd_expunge(self, args, uid):
+        if not self.selected:
+            return "BAD", "No mailbox selected"
+        self._expunge(report=True)
+        return "OK", "Success"
+
+    def _expunge(self, report: bool):
+        uids = self.server.mailbox_uids(self.selected)
+        for position in range(len(uids), 0, -1):
+            message = self.server.messages[uids[position - 1]]
+            if "\\Deleted" not in message.flags:
+                continue
+            if self.selected == TRASH:
+                del self.server.messages[message.uid]
+            else:
+                # Gmail's default: expunging from a label only removes the label
+                message.flags.discard("\\Deleted")
+                message.labels.discard("\\Inbox" if self.selected.upper() == "INBOX" else self.selected)
+            if report:
+                self._write(f"* {position} EXPUNGE\r\n")
+        self.server.modseq += 1
+
+    # -- message sets -------------------------------------------------------
+
+    def _resolve_set(self, spec: str, uid: bool) -> List[int]:
+        """Return the UIDs (in the selected mailbox) named by a UID or sequence set."""
+        uids = self.server.mailbox_uids(self.selected)
+        if not uids:
+            return []
+        wanted = set()
+        for piece in str(spec).split(","):
+            low, _, high = piece.partition(":")
+            top = uids[-1] if uid else len(uids)
+            low_value = top if low == "*" else int(low)
+            high_value = low_value if not high else top if high == "*" else int(high)
+            low_value, high_value = sorted((low_value, high_value))
+            if uid:
+                wanted.update(u for u in uids if low_value <= u <= high_value)
+            else:
+                wanted.update(uids[i - 1] for i in range(max(low_value, 1), min(high_value, len(uids)) + 1))
+        return sorted(wanted)
+
+    def _seq(self, message_uid: int) -> int:
+        return self.server.mailbox_uids(self.selected).index(message_uid) + 1
+
+    # -- SEARCH -------------------------------------------------------------
+
+    def _cmd_search(self, args, uid):
+        if not self.selected:
+            return "BAD", "No mailbox selected"
+        if args and str(args[0]).upper() == "CHARSET":
+            args = args[2:]
+        uids = self.server.mailbox_uids(self.selected)
+        matches = [u for u in uids if self._matches_all(self.server.messages[u], list(args), uid)]
+        numbers = matches if uid else [uids.index(u) + 1 for u in matches]
+        self._write("* SEARCH" + "".join(f" {n}" for n in numbers) + "\r\n")
+        return "OK", "SEARCH completed (Success)"
+
+    def _matches_all(self, message: FakeMessage, criteria: List[Any], uid: bool) -> bool:
+        while criteria:
+            if not self._match_one(message, criteria, uid):
+                return False
+        return True
+
+    def _match_one(self, message: FakeMessage, criteria: List[Any], uid: bool) -> bool:
+        key = criteria.pop(0)
+        if isinstance(key, list):
+            return self._matches_all(message, list(key), uid)
+        key = str(key).upper()
+        if key == "ALL":
+            return True
+        if key in ("UNSEEN", "SEEN", "DELETED", "FLAGGED", "DRAFT"):
+            flag = "\\" + ("Seen" if key in ("UNSEEN", "SEEN") else key.capitalize())
+            return (flag in message.flags) != (key == "UNSEEN")
+        if key == "NOT":
+            return not self._match_one(message, criteria, uid)
+        if key == "OR":
+            left = self._match_one(message, criteria, uid)
+            right = self._match_one(message, criteria, uid)
+            return left or right
+        if key == "UID":
+            return message.uid in self._resolve_set(str(criteria.pop(0)), True)
+        if key == "X-GM-THRID":
+            return str(message.thread_id) == str(criteria.pop(0))
+        if key == "X-GM-RAW":
+            return self._gmail_raw(message, str(criteria.pop(0)))
+        if key == "HEADER":
+            name, value = str(criteria.pop(0)), str(criteria.pop(0))
+            return value.lower() in str(message.headers.get(name, "")).lower()
+        if key in ("SUBJECT", "FROM", "TO"):
+            return str(criteria.pop(0)).lower() in str(message.headers.get(key.capitalize(), "")).lower()
+        if key[0].isdigit() or key[0] == "*":
+            return message.uid in self._resolve_set(key, uid)
+        raise ValueError(f"unsupported search key {key}")
+
+    def _gmail_raw(self, message: FakeMessage, query: str) -> bool:
+        """A small subset of Gmail search operators, enough for the cleanup policies."""
+        age_days = (time.time() - message.internaldate) / 86400
+        for term in query.split():
+            negate = term.startswith("-")
+            term = term.lstrip("-").lower()
+            field, _, value = term.partition(":")
+            if field == "from":
+                hit = value in str(message.headers.get("From", "")).lower()
+            elif field == "subject":
+                hit = value in str(message.headers.get("Subject", "")).lower()
+            elif field in ("older_than", "newer_than"):
+                days = int(re.sub(r"\D", "", value) or 0) * {"y": 365, "m": 30}.get(value[-1:], 1)
+                hit = age_days > days if field == "older_than" else age_days < days
+            elif field == "category":
+                bulk = "List-Unsubscribe" in message.headers
+                hit = bulk if value in ("promotions", "updates", "forums", "social") else not bulk
+            elif field == "is":
+                hit = {"starred": "\\Starred" in message.labels, "important": "\\Important" in message.labels,
+                       "unread": "\\Seen" not in message.flags}.get(value, False)
+            else:
+                hit = term in str(message.headers.get("Subject", "")).lower()
+            if hit == negate:
+                return False
+        return True
+
+    # -- FETCH --------------------------------------------------------------
+
+    def _cmd_fetch(self, args, uid):
+        if not self.selected:
+            return "BAD", "No mailbox selected"
+        items = args[1] if isinstance(args[1], list) else [args[1]]
+        items = [str(item) for item in items]
+        macros = {"ALL": ["FLAGS", "INTERNALDATE", "RFC822.SIZE"], "FAST": ["FLAGS", "INTERNALDATE", "RFC822.SIZE"],
+                  "FULL": ["FLAGS", "INTERNALDATE", "RFC822.SIZE", "BODY"]}
+        if len(items) == 1 and items[0].upper() in macros:
+            items = macros[items[0].upper()]
+        if uid and "UID" not in (item.upper() for item in items):
+            items = ["UID"] + items
+        for message_uid in self._resolve_set(str(args[0]), uid):
+            message = self.server.messages[message_uid]
+            self._write(f"* {self._seq(message_uid)} FETCH (")
+            for index, item in enumerate(items):
+                if index:
+                    self._write(" ")
+                self._fetch_item(message, item)
+            self._write(")\r\n")
+        return "OK", "Success"
+
+    def _fetch_item(self, message: FakeMessage, item: str):
+        upper = item.upper()
+        if upper == "UID":
+            self._write(f"UID {message.uid}")
+        elif upper == "FLAGS":
+            self._write(f"FLAGS ({' '.join(sorted(message.flags))})")
+        elif upper == "X-GM-THRID":
+            self._write(f"X-GM-THRID {message.thread_id}")
+        elif upper == "X-GM-MSGID":
+            self._write(f"X-GM-MSGID {message.thread_id + message.uid}")
+        elif upper == "X-GM-LABELS":
+            self._write(f"X-GM-LABELS ({' '.join(_quote(label) for label in sorted(message.labels))})")
+        elif upper == "RFC822.SIZE":
+            self._write(f"RFC822.SIZE {len(message.raw)}")
+        elif upper == "INTERNALDATE":
+            self._write(f"INTERNALDATE {imaplib.Time2Internaldate(message.internaldate)}")
+        elif upper in ("BODYSTRUCTURE", "BODY"):
+            self._write(f"{upper} {message.bodystructure}")
+        elif upper in ("RFC822", "RFC822.HEADER", "RFC822.TEXT"):
+            data = message.raw if upper == "RFC822" else message.header_bytes if upper == "RFC822.HEADER" \
+                else message.raw[len(message.header_bytes):]
+            if upper != "RFC822.HEADER":
+                message.flags.add("\\Seen")
+            self._literal(upper, data)
+        elif upper.startswith(("BODY[", "BODY.PEEK[")):
+            match = re.match(r"BODY(\.PEEK)?\[([^\]]*)\](?:<(\d+)\.(\d+)>)?$", item, re.IGNORECASE)
+            section = match.group(2)
+            data = self._section(message, section)
+            name = f"BODY[{section}]"
+            if match.group(3) is not None:
+                start, length = int(match.group(3)), int(match.group(4))
+                data = data[start:start + length]
+                name += f"<{start}>"
+            if not match.group(1):
+                message.flags.add("\\Seen")
+            self._literal(name, data)
+        else:
+            raise ValueError(f"unsupported fetch item {item}")
+
+    def _literal(self, name: str, data: bytes):
+        self._write(f"{name} {{{len(data)}}}\r\n".encode() + data)
+
+    def _section(self, message: FakeMessage, section: str) -> bytes:
+        upper = section.upper()
+        if upper == "":
+            return message.raw
+        if upper == "HEADER":
+            return message.header_bytes
+        if upper == "TEXT":
+            return message.raw[len(message.header_bytes):]
+        if upper.startswith("HEADER.FIELDS"):
+            wanted = {name.lower() for name in re.findall(r"[\w-]+", section[section.find("(") + 1:])}
+            lines = [f"{key}: {value}\r\n" for key, value in message.headers.items() if key.lower() in wanted]
+            return ("".join(lines) + "\r\n").encode("utf-8", errors="replace")
+        return message.section(section)
+
+    # -- STORE / MOVE / COPY ------------------------------------------------
+
+    def _cmd_store(self, args, uid):
+        if not self.selected:
+            return "BAD", "No mailbox selected"
+        operation = str(args[1]).upper()
+        values = args[2] if isinstance(args[2], list) else [args[2]]
+        values = [str(value) for value in values]
+        silent = operation.endswith(".SILENT")
+        operation = operation.replace(".SILENT", "")
+        mode = operation[0] if operation[0] in "+-" else "="
+        attribute = operation.lstrip("+-")
+        if attribute == "X-GM-LABELS":
+            values = [_system_label(value) for value in values]
+            self.server.user_labels.update(v for v in values if not v.startswith("\\"))
+        for message_uid in self._resolve_set(str(args[0]), uid):
+            message = self.server.messages[message_uid]
+            # Taken before the change: dropping \Inbox takes the message out of INBOX
+            seq = self._seq(message_uid)
+            if attribute == "X-GM-LABELS":
+                target = message.labels
+            else:
+                target = message.flags
+            if mode == "+":
+                target.update(values)
+            elif mode == "-":
+                target.difference_update(values)
+            else:
+                target.clear()
+                target.update(values)
+            if attribute == "FLAGS" and "\\Flagged" in message.flags:
+                message.labels.add("\\Starred")
+            if not silent:
+                shown = " ".join(_quote(v) if attribute == "X-GM-LABELS" else v for v in sorted(target))
+                self._write(f"* {seq} FETCH (UID {message_uid} {attribute} ({shown}))\r\n")
+        self.server.modseq += 1
+        return "OK", "Success"
+
+    def _cmd_copy(self, args, uid, move=False):
+        if not self.selected:
+            return "BAD", "No mailbox selected"
+        destination = str(args[1])
+        if not self.server.exists(destination):
+            return "NO", "[TRYCREATE] Folder doesn't exist. (Failure)"
+        source_uids = self._resolve_set(str(args[0]), uid)
+        before = self.server.mailbox_uids(self.selected)
+        for message_uid in source_uids:
+            message = self.server.messages[message_uid]
+            if destination == TRASH:
+                message.labels = {"\\Trash"}
+                continue
+            if destination.upper() == "INBOX":
+                message.labels.add("\\Inbox")
+            elif destination not in SYSTEM_MAILBOXES:
+                message.labels.add(destination)
+            if move:
+                message.labels.discard("\\Inbox" if self.selected.upper() == "INBOX" else self.selected)
+        uid_set = ",".join(str(u) for u in source_uids)
+        self._write(f"* OK [COPYUID {self.server.uidvalidity} {uid_set} {uid_set}]\r\n")
+        if move:
+            for position in range(len(before), 0, -1):
+                if before[position - 1] in source_uids and not self.server.in_mailbox(self.server.messages[before[position - 1]], self.selected):
+                    self._write(f"* {position} EXPUNGE\r\n")
+        self.server.modseq += 1
+        return "OK", "Success"
+
+    def _cmd_move(self, args, uid):
+        return self._cmd_copy(args, uid, move=True)
+
+
+def _system_label(label: str) -> str:
+    known = {"\\inbox": "\\Inbox", "\\trash": "\\Trash", "\\important": "\\Important",
+             "\\starred": "\\Starred", "\\draft": "\\Draft", "\\sent": "\\Sent"}
+    return known.get(label.lower(), label)
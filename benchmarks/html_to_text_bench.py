@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: clean_email_body (fast path) vs the previous BeautifulSoup-only version.
+
+Usage:
+    python benchmarks/html_to_text_bench.py [--corpus DIR] [--repeat N]
+
+DIR may hold .html files or saved .eml newsletters; without it a synthetic
+newsletter corpus is generated. Prints per-email timings and how closely the
+fast path's output matches BeautifulSoup's (word overlap).
+"""
+import argparse
+import email
+import os
+import random
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from gmail_crew_ai.tools.gmail_tools import clean_email_body  # noqa: E402
+
+
+def legacy_clean_email_body(email_body: str) -> str:
+    """clean_email_body as it was before the fast path."""
+    try:
+        soup = BeautifulSoup(email_body, "html.parser")
+        text = soup.get_text(separator=" ")
+    except Exception:
+        text = email_body
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def load_corpus(directory: str):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        with open(path, "rb") as f:
+            raw = f.read()
+        if name.endswith(".eml"):
+            msg = email.message_from_bytes(raw)
+            for part in msg.walk():
+                if part.get_content_type() == "text/html":
+                    payload = part.get_payload(decode=True) or b""
+                    corpus.append(payload.decode(part.get_content_charset() or "utf-8", errors="replace"))
+        elif name.endswith((".html", ".htm")):
+            corpus.append(raw.decode("utf-8", errors="replace"))
+    return corpus
+
+
+def synthetic_corpus(count: int = 200, seed: int = 7):
+    """Newsletter-shaped HTML: inline CSS, nested tables, tracking pixels, entities."""
+    rng = random.Random(seed)
+    words = ("sale deal weekly update product launch community event news read more "
+             "unsubscribe preferences offer exclusive limited time members").split()
+    corpus = []
+    for i in range(count):
+        rows = []
+        for _ in range(rng.randint(10, 60)):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(8, 30)))
+            rows.append(
+                f'<tr><td style="padding:12px;font-family:Arial,sans-serif;color:#333">'
+                f'<p>{sentence} &amp; more&nbsp;&rarr;</p>'
+                f'<a href="https://example.com/t/{i}?u={rng.randint(0, 1 << 30)}">Read&nbsp;more</a></td></tr>'
+            )
+        corpus.append(
+            "<!DOCTYPE html><html><head><title>Newsletter</title>"
+            "<style>td{padding:0} .btn{color:#fff;background:#06c}</style>"
+            "<script>window.track && track();</script></head><body>"
+            "<!-- preheader -->"
+            f'<table width="600" cellpadding="0" cellspacing="0">{"".join(rows)}</table>'
+            f'<img src="https://example.com/open/{i}.gif" width="1" height="1" alt="">'
+            "</body></html>"
+        )
+    return corpus
+
+
+def bench(func, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for body in corpus:
+            func(body)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def word_overlap(a: str, b: str) -> float:
+    wa, wb = set(a.split()), set(b.split())
+    return len(wa & wb) / len(wa | wb) if wa | wb else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of .html or .eml files")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not corpus:
+        print("No HTML found in the corpus.")
+        return 1
+    size = sum(len(body) for body in corpus)
+    print(f"Corpus: {len(corpus)} emails, {size / 1024:.0f} KiB of HTML")
+
+    legacy = bench(legacy_clean_email_body, corpus, args.repeat)
+    fast = bench(clean_email_body, corpus, args.repeat)
+    overlap = sum(word_overlap(clean_email_body(b), legacy_clean_email_body(b)) for b in corpus) / len(corpus)
+
+    print(f"legacy (BeautifulSoup): {legacy * 1000:8.1f} ms  ({legacy / len(corpus) * 1e6:7.0f} us/email)")
+    print(f"fast path:              {fast * 1000:8.1f} ms  ({fast / len(corpus) * 1e6:7.0f} us/email)")
+    print(f"speedup: {legacy / fast:.1f}x, word overlap with legacy output: {overlap:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
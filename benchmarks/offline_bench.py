@@ -0,0 +1,334 @@
+"""
+Offline benchmarks for the Gmail tools and a full crew kickoff.
+
+Everything runs against benchmarks/fake_imap.py (an in-process Gmail IMAP
+stand-in serving a synthetic corpus, with optional injected latency) and
+benchmarks/stub_llm.py (a deterministic LLM), so no Gmail account or API key
+is needed. Each benchmark runs in its own subprocess with a fresh state
+directory and reports IMAP round trips, connections, bytes sent to the
+client, wall time and peak RSS.
+
+Usage:
+    python benchmarks/offline_bench.py [--emails N] [--thread-depth D]
+        [--attachment-kb KB] [--newsletters RATIO] [--latency-ms MS]
+        [--llm-latency-ms MS] [--only NAME ...] [--json FILE] [--verbose]
+
+Benchmarks: fetch, fetch_asyncio, fetch_two_phase, organize, organize_batch,
+organize_async, delete, delete_batch, empty_trash, save_drafts,
+save_drafts_batch, crew_kickoff, crew_parallel.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+sys.path.insert(0, BENCH_DIR)
+
+RESULT_MARKER = "BENCH_RESULT "
+
+
+def _inbox_uids(server) -> List[str]:
+    return [str(uid) for uid in server.mailbox_uids("INBOX")]
+
+
+def _promo_uids(server) -> List[str]:
+    return [str(uid) for uid in server.mailbox_uids("INBOX")
+            if "% off" in str(server.messages[uid].headers.get("Subject", ""))]
+
+
+def bench_fetch(server, args) -> Dict[str, Any]:
+    """Whole-message fetches with BODY.PEEK[], the pre-two-phase path."""
+    from gmail_crew_ai.tools.gmail_tools import GetUnreadEmailsTool
+    emails = GetUnreadEmailsTool()._run(limit=args.emails, two_phase=False)
+    return {"items": len(emails)}
+
+
+def bench_fetch_asyncio(server, args) -> Dict[str, Any]:
+    """The blocking fetch tool with its sessions on the asyncio backend."""
+    os.environ["IMAP_BACKEND"] = "asyncio"
+    from gmail_crew_ai.tools.gmail_tools import GetUnreadEmailsTool
+    emails = GetUnreadEmailsTool()._run(limit=args.emails)
+    return {"items": len(emails)}
+
+
+def bench_fetch_two_phase(server, args) -> Dict[str, Any]:
+    from gmail_crew_ai.tools.gmail_tools import GetUnreadEmailsTool
+    emails = GetUnreadEmailsTool()._run(limit=args.emails, two_phase=True)
+    return {"items": len(emails)}
+
+
+def _bench_category(index: int) -> Tuple[str, str]:
+    """Every third email is urgent, so it gets starred and marked important."""
+    return ("Urgent Response Needed", "High") if index % 3 == 0 else ("PERSONAL", "MEDIUM")
+
+
+def bench_organize(server, args) -> Dict[str, Any]:
+    """One tool call per email, the way the organizer agent uses it."""
+    from gmail_crew_ai.tools.gmail_tools import GmailOrganizeTool
+    uids = _inbox_uids(server)[:args.emails]
+    for index, uid in enumerate(uids):
+        GmailOrganizeTool()._run(uid, *_bench_category(index),
+                                 should_star=index % 3 == 0, labels=["Bench"])
+    return {"items": len(uids)}
+
+
+def bench_organize_batch(server, args) -> Dict[str, Any]:
+    from gmail_crew_ai.tools.gmail_tools import GmailOrganizeTool
+    tool = GmailOrganizeTool()
+    uids = _inbox_uids(server)[:args.emails]
+    decisions = [(uid, *tool._plan_decision(*_bench_category(index), index % 3 == 0, ["Bench"]))
+                 for index, uid in enumerate(uids)]
+    tool.organize_many(decisions)
+    return {"items": len(uids)}
+
+
+def bench_organize_async(server, args) -> Dict[str, Any]:
+    """One `_arun` per email, all awaited at once and coalesced into one batch."""
+    import asyncio
+    from gmail_crew_ai.tools.gmail_tools import GmailOrganizeTool
+    tool = GmailOrganizeTool()
+    uids = _inbox_uids(server)[:args.emails]
+
+    async def organize_all():
+        await asyncio.gather(*(tool._arun(uid, *_bench_category(index),
+                                          should_star=index % 3 == 0, labels=["Bench"])
+                               for index, uid in enumerate(uids)))
+
+    asyncio.run(organize_all())
+    return {"items": len(uids)}
+
+
+def bench_delete(server, args) -> Dict[str, Any]:
+    from gmail_crew_ai.tools.gmail_tools import GmailDeleteTool
+    uids = _promo_uids(server)
+    for uid in uids:
+        GmailDeleteTool()._run(uid, "Promotion")
+    return {"items": len(uids)}
+
+
+def bench_delete_batch(server, args) -> Dict[str, Any]:
+    from gmail_crew_ai.tools.gmail_tools import GmailDeleteTool
+    uids = _promo_uids(server)
+    GmailDeleteTool().delete_many(uids, "Promotion")
+    return {"items": len(uids)}
+
+
+def setup_empty_trash(server, args):
+    for message in list(server.messages.values())[:args.emails]:
+        message.labels = {"\\Trash"}
+
+
+def bench_empty_trash(server, args) -> Dict[str, Any]:
+    from gmail_crew_ai.tools.gmail_tools import EmptyTrashTool
+    before = len(server.mailbox_uids("[Gmail]/Trash"))
+    EmptyTrashTool()._run()
+    return {"items": before - len(server.mailbox_uids("[Gmail]/Trash"))}
+
+
+def _drafts(args) -> List[Dict[str, Any]]:
+    return [{"subject": f"Re: Bench {i}", "body": "Thanks, will do.\n\n[Your Name]", "recipient": "alex@example.org",
+             "thread_info": {"message_id": f"<bench-{i}@example.org>"}} for i in range(args.emails)]
+
+
+def bench_save_drafts(server, args) -> Dict[str, Any]:
+    """One tool call per draft, the way the response agent uses it."""
+    from gmail_crew_ai.tools.gmail_tools import SaveDraftTool
+    drafts = _drafts(args)
+    for draft in drafts:
+        SaveDraftTool()._run(**draft)
+    return {"items": len(server.mailbox_uids("[Gmail]/Drafts"))}
+
+
+def bench_save_drafts_batch(server, args) -> Dict[str, Any]:
+    from gmail_crew_ai.tools.gmail_tools import SaveDraftTool
+    SaveDraftTool().save_many(_drafts(args))
+    return {"items": len(server.mailbox_uids("[Gmail]/Drafts"))}
+
+
+def bench_crew_kickoff(server, args) -> Dict[str, Any]:
+    from gmail_crew_ai.crew import GmailCrewAi
+    llm = _install_stub_llm(GmailCrewAi, args)
+    GmailCrewAi().crew().kickoff(inputs={'email_limit': args.emails})
+    return {"items": args.emails, "llm_calls": llm.calls, "prompt_chars": llm.prompt_chars,
+            "slack_posts": _SlackSink.posts}
+
+
+def bench_crew_parallel(server, args) -> Dict[str, Any]:
+    from gmail_crew_ai import parallel
+    from gmail_crew_ai.crew import GmailCrewAi
+    llm = _install_stub_llm(GmailCrewAi, args)
+    results = parallel.run_parallel({'email_limit': args.emails}, concurrency=4, batch_size=5)
+    return {"items": args.emails, "crews": len(results), "llm_calls": llm.calls,
+            "prompt_chars": llm.prompt_chars, "slack_posts": _SlackSink.posts}
+
+
+def _install_stub_llm(crew_class, args):
+    from stub_llm import StubLLM
+    llm = StubLLM(latency=args.llm_latency_ms / 1000)
+    crew_class.llm = llm
+    return llm
+
+
+class _SlackSink(BaseHTTPRequestHandler):
+    """Local webhook that accepts every notification."""
+    posts = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        _SlackSink.posts += 1
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    "fetch": bench_fetch,
+    "fetch_asyncio": bench_fetch_asyncio,
+    "fetch_two_phase": bench_fetch_two_phase,
+    "organize": bench_organize,
+    "organize_batch": bench_organize_batch,
+    "organize_async": bench_organize_async,
+    "delete": bench_delete,
+    "delete_batch": bench_delete_batch,
+    "empty_trash": bench_empty_trash,
+    "save_drafts": bench_save_drafts,
+    "save_drafts_batch": bench_save_drafts_batch,
+    "crew_kickoff": bench_crew_kickoff,
+    "crew_parallel": bench_crew_parallel,
+}
+SETUP = {"empty_trash": setup_empty_trash}
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(name: str, args) -> Dict[str, Any]:
+    """Run one benchmark in this process and return its measurements."""
+    from fake_imap import FakeGmail, build_corpus
+
+    sink = ThreadingHTTPServer(("127.0.0.1", 0), _SlackSink)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    os.environ["SLACK_WEBHOOK_URL"] = f"http://127.0.0.1:{sink.server_address[1]}/hook"
+
+    corpus = build_corpus(count=args.emails, thread_depth=args.thread_depth, attachment_kb=args.attachment_kb,
+                          newsletter_ratio=args.newsletters, seed=args.seed)
+    server = FakeGmail(corpus, latency=args.latency_ms / 1000)
+    if name in SETUP:
+        SETUP[name](server, args)
+
+    # Import everything up front so module import time isn't billed to the benchmark
+    import gmail_crew_ai.tools.gmail_tools  # noqa: F401
+    if name.startswith("crew"):
+        import gmail_crew_ai.crew  # noqa: F401
+        import gmail_crew_ai.parallel  # noqa: F401
+
+    rss_before = _peak_rss_mb()
+    with server.install():
+        start = time.perf_counter()
+        extra = BENCHMARKS[name](server, args)
+        wall = time.perf_counter() - start
+    sink.shutdown()
+
+    result = {"benchmark": name, "wall_s": round(wall, 3), "peak_rss_mb": round(_peak_rss_mb(), 1),
+              "rss_growth_mb": round(_peak_rss_mb() - rss_before, 1)}
+    result.update(server.summary())
+    result.update(extra)
+    return result
+
+
+def run_isolated(name: str, args, argv: List[str]) -> Dict[str, Any]:
+    """Run one benchmark in a fresh subprocess with its own state and output directories."""
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        env = dict(os.environ)
+        env.update({
+            "GMAIL_CREW_STATE_DIR": os.path.join(workdir, "state"),
+            "EMAIL_ADDRESS": "bench@example.com",
+            "APP_PASSWORD": "bench",
+            "OPENAI_API_KEY": "sk-offline-bench",
+            "SLACK_DIGEST_WINDOW_SECONDS": "0.1",
+            "OTEL_SDK_DISABLED": "true",
+            "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+        })
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name] + argv,
+                                 cwd=workdir, env=env, capture_output=True, text=True)
+        if args.verbose:
+            sys.stdout.write(process.stdout)
+            sys.stderr.write(process.stderr)
+        for line in reversed(process.stdout.splitlines()):
+            if line.startswith(RESULT_MARKER):
+                return json.loads(line[len(RESULT_MARKER):])
+        return {"benchmark": name, "error": (process.stderr.strip().splitlines() or ["no result"])[-1]}
+
+
+def print_table(results: List[Dict[str, Any]]):
+    header = f"{'benchmark':<18} {'items':>5} {'wall s':>8} {'RTs':>6} {'conns':>5} {'MB down':>8} {'peak RSS MB':>11} {'RSS +MB':>7}  notes"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        if "error" in result:
+            print(f"{result['benchmark']:<18} ERROR: {result['error']}")
+            continue
+        notes = ", ".join(f"{key}={result[key]}" for key in ("llm_calls", "prompt_chars", "slack_posts", "crews")
+                          if key in result)
+        print(f"{result['benchmark']:<18} {result.get('items', ''):>5} {result['wall_s']:>8.3f} "
+              f"{result['round_trips']:>6} {result['connections']:>5} {result['bytes_to_client'] / 1e6:>8.2f} "
+              f"{result['peak_rss_mb']:>11.1f} {result['rss_growth_mb']:>7.1f}  {notes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=50, help="messages in the corpus / emails per benchmark")
+    parser.add_argument("--thread-depth", type=int, default=3)
+    parser.add_argument("--attachment-kb", type=int, default=512)
+    parser.add_argument("--newsletters", type=float, default=0.3, help="share of HTML newsletters")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="injected latency per IMAP round trip")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="injected latency per LLM call")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the benchmarks' own output")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = run_child(args.child, args)
+        print(RESULT_MARKER + json.dumps(result))
+        return
+
+    argv = list(sys.argv[1:])
+    for flag in ("--only", "--json"):
+        while flag in argv:
+            index = argv.index(flag)
+            del argv[index:index + 2]
+    argv = [a for a in argv if a != "--verbose"]
+
+    results = []
+    for name in args.only or list(BENCHMARKS):
+        print(f"Running {name}...", file=sys.stderr)
+        results.append(run_isolated(name, args, argv))
+
+    print(f"\n{args.emails} emails, thread depth {args.thread_depth}, {args.attachment_kb} KB attachments, "
+          f"{args.latency_ms:g} ms IMAP latency, {args.llm_latency_ms:g} ms LLM latency\n")
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Deterministic stand-in for the crew's LLM, for offline benchmarks.
+
+StubLLM answers the crew's ReAct prompts without a network call: it reads
+the email (or the previous task's JSON) out of the prompt, picks a category
+from simple subject/sender keywords, calls the agent's tool once where the
+real crew would, and then returns a Final Answer that validates against the
+task's output model. Batched categorization prompts get a JSON array.
+"""
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from crewai import LLM
+
+_PROMO = re.compile(r"(\bsale\b|% off|\bdeals?\b|\bdiscount|\boffer\b|\bcoupon|\bpromo)", re.IGNORECASE)
+_ADDRESS = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+def classify(email: Dict[str, Any]) -> Dict[str, str]:
+    """Keyword categorization standing in for the model's judgement."""
+    subject = str(email.get("subject") or "")
+    sender = str(email.get("sender") or "").lower()
+    if _PROMO.search(subject):
+        return {"category": "PROMOTIONS", "priority": "LOW", "required_action": "IGNORE"}
+    if "digest" in subject.lower() or sender.startswith(("news", "digest")) or "digest@" in sender:
+        return {"category": "NEWSLETTERS", "priority": "LOW", "required_action": "READ_ONLY"}
+    if "github.com" in sender:
+        return {"category": "GITHUB", "priority": "MEDIUM", "required_action": "READ_ONLY"}
+    if "urgent" in subject.lower():
+        return {"category": "PERSONAL", "priority": "HIGH", "required_action": "REPLY"}
+    return {"category": "PERSONAL", "priority": "MEDIUM", "required_action": "REPLY"}
+
+
+def _json_objects(text: str):
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r"[\[{]", text):
+        try:
+            value, _ = decoder.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        yield value
+
+
+def _first_email(text: str) -> Dict[str, Any]:
+    for value in _json_objects(text):
+        items = value if isinstance(value, list) else [value]
+        for item in items:
+            if isinstance(item, dict) and item.get("email_id"):
+                return item
+    return {}
+
+
+class StubLLM(LLM):
+    """Offline LLM with a fixed per-call latency and call/token counters."""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(model="stub/deterministic")
+        self.latency = latency
+        self.calls = 0
+        self.prompt_chars = 0
+        self.completion_chars = 0
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 128000
+
+    def call(self, messages: Union[str, List[Dict[str, str]]], tools: Optional[List[dict]] = None,
+             callbacks: Optional[List[Any]] = None, available_functions: Optional[Dict[str, Any]] = None) -> str:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        self.calls += 1
+        self.prompt_chars += sum(len(str(m.get("content", ""))) for m in messages)
+        if self.latency:
+            time.sleep(self.latency)
+        answer = self._answer(messages)
+        self.completion_chars += len(answer)
+        return answer
+
+    def _answer(self, messages: List[Dict[str, str]]) -> str:
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        prompt = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") != "system")
+
+        if "You will receive" in system and "JSON array" in system:
+            emails = next((v for v in _json_objects(prompt) if isinstance(v, list)), [])
+            return json.dumps([self._categorized(email) for email in emails])
+
+        email = _first_email(prompt)
+        tool_used = any(m.get("role") == "assistant" for m in messages)
+        verdict = {key: email.get(key) or value for key, value in classify(email).items()}
+        email_id = str(email.get("email_id", ""))
+        subject = str(email.get("subject") or "")
+        sender = str(email.get("sender") or "")
+
+        if "organize_email" in system:
+            if not tool_used:
+                return self._action("organize_email", {
+                    "email_id": email_id, "category": verdict["category"], "priority": verdict["priority"],
+                    "should_star": verdict["priority"] == "HIGH", "labels": [verdict["category"]],
+                })
+            return self._final({"email_id": email_id, "subject": subject, "applied_labels": [verdict["category"]],
+                                "starred": verdict["priority"] == "HIGH", "result": "organized"})
+
+        if "save_email_draft" in system:
+            needed = verdict["required_action"] == "REPLY"
+            address = (_ADDRESS.findall(sender) or ["unknown@example.com"])[0]
+            if needed and not tool_used:
+                return self._action("save_email_draft", {
+                    "subject": subject, "recipient": address,
+                    "body": "Hi,\n\nThanks for your email, I'll get back to you shortly.\n\n[Your Name]",
+                })
+            return self._final({"email_id": email_id, "subject": subject, "recipient": address,
+                                "response_summary": "Acknowledged" if needed else "No response needed",
+                                "response_needed": needed, "draft_saved": needed})
+
+        if "slack_notification" in system:
+            notify = verdict["priority"] == "HIGH"
+            notification = {
+                "subject": subject, "sender": sender, "category": verdict["category"],
+                "priority": verdict["priority"], "summary": f"{subject} from {sender}",
+                "action_needed": "Reply today", "headline": f"Important: {subject}",
+                "intro": "Heads up", "action_header": "Action Needed:",
+            }
+            if notify and not tool_used:
+                return self._action("slack_notification", notification)
+            return self._final(dict(notification, email_id=email_id, notification_sent=notify))
+
+        if "delete_email" in system:
+            delete = verdict["category"] == "PROMOTIONS"
+            if delete and not tool_used:
+                return self._action("delete_email", {"email_id": email_id, "reason": "Promotion"})
+            return self._final({"email_id": email_id, "subject": subject, "sender": sender,
+                                "age_days": int(email.get("age_days") or 0), "deleted": delete,
+                                "reason": "Promotion" if delete else "Kept"})
+
+        return self._final(self._categorized(email))
+
+    @staticmethod
+    def _categorized(email: Dict[str, Any]) -> Dict[str, Any]:
+        result = {key: email.get(key) for key in ("email_id", "subject", "sender", "date", "age_days")}
+        result["email_id"] = str(result["email_id"] or "")
+        result.update(classify(email))
+        return result
+
+    @staticmethod
+    def _action(tool: str, arguments: Dict[str, Any]) -> str:
+        return f"Thought: I should use the {tool} tool.\nAction: {tool}\nAction Input: {json.dumps(arguments)}"
+
+    @staticmethod
+    def _final(output: Dict[str, Any]) -> str:
+        return f"Thought: I now know the final answer\nFinal Answer: {json.dumps(output)}"
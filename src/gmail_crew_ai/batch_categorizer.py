@@ -0,0 +1,174 @@
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from gmail_crew_ai.compaction import estimate_tokens
+from gmail_crew_ai.models import SimpleCategorizedEmail
+from gmail_crew_ai.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Prompt tokens per batched call, instructions included
+DEFAULT_PROMPT_BUDGET = 6000
+# Hard cap on emails per call, however small they are
+DEFAULT_MAX_BATCH = 25
+# Estimated output tokens per categorized email
+OUTPUT_TOKENS_PER_EMAIL = 60
+
+RESULT_FIELDS = ["email_id", "subject", "sender", "category", "priority", "required_action", "date", "age_days"]
+
+_JSON_ARRAY = re.compile(r"\[.*\]", re.DOTALL)
+
+
+def categorization_rules(task_description: str) -> str:
+    """
+    The categorization rules from tasks.yaml, without the line that inlines
+    the emails ({emails_json}) and the single-object output format. The
+    batched prompt sends its own emails as the user message.
+    """
+    rules = task_description.split("IMPORTANT FORMAT INSTRUCTIONS:")[0]
+    return "\n".join(line for line in rules.splitlines() if "{emails_json}" not in line).strip()
+
+
+class BatchCategorizer:
+    """
+    Categorize many emails per LLM call.
+
+    Emails are packed greedily into batches that fit the prompt token budget
+    (so K adapts to how long the emails are), each batch is answered as a
+    JSON array validated item by item against SimpleCategorizedEmail, and
+    emails with a missing or malformed answer are retried one at a time.
+    """
+
+    def __init__(self, llm, rules: str, prompt_budget: int = DEFAULT_PROMPT_BUDGET,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self.llm = llm
+        self.rules = rules
+        self.prompt_budget = prompt_budget
+        self.max_batch = max_batch
+        self.calls = 0
+
+    def categorize(self, emails: List[Dict[str, Any]]) -> Dict[str, SimpleCategorizedEmail]:
+        """Return {email_id: SimpleCategorizedEmail} for every email the LLM answered properly."""
+        results = {email['email_id']: result for email, result in self.categorize_iter(emails) if result is not None}
+        logger.info("Batch categorization: %d/%d emails in %d LLM calls", len(results), len(emails), self.calls)
+        return results
+
+    def categorize_iter(self, emails: Iterable[Dict[str, Any]],
+                        known: Optional[Dict[str, SimpleCategorizedEmail]] = None) -> Iterator[Tuple[Dict[str, Any], Optional[SimpleCategorizedEmail]]]:
+        """
+        Categorize emails as they arrive and yield (email, result) pairs.
+
+        A batch goes to the LLM as soon as it is full, so with a streaming
+        source the first emails are categorized while later ones are still
+        downloading. The result is None when the LLM never answered an email
+        properly, even on its individual retry. Emails whose ID is in `known`
+        (checked as each one arrives) are passed through with that result
+        and never sent to the LLM.
+        """
+        known = known if known is not None else {}
+        passed: List[Dict[str, Any]] = []
+
+        def unknown() -> Iterator[Dict[str, Any]]:
+            for email in emails:
+                if email['email_id'] in known:
+                    passed.append(email)
+                else:
+                    yield email
+
+        for batch in self._pack(unknown()):
+            while passed:
+                email = passed.pop(0)
+                yield email, known[email['email_id']]
+            answered = self._categorize_batch(batch)
+            retry = [email for email in batch if email['email_id'] not in answered]
+            if retry:
+                logger.info("Retrying %d emails individually after malformed batch answers", len(retry))
+            for email in retry:
+                answered.update(self._categorize_batch([email]))
+            for email in batch:
+                yield email, answered.get(email['email_id'])
+        for email in passed:
+            yield email, known[email['email_id']]
+
+    def plan_batches(self, emails: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Pack emails into batches that fit the prompt budget."""
+        return list(self._pack(emails))
+
+    def _pack(self, emails: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        available = max(self.prompt_budget - estimate_tokens(self.rules) - 200, 1)
+        current, used = [], 0
+        for email in emails:
+            cost = estimate_tokens(self._serialize([email])) + OUTPUT_TOKENS_PER_EMAIL
+            if current and used + cost > available:
+                yield current
+                current, used = [], 0
+            current.append(email)
+            used += cost
+            if len(current) >= self.max_batch:
+                yield current
+                current, used = [], 0
+        if current:
+            yield current
+
+    @staticmethod
+    def _serialize(emails: List[Dict[str, Any]]) -> str:
+        keys = ("email_id", "subject", "sender", "date", "age_days", "body")
+        return json.dumps([{key: email.get(key) for key in keys} for email in emails],
+                          ensure_ascii=False, separators=(",", ":"))
+
+    def _prompt(self, emails: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        instructions = (
+            f"{self.rules}\n\n"
+            f"You will receive {len(emails)} emails as a JSON array. Categorize each one.\n"
+            "Your answer must be a JSON array with exactly one object per email, in the same order, "
+            f"each with these fields: {', '.join(RESULT_FIELDS)}.\n"
+            "Copy email_id, subject, sender, date and age_days from the input.\n"
+            "Return only the raw JSON array, without markdown or explanations."
+        )
+        return [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": self._serialize(emails)},
+        ]
+
+    def _categorize_batch(self, emails: List[Dict[str, Any]]) -> Dict[str, SimpleCategorizedEmail]:
+        self.calls += 1
+        try:
+            with span("categorize.batch", emails=len(emails)):
+                answer = self.llm.call(self._prompt(emails))
+        except Exception as e:
+            logger.error("Batched categorization call failed: %s", e)
+            return {}
+        return self._parse(answer, {email['email_id'] for email in emails})
+
+    @staticmethod
+    def _parse(answer: Any, expected_ids: set) -> Dict[str, SimpleCategorizedEmail]:
+        """Validate each item of the answer separately so one bad item doesn't sink the batch."""
+        items: Optional[List[Any]] = None
+        if isinstance(answer, str):
+            match = _JSON_ARRAY.search(answer)
+            if match:
+                try:
+                    items = json.loads(match.group(0))
+                except json.JSONDecodeError:
+                    items = None
+        if not isinstance(items, list):
+            return {}
+
+        results = {}
+        for item in items:
+            if isinstance(item, dict) and item.get("email_id") is not None:
+                item["email_id"] = str(item["email_id"])
+            try:
+                categorized = SimpleCategorizedEmail.model_validate(item)
+            except ValidationError:
+                continue
+            if categorized.email_id not in expected_ids:
+                continue
+            if not (categorized.category and categorized.priority and categorized.required_action):
+                continue
+            results[categorized.email_id] = categorized
+        return results
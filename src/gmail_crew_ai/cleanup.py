@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+
+import yaml
+from pydantic import BaseModel, Field
+
+from gmail_crew_ai.tools.gmail_tools import GmailArchiveTool, GmailDeleteTool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY_PATH = os.path.join(os.path.dirname(__file__), "config", "cleanup_policy.yaml")
+
+
+class CleanupPolicy(BaseModel):
+    """One server-side cleanup rule from cleanup_policy.yaml."""
+    name: str = Field(..., description="Policy name")
+    query: str = Field(..., description="Gmail search query (X-GM-RAW)")
+    action: Literal["delete", "archive"] = Field("delete", description="What to do with the matches")
+    mailbox: str = Field("INBOX", description="Mailbox to search")
+    limit: int = Field(1000, description="Maximum number of emails touched per run")
+    enabled: bool = Field(True, description="Whether the policy runs")
+
+
+class CleanupEngine:
+    """
+    Deterministic mailbox cleanup driven by Gmail searches.
+
+    Each policy is sent to the server as an X-GM-RAW query, so the work scales
+    with the number of matches rather than the size of the mailbox, and the
+    LLM is never involved in deciding mass deletes. Every run produces an
+    audit record with the exact query and the emails it touched.
+    """
+
+    def __init__(self, policies: List[CleanupPolicy], exclude: str = ""):
+        self.policies = policies
+        self.exclude = exclude.strip()
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = None) -> "CleanupEngine":
+        """Load the enabled policies from config/cleanup_policy.yaml (or the given path)."""
+        with open(path or DEFAULT_POLICY_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+        policies = [CleanupPolicy(**spec) for spec in config.get("policies", [])]
+        skipped = [policy.name for policy in policies if not policy.enabled]
+        if skipped:
+            logger.info("Cleanup policies not enabled: %s", ", ".join(skipped))
+        return cls([policy for policy in policies if policy.enabled], config.get("exclude", "") or "")
+
+    def build_query(self, policy: CleanupPolicy) -> str:
+        """The full Gmail query for a policy, including the global exclusions."""
+        return f"{policy.query} {self.exclude}".strip()
+
+    def run(self, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """
+        Search, then delete or archive the matches of each policy in bulk.
+
+        With `dry_run` only the matches are listed. Returns one audit entry per
+        policy: {policy, query, action, mailbox, matched, applied, emails}.
+        """
+        delete_tool = GmailDeleteTool()
+        archive_tool = GmailArchiveTool()
+        audit = []
+
+        for policy in self.policies:
+            query = self.build_query(policy)
+            # The tool that applies the policy also runs its search (GmailToolBase helpers)
+            tool = delete_tool if policy.action == "delete" else archive_tool
+            mail = tool._connect()
+            try:
+                mail.select(policy.mailbox, readonly=True)
+                uids = tool.search_raw(mail, query)
+                # Oldest first, capped by the policy limit
+                uids = sorted(uids, key=int)[:policy.limit]
+                emails = tool.fetch_summaries(mail, uids) if (dry_run and uids) else []
+            finally:
+                tool._disconnect(mail)
+
+            logger.info("Cleanup policy '%s': %d emails match %r", policy.name, len(uids), query)
+            if uids and not dry_run:
+                reason = f"Cleanup policy '{policy.name}' ({query})"
+                if policy.action == "delete":
+                    emails = delete_tool.delete_many(uids, reason, mailbox=policy.mailbox)
+                else:
+                    emails = archive_tool.archive_many(uids, reason, mailbox=policy.mailbox)
+
+            audit.append({
+                'policy': policy.name,
+                'query': query,
+                'action': policy.action,
+                'mailbox': policy.mailbox,
+                'matched': len(uids),
+                'applied': not dry_run,
+                'emails': emails,
+            })
+        return audit
+
+
+def write_audit_report(audit: List[Dict[str, Any]], path: str = "output/cleanup_policy_report.json"):
+    """Save a cleanup run's audit entries with a timestamp."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'run_at': datetime.now().isoformat(timespec="seconds"), 'policies': audit}, f, indent=2)
+    logger.info("Cleanup audit report saved to %s", path)
@@ -0,0 +1,124 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Separator GetUnreadEmailsTool puts between a message and its thread history
+PREVIOUS_MARKER = "\n\n--- Previous Messages ---\n"
+
+# Body token budgets per agent: the categorizer only needs the gist, the
+# response writer needs enough of the message to reply to it
+DEFAULT_TOKEN_BUDGETS = {
+    "categorizer": 1000,
+    "response_generator": 2500,
+}
+
+# Rough local estimate: GPT-style tokenizers average about four characters per token on English mail
+CHARS_PER_TOKEN = 4
+
+_ATTRIBUTION = re.compile(
+    r"(^|\s)(On [^\n]{1,200}? wrote:|-{2,} ?Original Message ?-{2,}|From: [^\n]{1,200}?\s+Sent: [^\n]{1,100}?\s+(To|Subject): )"
+)
+# The RFC 3676 "-- " delimiter and the stock mobile-client footers; other rules
+# ("____", "-----") are often just dividers inside the message
+_SIGNATURE_DELIMITER = re.compile(r"^-- ?$")
+_MOBILE_SIGNATURE = re.compile(
+    r"^(Sent from my (iPhone|iPad|Android( device| phone)?|Samsung [\w ]+|Galaxy[\w ]*|BlackBerry[\w ]*|mobile device)"
+    r"|Get Outlook for (iOS|Android))$",
+    re.IGNORECASE,
+)
+_BLANK_LINES = re.compile(r"\n\s*\n")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, good enough for budgeting prompts."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def strip_quoted(text: str) -> str:
+    """Drop '>' quoted lines, everything after a reply attribution, and the signature."""
+    match = _ATTRIBUTION.search(text)
+    if match:
+        text = text[:match.start()]
+
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith(">"):
+            continue
+        if _SIGNATURE_DELIMITER.match(line.rstrip("\r\n")) or _MOBILE_SIGNATURE.match(stripped):
+            break
+        lines.append(line.rstrip())
+    return "\n".join(lines).strip()
+
+
+def _paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in _BLANK_LINES.split(text) if p.strip()]
+
+
+def truncate_to_budget(text: str, token_budget: int) -> Tuple[str, bool]:
+    """Cut text at a word boundary so it fits the token budget."""
+    if estimate_tokens(text) <= token_budget:
+        return text, False
+    limit = max(token_budget, 1) * CHARS_PER_TOKEN
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip() + " [...]", True
+
+
+def compact_body(body: Optional[str], token_budget: int = DEFAULT_TOKEN_BUDGETS["categorizer"]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Shrink an email body (with its thread history) before it goes into a prompt.
+
+    Quoted lines, reply attributions and signatures are stripped from every
+    message in the thread, paragraphs already seen earlier in the thread are
+    dropped, and the result is truncated to `token_budget`. The current
+    message comes first, so truncation cuts into thread history before it
+    touches the current message.
+
+    Returns the compacted text and its size stats.
+    """
+    body = body or ""
+    header = ""
+    rest = body
+    if body.startswith("EMAIL DATE:"):
+        header, _, rest = body.partition("\n\n")
+
+    seen = set()
+    sections = []
+    for section in rest.split(PREVIOUS_MARKER):
+        kept = []
+        for paragraph in _paragraphs(strip_quoted(section)):
+            key = _WHITESPACE.sub(" ", paragraph).lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(paragraph)
+        if kept:
+            sections.append("\n\n".join(kept))
+
+    text = PREVIOUS_MARKER.join(sections)
+    if header:
+        text = f"{header}\n\n{text}"
+    text, truncated = truncate_to_budget(text, token_budget)
+
+    return text, {
+        'original_chars': len(body),
+        'compacted_chars': len(text),
+        'original_tokens': estimate_tokens(body),
+        'compacted_tokens': estimate_tokens(text),
+        'truncated': truncated,
+    }
+
+
+def summarize_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals over a batch of compact_body() stats."""
+    original = sum(s['original_tokens'] for s in stats)
+    compacted = sum(s['compacted_tokens'] for s in stats)
+    return {
+        'emails': len(stats),
+        'original_chars': sum(s['original_chars'] for s in stats),
+        'compacted_chars': sum(s['compacted_chars'] for s in stats),
+        'original_tokens': original,
+        'compacted_tokens': compacted,
+        'truncated': sum(1 for s in stats if s['truncated']),
+        'saved_ratio': 1 - compacted / original if original else 0.0,
+    }
@@ -1,16 +1,40 @@
 from crewai import Agent, Crew, Process, Task, LLM
-from crewai.project import CrewBase, agent, crew, task, before_kickoff
-from crewai_tools import FileReadTool
+from crewai.project import CrewBase, agent, crew, task, before_kickoff, after_kickoff
+from crewai.tasks.task_output import TaskOutput
 import json
+import logging
 import os
+import time
 from typing import List, Dict, Any, Callable
 from pydantic import SkipValidation
 from datetime import date, datetime
 
-from gmail_crew_ai.tools.gmail_tools import GetUnreadEmailsTool, SaveDraftTool, GmailOrganizeTool, GmailDeleteTool, EmptyTrashTool
+from gmail_crew_ai.tools.gmail_tools import GetUnreadEmailsTool, SaveDraftTool, GmailOrganizeTool, GmailDeleteTool, GmailArchiveTool, EmptyTrashTool
 from gmail_crew_ai.tools.slack_tool import SlackNotificationTool
+from gmail_crew_ai.tools.slack_notifier import flush_slack_notifiers
 from gmail_crew_ai.tools.date_tools import DateCalculationTool
 from gmail_crew_ai.models import CategorizedEmail, OrganizedEmail, EmailResponse, SlackNotification, EmailCleanupInfo, SimpleCategorizedEmail, EmailDetails
+from gmail_crew_ai.rules import RuleEngine, RuleMatch
+from gmail_crew_ai.batch_categorizer import DEFAULT_PROMPT_BUDGET, BatchCategorizer, categorization_rules
+from gmail_crew_ai.compaction import DEFAULT_TOKEN_BUDGETS, compact_body, summarize_stats
+from gmail_crew_ai.llm_cache import CachedLLM, get_llm_cache, email_content_key, prompt_version
+from gmail_crew_ai.metrics import EMAILS_PROCESSED, LAST_RUN, REGISTRY, RUNS
+from gmail_crew_ai.tracing import get_tracer, span
+
+logger = logging.getLogger(__name__)
+
+# Email fields the agents actually read
+PAYLOAD_FIELDS = ("email_id", "subject", "sender", "date", "age_days", "body")
+
+def compact_email_payload(emails: List[Dict[str, Any]], body_field: str = "body") -> str:
+	"""
+	Serialize emails for a prompt: only the fields agents use, no indentation.
+	
+	`body_field` picks which version of the body goes in (e.g. the one
+	compacted to the response writer's budget), falling back to "body".
+	"""
+	return json.dumps([dict({key: email.get(key) for key in PAYLOAD_FIELDS}, body=email.get(body_field, email.get("body")))
+					   for email in emails], ensure_ascii=False, separators=(",", ":"))
 
 @CrewBase
 class GmailCrewAi():
@@ -21,23 +45,239 @@ class GmailCrewAi():
 	@before_kickoff
 	def fetch_emails(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
 		"""Fetch emails before starting the crew and calculate ages."""
-		print("Fetching emails before starting the crew...")
+		# Report paths in tasks.yaml are relative to output_dir
+		output_dir = inputs.setdefault('output_dir', 'output')
+		os.makedirs(output_dir, exist_ok=True)
+		self._output_dir = output_dir
+		
+		# In parallel mode the coordinator has already fetched this crew's share of the emails
+		emails = inputs.pop('email_batch', None)
+		if emails is None:
+			logger.info("Fetching emails before starting the crew...")
+			with span("crew.collect_emails", limit=inputs.get('email_limit')) as attrs:
+				emails = self.collect_emails(inputs)
+				attrs['emails'] = len(emails)
+		
+		# The emails go straight into the task prompts; the file is only an audit copy
+		inputs['emails_json'] = compact_email_payload(emails)
+		# The response writer drafts from bodies kept at its own, larger budget
+		inputs['response_emails_json'] = compact_email_payload(emails, body_field='response_body')
+		if inputs.get('audit_fetched_emails', True):
+			with open(os.path.join(output_dir, 'fetched_emails.json'), 'w') as f:
+				f.write(inputs['emails_json'])
+		
+		logger.info("Fetched %d emails for the crew", len(emails))
 		
+		# Batch mode: categorize K emails per LLM call instead of through the categorizer agent.
+		# Otherwise cached categorizations stand in for the task when every email has one.
+		categorized = inputs.pop('precategorized', None)
+		if categorized is None and emails:
+			if inputs.get('batch_categorization', False):
+				categorized = self.categorize_emails(emails, inputs)
+			else:
+				categorized = self.cached_categorizations()
+		if emails and categorized and all(email['email_id'] in categorized for email in emails):
+			self._use_precategorized([categorized[email['email_id']] for email in emails], output_dir)
+		
+		# Parallel mode runs cleanup once over every batch instead of once per batch
+		skip_tasks = inputs.pop('skip_tasks', None)
+		if skip_tasks:
+			self._skip_tasks(skip_tasks)
+		
+		return inputs
+	
+	def categorize_emails(self, emails: List[Dict[str, Any]], inputs: Dict[str, Any]) -> Dict[str, SimpleCategorizedEmail]:
+		"""
+		Categorize emails in batched LLM calls and cache the results by email content.
+		
+		Emails with a cached categorization, or already sent to the LLM while
+		they were being fetched, are not sent again; only the rest are
+		categorized here.
+		"""
+		streamed = dict(getattr(self, '_stream_categorized', {}), **self.cached_categorizations())
+		remaining = [email for email in emails if email['email_id'] not in streamed]
+		categorized = {email['email_id']: streamed[email['email_id']] for email in emails
+					   if streamed.get(email['email_id']) is not None}
+		if remaining:
+			categorized.update(self._batch_categorizer(inputs).categorize(remaining))
+		cached = self.cached_categorizations()
+		for email_id, result in categorized.items():
+			if email_id not in cached:
+				EMAILS_PROCESSED.inc(category=result.category, source="llm_batch")
+		
+		llm_cache = get_llm_cache()
+		cache_keys = getattr(self, '_email_cache_keys', {})
+		if llm_cache:
+			for email_id, result in categorized.items():
+				if cache_keys.get(email_id):
+					llm_cache.put_model("categorization", cache_keys[email_id], result)
+		return categorized
+	
+	def cached_categorizations(self) -> Dict[str, SimpleCategorizedEmail]:
+		"""Categorizations of this run's emails answered from the LLM cache, by email ID."""
+		return dict(getattr(self, '_cached_categorized', {}))
+	
+	def _batch_categorizer(self, inputs: Dict[str, Any]) -> BatchCategorizer:
+		return BatchCategorizer(
+			self.llm,
+			categorization_rules(self.tasks_config['categorization_task']['description']),
+			prompt_budget=inputs.get('categorization_token_budget', DEFAULT_PROMPT_BUDGET),
+		)
+	
+	def _use_precategorized(self, categorized: List[SimpleCategorizedEmail], output_dir: str):
+		"""Stand in for the categorization task: write its report, set its output and take it out of the crew."""
+		raw = json.dumps([result.model_dump() for result in categorized], indent=2)
+		with open(os.path.join(output_dir, 'categorization_report.json'), 'w') as f:
+			f.write(raw)
+		
+		task = self.categorization_task()
+		task.output = TaskOutput(
+			name=task.name,
+			description=task.description,
+			expected_output=task.expected_output,
+			raw=raw,
+			agent=task.agent.role if task.agent else "categorizer",
+		)
+		crew = self.crew()
+		if task in crew.tasks:
+			crew.tasks.remove(task)
+		logger.info("Using %d batch categorizations; skipping the categorization task", len(categorized))
+	
+	def _skip_tasks(self, names: List[str]):
+		"""Take the named tasks out of this crew."""
+		crew = self.crew()
+		for name in names:
+			task = getattr(self, name)()
+			if task in crew.tasks:
+				crew.tasks.remove(task)
+		logger.info("Skipping tasks: %s", ", ".join(names))
+	
+	def collect_emails(self, inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+		"""
+		Fetch unread emails, apply rules and cached categorizations, and return
+		the remaining emails (as dicts) that still need the crew.
+		
+		The fetch runs on a background thread and feeds a bounded queue
+		(`fetch_queue_size` emails deep), so each email is parsed, matched and
+		compacted while later ones are still downloading. In batch
+		categorization mode the LLM batches are sent from here as soon as they
+		fill up, and categorize_emails() reuses their answers.
+		"""
 		# Get the email limit from inputs
 		email_limit = inputs.get('email_limit', 5)
-		print(f"Fetching {email_limit} emails...")
+		logger.info("Fetching %s emails...", email_limit)
 		
 		# Create the output directory if it doesn't exist
-		os.makedirs("output", exist_ok=True)
+		output_dir = inputs.get('output_dir', 'output')
+		os.makedirs(output_dir, exist_ok=True)
 		
 		# Use the GetUnreadEmailsTool directly
 		email_tool = GetUnreadEmailsTool()
-		email_tuples = email_tool._run(limit=email_limit)
 		
-		# Convert email tuples to EmailDetails objects with pre-calculated ages
+		# Deterministic rules decide on obvious automated mail without the LLM.
+		# In two-phase mode they run on headers, so matched mail never downloads a body.
+		# Rule deletions are opt-in (rule_deletes); without it the cleaner agent decides.
+		rule_engine = RuleEngine.from_config(allow_delete=inputs.get('rule_deletes', False)) if inputs.get('rule_preclassify', True) else None
+		header_filter = None
+		if rule_engine:
+			header_filter = lambda header: rule_engine.classify_headers(header) is None
+		
+		# Incremental sync: only pull mail newer than the last processed UID
+		self._sync_plan = None
+		since_uid = None
+		if inputs.get('incremental_sync', True):
+			self._sync_plan = email_tool.plan_sync()
+			since_uid = self._sync_plan['since_uid']
+			logger.info("Sync checkpoint: %s", since_uid or 'none (first sync, oldest unread first)')
+		
+		self._fetched_email_ids = []
+		self._fetch_failed = False
+		self._stream_categorized = {}
+		self._cached_categorized = {}
+		self._email_cache_keys = {}
+		
+		# Bodies are compacted to each agent's token budget before they reach a prompt
+		compaction_stats = []
+		rule_results = []
 		emails = []
+		
+		if self._sync_plan and self._sync_plan['unchanged']:
+			logger.info("No new mail since the last run.")
+		else:
+			stream = email_tool.stream_unread_emails(
+				queue_size=inputs.get('fetch_queue_size'),
+				limit=email_limit,
+				batch_size=inputs.get('fetch_batch_size'),
+				two_phase=inputs.get('two_phase_fetch'),
+				max_body_bytes=inputs.get('max_body_bytes'),
+				since_uid=since_uid,
+				header_filter=header_filter,
+			)
+			candidates = self._prepare_emails(stream, inputs, rule_engine, rule_results, compaction_stats)
+			categorizer = self._batch_categorizer(inputs) if inputs.get('batch_categorization', False) else None
+			try:
+				with stream:
+					if categorizer:
+						for email, result in categorizer.categorize_iter(candidates, known=self._cached_categorized):
+							emails.append(email)
+							self._stream_categorized[email['email_id']] = result
+					else:
+						emails.extend(candidates)
+			except Exception as e:
+				# Keep whatever arrived before the failure, as the blocking fetch did,
+				# but don't let the checkpoint move past the mail that never arrived
+				self._fetch_failed = True
+				logger.exception("Exception while fetching emails: %s", e)
+			logger.debug("Fetch queue: %d emails, fetch waited %.2fs on a full queue, processing waited %.2fs for mail",
+						 stream.produced, stream.producer_blocked, stream.consumer_waited)
+			if categorizer:
+				logger.info("Batch categorization: %d/%d emails in %d LLM calls while fetching",
+							sum(result is not None for result in self._stream_categorized.values()),
+							len(emails), categorizer.calls)
+		# The fetch raises on a failed SEARCH or any unfetched message, so without a failure
+		# every UID the SEARCH found was fetched, and fewer than the limit means none are left
+		self._sync_drained = not self._fetch_failed and len(self._fetched_email_ids) < email_limit
+		
+		self._compaction_summary = summarize_stats(compaction_stats)
+		if compaction_stats:
+			with open(os.path.join(output_dir, 'compaction_stats.json'), 'w') as f:
+				json.dump({'summary': self._compaction_summary, 'emails': compaction_stats}, f, indent=2)
+			logger.info("Compacted bodies: %s -> %s estimated tokens",
+						self._compaction_summary['original_tokens'], self._compaction_summary['compacted_tokens'])
+		
+		for email_detail, match in rule_results:
+			EMAILS_PROCESSED.inc(category=match.category, source="llm_cache" if match.rule == "llm_cache" else "rule")
+		
+		if rule_results:
+			report_path = os.path.join(output_dir, 'rule_categorization_report.json')
+			with open(report_path, 'w') as f:
+				json.dump([dict(match.to_categorized(email_detail).model_dump(), rule=match.rule)
+						   for email_detail, match in rule_results], f, indent=2)
+			logger.info("Pre-classified %d emails by rule (%s)", len(rule_results), report_path)
+			if inputs.get('rule_actions', True):
+				self._apply_rule_actions(rule_results)
+		
+		return emails
+	
+	def _prepare_emails(self, email_tuples, inputs: Dict[str, Any], rule_engine, rule_results: list,
+						compaction_stats: list):
+		"""
+		Turn fetched email tuples into prompt-ready email dicts, one at a time.
+		
+		Emails decided by a rule or a cached low-priority categorization go to
+		`rule_results` instead of being yielded. Other cached categorizations
+		are kept in `_cached_categorized` so the email skips categorization.
+		"""
+		# Content-hash cache of earlier categorizations (re-runs, retries, duplicate blasts)
+		llm_cache = get_llm_cache()
+		cache_version = prompt_version(self.llm.model)
+		body_budget = inputs.get('body_token_budget', DEFAULT_TOKEN_BUDGETS['categorizer'])
+		response_budget = inputs.get('response_body_token_budget', DEFAULT_TOKEN_BUDGETS['response_generator'])
+		
+		# Convert email tuples to EmailDetails objects with pre-calculated ages
 		today = date.today()
 		for email_tuple in email_tuples:
+			self._fetched_email_ids.append(email_tuple[3])
 			email_detail = EmailDetails.from_email_tuple(email_tuple)
 			
 			# Calculate age if date is available
@@ -45,22 +285,119 @@ class GmailCrewAi():
 				try:
 					email_date_obj = datetime.strptime(email_detail.date, "%Y-%m-%d").date()
 					email_detail.age_days = (today - email_date_obj).days
-					print(f"Email date: {email_detail.date}, age: {email_detail.age_days} days")
+					logger.debug("Email date: %s, age: %s days", email_detail.date, email_detail.age_days)
 				except Exception as e:
-					print(f"Error calculating age for email date {email_detail.date}: {e}")
+					logger.warning("Could not calculate age for email date %s: %s", email_detail.date, e)
 					email_detail.age_days = None
 			
-			emails.append(email_detail.dict())
+			rule_match = rule_engine.classify_email(email_detail) if rule_engine else None
+			if rule_match:
+				rule_results.append((email_detail, rule_match))
+				continue
+			
+			response_body = None
+			if inputs.get('compact_bodies', True):
+				response_body, _ = compact_body(email_detail.body, response_budget)
+				email_detail.body, stats = compact_body(email_detail.body, body_budget)
+				compaction_stats.append(dict(stats, email_id=email_detail.email_id))
+			
+			cache_key = email_content_key(email_detail.subject, email_detail.sender, email_detail.body, cache_version)
+			self._email_cache_keys[email_detail.email_id] = cache_key
+			cached = llm_cache.get_model("categorization", cache_key, SimpleCategorizedEmail) if llm_cache else None
+			if cached and cached.priority == "LOW":
+				# Low-priority mail needs no draft or notification, so the cached verdict is all we need
+				rule_results.append((email_detail, RuleMatch(
+					rule="llm_cache",
+					category=cached.category,
+					priority=cached.priority,
+					required_action=cached.required_action,
+					labels=[cached.category] if cached.category else [],
+				)))
+				continue
+			if cached:
+				# Same content as an email categorized before: reuse the verdict, not the identity
+				self._cached_categorized[email_detail.email_id] = cached.model_copy(update={
+					'email_id': email_detail.email_id,
+					'subject': email_detail.subject,
+					'sender': email_detail.sender,
+					'date': email_detail.date,
+					'age_days': email_detail.age_days,
+				})
+				EMAILS_PROCESSED.inc(category=cached.category, source="llm_cache")
+			
+			email = email_detail.dict()
+			if response_body is not None:
+				email['response_body'] = response_body
+			yield email
+	
+	def _apply_rule_actions(self, rule_results):
+		"""Label and clean up rule-classified emails the way the organizer and cleaner agents would."""
+		deletions = {}
+		decisions = []
+		for email_detail, match in rule_results:
+			if match.delete:
+				deletions.setdefault(match.rule, []).append(email_detail.email_id)
+			elif match.labels or match.star:
+				decisions.append((email_detail.email_id, list(match.labels), match.star))
 		
-		# Save emails to file
-		with open('output/fetched_emails.json', 'w') as f:
-			json.dump(emails, f, indent=2)
+		if deletions:
+			delete_tool = GmailDeleteTool()
+			for rule, email_ids in deletions.items():
+				try:
+					delete_tool.delete_many(email_ids, reason=f"Matched rule '{rule}'")
+				except Exception as e:
+					logger.error("Could not delete emails matched by rule '%s': %s", rule, e)
 		
-		print(f"Fetched and saved {len(emails)} emails to output/fetched_emails.json")
+		if decisions:
+			try:
+				GmailOrganizeTool().organize_many(decisions)
+			except Exception as e:
+				logger.error("Could not organize rule-classified emails: %s", e)
+
+	@after_kickoff
+	def save_sync_checkpoint(self, result):
+		"""Advance the sync checkpoint once the crew has processed the fetched emails."""
+		if getattr(self, '_fetch_failed', False):
+			logger.warning("The fetch failed partway; leaving the sync checkpoint where it was.")
+		elif getattr(self, '_sync_plan', None) is not None:
+			GetUnreadEmailsTool().commit_sync(self._sync_plan, self._fetched_email_ids, drained=self._sync_drained)
+		return result
+	
+	@after_kickoff
+	def store_llm_results(self, result):
+		"""Cache this run's categorization results by email content."""
+		llm_cache = get_llm_cache()
+		if llm_cache is None:
+			return result
+		cache_keys = getattr(self, '_email_cache_keys', {})
+		for task_output in getattr(result, 'tasks_output', None) or []:
+			output = getattr(task_output, 'pydantic', None)
+			if not isinstance(output, SimpleCategorizedEmail):
+				continue
+			cache_key = cache_keys.get(output.email_id)
+			if cache_key:
+				llm_cache.put_model("categorization", cache_key, output)
 		
-		return inputs
+		stats = llm_cache.stats()
+		logger.info("LLM cache: %d hits, %d misses (%.0f%% hit rate)", stats['hits'], stats['misses'], stats['hit_rate'] * 100)
+		return result
 	
-	llm = LLM(
+	@after_kickoff
+	def flush_notifications(self, result):
+		"""Wait for queued Slack notifications to go out before reporting the run as done."""
+		if not flush_slack_notifiers(timeout=float(os.environ.get("SLACK_FLUSH_TIMEOUT_SECONDS", "60"))):
+			logger.warning("Some Slack notifications are still queued; they will keep sending in the background.")
+		return result
+	
+	@after_kickoff
+	def export_metrics(self, result):
+		"""Count the finished run and write the metrics textfile."""
+		RUNS.inc(result="ok")
+		LAST_RUN.set(time.time())
+		REGISTRY.write_textfile()
+		return result
+	
+	llm = CachedLLM(
 		model="openai/gpt-4o-mini",
 		api_key=os.getenv("OPENAI_API_KEY"),
 	)
@@ -70,7 +407,7 @@ class GmailCrewAi():
 		"""The email categorizer agent."""
 		return Agent(
 			config=self.agents_config['categorizer'],
-			tools=[FileReadTool()],
+			tools=[],
 			llm=self.llm,
 		)
 
@@ -79,7 +416,7 @@ class GmailCrewAi():
 		"""The email organization agent."""
 		return Agent(
 			config=self.agents_config['organizer'],
-			tools=[GmailOrganizeTool(), FileReadTool()],
+			tools=[GmailOrganizeTool()],
 			llm=self.llm,
 		)
 		
@@ -106,7 +443,7 @@ class GmailCrewAi():
 		"""The email cleanup agent."""
 		return Agent(
 			config=self.agents_config['cleaner'],
-			tools=[GmailDeleteTool(), EmptyTrashTool()],
+			tools=[GmailDeleteTool(), GmailArchiveTool(), EmptyTrashTool()],
 			llm=self.llm,
 		)
 
@@ -132,6 +469,7 @@ class GmailCrewAi():
 		return Task(
 			config=self.tasks_config['response_task'],
 			output_pydantic=EmailResponse,
+			async_execution=True,
 		)
 	
 	@task
@@ -140,6 +478,7 @@ class GmailCrewAi():
 		return Task(
 			config=self.tasks_config['notification_task'],
 			output_pydantic=SlackNotification,
+			async_execution=True,
 		)
 
 	@task
@@ -157,46 +496,97 @@ class GmailCrewAi():
 			agents=self.agents,
 			tasks=self.tasks,
 			process=Process.sequential,
-			verbose=True
+			verbose=True,
+			step_callback=self._step_callback,
+			task_callback=self._task_callback,
 		)
 
+	def _step_callback(self, step):
+		"""Crew step callback: log each agent step (tool call or final answer) at debug level."""
+		if logger.isEnabledFor(logging.DEBUG):
+			self._debug_callback("agent_step", {'step': step})
+
+	def _task_callback(self, output: TaskOutput):
+		"""
+		Crew task callback: count categorizations and record the task as a span
+		with the LLM tokens its agent used.
+
+		Token counts are the change in the agent's usage counters since its
+		previous task, so agents that run more than one task are not double counted.
+		"""
+		if isinstance(output.pydantic, SimpleCategorizedEmail):
+			EMAILS_PROCESSED.inc(category=output.pydantic.category, source="llm")
+		
+		task = next((t for t in self.tasks if t.output is output), None)
+		tracer = get_tracer()
+		if tracer is not None and task is not None:
+			tokens = {}
+			if task.agent is not None:
+				usage = task.agent._token_process.get_summary()
+				snapshots = self.__dict__.setdefault('_token_snapshots', {})
+				previous = snapshots.get(id(task.agent))
+				snapshots[id(task.agent)] = usage
+				for field in ('prompt_tokens', 'completion_tokens', 'cached_prompt_tokens', 'successful_requests'):
+					tokens[field] = getattr(usage, field) - (getattr(previous, field) if previous else 0)
+			tracer.record_tokens(task.name, prompt_tokens=tokens.get('prompt_tokens', 0),
+								 completion_tokens=tokens.get('completion_tokens', 0),
+								 cached_prompt_tokens=tokens.get('cached_prompt_tokens', 0),
+								 requests=tokens.get('successful_requests', 0))
+			if task.start_time and task.end_time:
+				tracer.record_span(f"task.{task.name}", task.start_time.timestamp(),
+								   (task.end_time - task.start_time).total_seconds(),
+								   agent=(output.agent or '').strip(), **tokens)
+		if logger.isEnabledFor(logging.DEBUG):
+			self._debug_callback("task_end", {'task_name': output.name, 'output': output.pydantic or output.raw})
+
 	def _debug_callback(self, event_type, payload):
 		"""Debug callback for crew events."""
 		if event_type == "task_start":
-			print(f"DEBUG: Starting task: {payload.get('task_name')}")
+			logger.debug("Starting task: %s", payload.get('task_name'))
 		elif event_type == "task_end":
-			print(f"DEBUG: Finished task: {payload.get('task_name')}")
-			print(f"DEBUG: Task output type: {type(payload.get('output'))}")
+			logger.debug("Finished task: %s", payload.get('task_name'))
+			logger.debug("Task output type: %s", type(payload.get('output')))
 			
 			# Add more detailed output inspection
 			output = payload.get('output')
+			if hasattr(output, 'model_dump'):
+				output = output.model_dump()
 			if output:
 				if isinstance(output, dict):
-					print(f"DEBUG: Output keys: {output.keys()}")
+					logger.debug("Output keys: %s", list(output.keys()))
 					for key, value in output.items():
-						print(f"DEBUG: {key}: {value[:100] if isinstance(value, str) and len(value) > 100 else value}")
+						logger.debug("%s: %s", key, value[:100] if isinstance(value, str) and len(value) > 100 else value)
 				elif isinstance(output, list):
-					print(f"DEBUG: Output list length: {len(output)}")
+					logger.debug("Output list length: %d", len(output))
 					if output and len(output) > 0:
-						print(f"DEBUG: First item type: {type(output[0])}")
+						logger.debug("First item type: %s", type(output[0]))
 						if isinstance(output[0], dict):
-							print(f"DEBUG: First item keys: {output[0].keys()}")
+							logger.debug("First item keys: %s", list(output[0].keys()))
 				else:
-					print(f"DEBUG: Output: {str(output)[:200]}...")
+					logger.debug("Output: %s...", str(output)[:200])
+		elif event_type == "agent_step":
+			step = payload.get('step')
+			if getattr(step, 'tool', None):
+				logger.debug("Agent used tool %s with input %s -> %s", step.tool, str(step.tool_input)[:200],
+							 str(getattr(step, 'result', ''))[:200])
+			elif hasattr(step, 'output'):
+				logger.debug("Agent final answer: %s", str(step.output)[:200])
+			else:
+				logger.debug("Agent step: %s", str(step)[:200])
 		elif event_type == "agent_start":
-			print(f"DEBUG: Agent starting: {payload.get('agent_name')}")
+			logger.debug("Agent starting: %s", payload.get('agent_name'))
 		elif event_type == "agent_end":
-			print(f"DEBUG: Agent finished: {payload.get('agent_name')}")
+			logger.debug("Agent finished: %s", payload.get('agent_name'))
 		elif event_type == "error":
-			print(f"DEBUG: Error: {payload.get('error')}")
+			logger.debug("Error: %s", payload.get('error'))
 
 	def _validate_categorization_output(self, output):
 		"""Validate the categorization output before writing to file."""
-		print(f"DEBUG: Validating categorization output: {output}")
+		logger.debug("Validating categorization output: %s", output)
 		
 		# If output is empty or invalid, provide a default
 		if not output:
-			print("WARNING: Empty categorization output, providing default")
+			logger.warning("Empty categorization output, providing default")
 			return {
 				"email_id": "",
 				"subject": "",
@@ -218,15 +608,15 @@ class GmailCrewAi():
 					if json_start >= 0 and json_end > json_start:
 						json_str = output[json_start:json_end]
 						parsed = json.loads(json_str)
-						print("DEBUG: Successfully extracted and parsed JSON from answer")
+						logger.debug("Successfully extracted and parsed JSON from answer")
 						return parsed
 				
 				# Try to parse the whole string as JSON
 				parsed = json.loads(output)
-				print("DEBUG: Successfully parsed string output as JSON")
+				logger.debug("Successfully parsed string output as JSON")
 				return parsed
 			except Exception as e:
-				print(f"WARNING: Output is a string but not valid JSON: {e}")
+				logger.warning("Output is a string but not valid JSON: %s", e)
 				# Try to extract anything that looks like JSON
 				import re
 				json_pattern = r'\{.*\}'
@@ -235,10 +625,10 @@ class GmailCrewAi():
 					try:
 						json_str = match.group(0)
 						parsed = json.loads(json_str)
-						print("DEBUG: Successfully extracted and parsed JSON using regex")
+						logger.debug("Successfully extracted and parsed JSON using regex")
 						return parsed
 					except:
-						print("WARNING: Failed to parse extracted JSON")
+						logger.warning("Failed to parse extracted JSON")
 		
 		# If output is already a dict, make sure it has the required fields
 		if isinstance(output, dict):
@@ -246,23 +636,23 @@ class GmailCrewAi():
 			missing_fields = [field for field in required_fields if field not in output]
 			
 			if missing_fields:
-				print(f"WARNING: Output missing required fields: {missing_fields}")
+				logger.warning("Output missing required fields: %s", missing_fields)
 				# Add missing fields with empty values
 				for field in missing_fields:
 					output[field] = ""
 			
 			# Check if the values match the expected format
 			if output.get("email_id") == "12345" and output.get("subject") == "Urgent Task Update":
-				print("WARNING: Output contains placeholder values, trying to fix")
+				logger.warning("Output contains placeholder values, trying to fix")
 				# Try to get the real email ID from the fetched emails
 				try:
-					with open("output/fetched_emails.json", "r") as f:
+					with open(os.path.join(getattr(self, '_output_dir', 'output'), 'fetched_emails.json'), "r") as f:
 						fetched_emails = json.load(f)
 						if fetched_emails and len(fetched_emails) > 0:
 							real_email = fetched_emails[0]
 							output["email_id"] = real_email.get("email_id", "")
 							output["subject"] = real_email.get("subject", "")
 				except Exception as e:
-					print(f"WARNING: Failed to fix placeholder values: {e}")
+					logger.warning("Failed to fix placeholder values: %s", e)
 		
 		return output
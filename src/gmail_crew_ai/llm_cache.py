@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+
+from crewai import LLM
+from pydantic import BaseModel
+
+from gmail_crew_ai.metrics import LLM_CACHE_LOOKUPS, LLM_CALLS
+from gmail_crew_ai.tools.state import state_path
+from gmail_crew_ai.tracing import span
+
+# Bump when prompt handling changes in a way the config files don't capture
+CACHE_VERSION = "1"
+
+CONFIG_DIR = os.path.join(os.path.dirname(__file__), "config")
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Collapse whitespace and case so trivially different copies hash the same."""
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+def prompt_version(model: str = "") -> str:
+    """Hash of the agent/task prompts, the model and CACHE_VERSION."""
+    digest = hashlib.sha256(f"{CACHE_VERSION}|{model}".encode())
+    for name in ("agents.yaml", "tasks.yaml"):
+        try:
+            with open(os.path.join(CONFIG_DIR, name), "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+    return digest.hexdigest()[:16]
+
+
+def email_content_key(subject: Optional[str], sender: Optional[str], body: Optional[str], version: str) -> str:
+    """Cache key for an email: its normalized subject, sender and cleaned body plus the prompt version."""
+    payload = "\x1f".join([version, normalize_text(subject), normalize_text(sender), normalize_text(body)])
+    return hashlib.sha256(payload.encode("utf-8", errors="replace")).hexdigest()
+
+
+class LLMResultCache:
+    """
+    Persistent cache of LLM results with TTL expiry, LRU eviction and hit-rate counters.
+
+    Entries live in namespaces ("llm" for raw completions, "categorization"
+    for per-email categorization results).
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: float = 7 * 86400, max_entries: int = 5000):
+        self.path = path or state_path("llm_cache.sqlite")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT,
+                key TEXT,
+                value TEXT,
+                created_at REAL,
+                last_access REAL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self._db.commit()
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        """Return a cached value, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                self._db.commit()
+                row = None
+            if row is None:
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                LLM_CACHE_LOOKUPS.inc(namespace=namespace, result="miss")
+                return None
+            self._db.execute(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?", (now, namespace, key)
+            )
+            self._db.commit()
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+            LLM_CACHE_LOOKUPS.inc(namespace=namespace, result="hit")
+            return row[0]
+
+    def put(self, namespace: str, key: str, value: str):
+        """Store a value, evicting the least recently used entries beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", (namespace, key, value, now, now)
+            )
+            count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if count > self.max_entries:
+                self._db.execute(
+                    "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._db.commit()
+
+    def get_model(self, namespace: str, key: str, model_cls: Type[ModelT]) -> Optional[ModelT]:
+        """Return a cached pydantic result (e.g. SimpleCategorizedEmail), or None."""
+        value = self.get(namespace, key)
+        if value is None:
+            return None
+        try:
+            return model_cls.model_validate_json(value)
+        except Exception:
+            return None
+
+    def put_model(self, namespace: str, key: str, model: BaseModel):
+        self.put(namespace, key, model.model_dump_json())
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counts and hit rate for this process."""
+        hits = sum(self.hits.values())
+        misses = sum(self.misses.values())
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / total if total else 0.0,
+            'by_namespace': {
+                ns: {'hits': self.hits.get(ns, 0), 'misses': self.misses.get(ns, 0)}
+                for ns in sorted(set(self.hits) | set(self.misses))
+            },
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache: Optional[LLMResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResultCache]:
+    """Return the process-wide LLM cache, or None when LLM_CACHE_ENABLED=0."""
+    global _cache
+    if os.environ.get("LLM_CACHE_ENABLED", "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMResultCache(
+                    ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_HOURS", "168")) * 3600,
+                    max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000")),
+                )
+    return _cache
+
+
+class CachedLLM(LLM):
+    """
+    LLM that answers repeated prompts from the persistent cache.
+
+    The key covers the model, temperature, prompt version and the normalized
+    message list, so replaying a batch after a crash (or re-running the same
+    inputs) costs no model calls. Tools still run as usual; only the
+    completions are reused.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prompt_version = prompt_version(self.model)
+
+    def call(self, messages: Union[str, List[Dict[str, str]]], tools: Optional[List[dict]] = None,
+             callbacks: Optional[List[Any]] = None, available_functions: Optional[Dict[str, Any]] = None) -> Union[str, Any]:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        with span("llm.call", model=self.model) as attrs:
+            attrs['prompt_chars'] = sum(len(str(m.get("content", ""))) for m in messages)
+            result = self._cached_call(messages, tools, callbacks, available_functions, attrs)
+            attrs['response_chars'] = len(result) if isinstance(result, str) else None
+        LLM_CALLS.inc(model=self.model, cached=attrs['cached'])
+        return result
+
+    def _cached_call(self, messages: List[Dict[str, str]], tools: Optional[List[dict]], callbacks: Optional[List[Any]],
+                     available_functions: Optional[Dict[str, Any]], attrs: Dict[str, Any]) -> Union[str, Any]:
+        cache = get_llm_cache()
+        attrs['cached'] = False
+        if cache is None or tools or available_functions:
+            return super().call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+
+        payload = json.dumps(
+            [self.model, self.temperature, self._prompt_version,
+             [(m.get("role"), re.sub(r"\s+", " ", str(m.get("content", ""))).strip()) for m in messages]],
+            sort_keys=True,
+        )
+        key = hashlib.sha256(payload.encode("utf-8", errors="replace")).hexdigest()
+
+        cached = cache.get("llm", key)
+        if cached is not None:
+            attrs['cached'] = True
+            return cached
+
+        result = super().call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+        if isinstance(result, str) and result.strip():
+            cache.put("llm", key, result)
+        return result
@@ -1,5 +1,8 @@
 #!/usr/bin/env python
+import logging
+import os
 import sys
+import time
 import warnings
 from dotenv import load_dotenv
 
@@ -12,32 +15,62 @@ warnings.filterwarnings("ignore", message=".*not a Python type.*")
 # Keep your existing warning filter
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
+from gmail_crew_ai import parallel
+from gmail_crew_ai.cleanup import CleanupEngine, write_audit_report
 from gmail_crew_ai.crew import GmailCrewAi
+from gmail_crew_ai.metrics import REGISTRY, RUNS, start_metrics_server
+from gmail_crew_ai.tracing import configure_logging, get_tracer, span
+from gmail_crew_ai.tools.gmail_tools import GetUnreadEmailsTool
+from gmail_crew_ai.tools.imap_idle import IdleWatcher
+
+logger = logging.getLogger(__name__)
+
+def _ask_email_limit() -> int:
+    """Ask the user how many emails to process."""
+    try:
+        email_limit = input("How many emails would you like to process? (default: 5): ")
+        if email_limit.strip() == "":
+            return 5
+        email_limit = int(email_limit)
+        if email_limit <= 0:
+            print("Number must be positive. Using default of 5.")
+            return 5
+        return email_limit
+    except ValueError:
+        print("Invalid input. Using default of 5 emails.")
+        return 5
+
+def _report_trace():
+    """Print the per-stage timing, IMAP and token summary and append it to the trace file."""
+    tracer = get_tracer()
+    if tracer is None:
+        return
+    tracer.write_summary()
+    print("\nRun summary:")
+    print(tracer.summary_table())
+    if tracer.path:
+        print(f"Trace written to {tracer.path}")
+    tracer.close()
 
 def run():
     """Run the Gmail Crew AI."""
     try:
         # Load environment variables
         load_dotenv()
+        configure_logging()
+        start_metrics_server()
         
         # Get user input for number of emails to process
-        try:
-            email_limit = input("How many emails would you like to process? (default: 5): ")
-            if email_limit.strip() == "":
-                email_limit = 5
-            else:
-                email_limit = int(email_limit)
-                if email_limit <= 0:
-                    print("Number must be positive. Using default of 5.")
-                    email_limit = 5
-        except ValueError:
-            print("Invalid input. Using default of 5 emails.")
-            email_limit = 5
+        email_limit = _ask_email_limit()
         
         print(f"Processing {email_limit} emails...")
         
         # Create and run the crew with the specified email limit
-        result = GmailCrewAi().crew().kickoff(inputs={'email_limit': email_limit})
+        try:
+            with span("crew.kickoff", email_limit=email_limit):
+                result = GmailCrewAi().crew().kickoff(inputs={'email_limit': email_limit})
+        finally:
+            _report_trace()
         
         # Check if result is empty or None
         if not result:
@@ -54,7 +87,165 @@ def run():
             return 0  # Still consider this a success
     except Exception as e:
         print(f"\nError: {e}")
+        RUNS.inc(result="error")
+        REGISTRY.write_textfile()
         return 1  # Return error code
 
+def run_parallel():
+    """
+    Run the Gmail Crew AI with one crew per email (or small batch) in parallel.
+
+    Concurrency is controlled by CREW_CONCURRENCY and the number of emails per
+    crew by CREW_BATCH_SIZE. Reports are merged into the usual output files.
+    """
+    try:
+        load_dotenv()
+        configure_logging()
+        start_metrics_server()
+        email_limit = _ask_email_limit()
+        concurrency = int(os.environ.get("CREW_CONCURRENCY", "4"))
+        batch_size = int(os.environ.get("CREW_BATCH_SIZE", "1"))
+        print(f"Processing {email_limit} emails with up to {concurrency} parallel crews...")
+        
+        try:
+            with span("crew.run_parallel", email_limit=email_limit, concurrency=concurrency):
+                results = parallel.run_parallel({'email_limit': email_limit}, concurrency=concurrency, batch_size=batch_size)
+        finally:
+            _report_trace()
+        
+        if not results:
+            print("\nNo emails were processed. Inbox might be empty.")
+            return 0
+        print("\nCrew execution completed successfully! 🎉")
+        print("Results have been saved to the output directory.")
+        return 0
+    except Exception as e:
+        print(f"\nError: {e}")
+        RUNS.inc(result="error")
+        REGISTRY.write_textfile()
+        return 1
+
+def run_cleanup():
+    """
+    Apply the server-side cleanup policy in config/cleanup_policy.yaml.
+
+    Set CLEANUP_DRY_RUN=1 to only list what would be deleted or archived.
+    """
+    try:
+        load_dotenv()
+        configure_logging()
+        dry_run = os.environ.get("CLEANUP_DRY_RUN", "0") == "1"
+        print(f"Running cleanup policy{' (dry run)' if dry_run else ''}...")
+        audit = CleanupEngine.from_config().run(dry_run=dry_run)
+        write_audit_report(audit)
+        return 0
+    except Exception as e:
+        print(f"\nError: {e}")
+        return 1
+
+def _process_pending(max_batch: int, max_rounds: int = 10):
+    """
+    Run the crew until the sync checkpoint has caught up with the inbox.
+
+    Stops early when a round leaves the checkpoint where it was (e.g. the
+    fetch keeps failing), so a stuck mailbox doesn't cost a crew run per round.
+    """
+    previous_uid = None
+    for _ in range(max_rounds):
+        plan = GetUnreadEmailsTool().plan_sync()
+        if plan['unchanged']:
+            return
+        if previous_uid is not None and plan['since_uid'] == previous_uid:
+            logger.warning("Sync checkpoint stuck at UID %s; waiting for the next wakeup.", previous_uid)
+            return
+        previous_uid = plan['since_uid']
+        logger.info("New mail detected, processing up to %d emails...", max_batch)
+        GmailCrewAi().crew().kickoff(inputs={'email_limit': max_batch, 'incremental_sync': True})
+
+def run_daemon():
+    """
+    Run the Gmail Crew AI as a long-running daemon.
+
+    Holds an IMAP IDLE session on INBOX and feeds new mail through the crew in
+    micro-batches. Batching is controlled by IDLE_MAX_WAIT_SECONDS (how long to
+    keep collecting after the first new message) and IDLE_MAX_BATCH_SIZE.
+    Set METRICS_PORT to serve Prometheus metrics on /metrics while it runs.
+    """
+    load_dotenv()
+    configure_logging()
+    start_metrics_server()
+    max_wait = float(os.environ.get("IDLE_MAX_WAIT_SECONDS", "10"))
+    max_batch = int(os.environ.get("IDLE_MAX_BATCH_SIZE", "20"))
+    email_address = os.environ.get("EMAIL_ADDRESS")
+    app_password = os.environ.get("APP_PASSWORD")
+    if not email_address or not app_password:
+        print("EMAIL_ADDRESS and APP_PASSWORD must be set in the environment.")
+        return 1
+
+    print(f"Starting IDLE daemon (max wait {max_wait}s, max batch {max_batch})...")
+    backoff = 5
+    while True:
+        watcher = None
+        try:
+            # Catch up on anything that arrived while we weren't listening
+            _process_pending(max_batch)
+
+            watcher = IdleWatcher(email_address, app_password, max_wait=max_wait, max_batch=max_batch)
+            backoff = 5
+            while True:
+                arrived = watcher.wait_for_batch()
+                if arrived:
+                    _process_pending(max_batch)
+        except KeyboardInterrupt:
+            print("\nStopping IDLE daemon.")
+            return 0
+        except Exception as e:
+            print(f"\nError in IDLE daemon: {e}. Reconnecting in {backoff}s...")
+            RUNS.inc(result="error")
+            REGISTRY.write_textfile()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 300)
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+def train():
+    """
+    Train the crew for a given number of iterations.
+
+    Usage: train <n_iterations> <filename>
+    """
+    load_dotenv()
+    inputs = {'email_limit': 5}
+    try:
+        GmailCrewAi().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
+    except Exception as e:
+        raise Exception(f"An error occurred while training the crew: {e}")
+
+def replay():
+    """
+    Replay the crew execution from a specific task.
+
+    Usage: replay <task_id>
+    """
+    load_dotenv()
+    try:
+        GmailCrewAi().crew().replay(task_id=sys.argv[1])
+    except Exception as e:
+        raise Exception(f"An error occurred while replaying the crew: {e}")
+
+def test():
+    """
+    Test the crew execution and return the results.
+
+    Usage: test <n_iterations> <openai_model_name>
+    """
+    load_dotenv()
+    inputs = {'email_limit': 5}
+    try:
+        GmailCrewAi().crew().test(n_iterations=int(sys.argv[1]), openai_model_name=sys.argv[2], inputs=inputs)
+    except Exception as e:
+        raise Exception(f"An error occurred while testing the crew: {e}")
+
 if __name__ == "__main__":
     sys.exit(run())  # Use the return value as the exit code
@@ -0,0 +1,289 @@
+import logging
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEXTFILE = "output/metrics.prom"
+
+# Seconds; covers single IMAP commands up to whole crew runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelKey = Tuple[str, ...]
+
+
+class Registry:
+    """The metrics exported by this process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics: List["_Metric"] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric"):
+        with self._lock:
+            self.metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self.metrics)
+        return "".join(metric.render() for metric in metrics)
+
+    def write_textfile(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Write every metric to a textfile-collector file.
+
+        The file is written next to its final name and renamed into place, so
+        node_exporter never reads a half-written dump.
+        """
+        path = path or os.environ.get("METRICS_TEXTFILE", DEFAULT_TEXTFILE)
+        if not path:
+            return None
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            temp = f"{path}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                f.write(self.render())
+            os.replace(temp, path)
+            return path
+        except OSError as e:
+            logger.warning("Could not write metrics to %s: %s", path, e)
+            return None
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve /metrics from a daemon thread and return the server."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_address[1])
+        return server
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    """
+    Base for sharded metrics.
+
+    Each thread updates its own dict of values, so recording a value never
+    takes a lock; the shards are only combined when the metrics are
+    collected. Shards of finished threads are folded into a base dict then,
+    so worker churn doesn't grow the list forever.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict[LabelKey, Any]]] = []
+        self._base: Dict[LabelKey, Any] = {}
+        self._shards_lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _shard(self) -> Dict[LabelKey, Any]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def collect(self) -> Dict[LabelKey, Any]:
+        """Current value per label set, combined across threads."""
+        with self._shards_lock:
+            live = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    for key, value in values.items():
+                        self._base[key] = self._merge(self._base.get(key), value)
+            self._shards = live
+            combined = {key: self._copy(value) for key, value in self._base.items()}
+            shards = [dict(values) for _, values in live]
+        for values in shards:
+            for key, value in values.items():
+                combined[key] = self._merge(combined.get(key), value)
+        return combined
+
+    def value(self, **labels) -> Any:
+        return self.collect().get(self._key(labels))
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.collect().items()):
+            lines.extend(self._samples(key, value))
+        return "\n".join(lines) + "\n"
+
+    def _samples(self, key: LabelKey, value: Any) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+    @staticmethod
+    def _merge(total: Any, value: Any) -> Any:
+        return value if total is None else total + value
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Last value wins; set from whichever thread knows it."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def collect(self) -> Dict[LabelKey, Any]:
+        return dict(self._values)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        cell = shard.get(key)
+        if cell is None:
+            # Per-bucket counts (last one is +Inf), then the sum
+            cell = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @staticmethod
+    def _merge(total: Any, value: Any) -> Any:
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        return list(value)
+
+    def _samples(self, key: LabelKey, value: Any) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), value[:-1]):
+            cumulative += count
+            labels = _labels(self.labelnames + ("le",), key + (_number(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_number(value[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Emails
+EMAILS_PROCESSED = Counter("gmail_crew_emails_processed_total",
+                           "Emails categorized, by category and by what decided it (llm, rule, llm_cache).",
+                           ["category", "source"])
+EMAIL_ACTIONS = Counter("gmail_crew_email_actions_total",
+                        "Emails organized, deleted, archived or drafted for.", ["action"])
+
+# LLM
+LLM_CALLS = Counter("gmail_crew_llm_calls_total", "LLM completions requested, by whether the cache answered.",
+                    ["model", "cached"])
+LLM_CACHE_LOOKUPS = Counter("gmail_crew_llm_cache_lookups_total", "LLM result cache lookups.",
+                            ["namespace", "result"])
+LLM_TOKENS = Counter("gmail_crew_llm_tokens_total", "LLM tokens used, per crew task.", ["task", "kind"])
+
+# IMAP
+IMAP_CONNECTIONS = Counter("gmail_crew_imap_connections_total",
+                           "IMAP sessions handed out by the pool (connect, reuse, reconnect).", ["event"])
+IMAP_COMMANDS = Counter("gmail_crew_imap_commands_total", "IMAP commands sent.", ["command"])
+IMAP_BYTES = Counter("gmail_crew_imap_bytes_total", "IMAP bytes sent and received, per command.",
+                     ["command", "direction"])
+
+# Slack
+SLACK_NOTIFICATIONS = Counter("gmail_crew_slack_notifications_total",
+                              "Slack notifications queued, delivered or given up on.", ["result"])
+SLACK_RETRIES = Counter("gmail_crew_slack_retries_total", "Slack webhook retries.", ["reason"])
+
+# Runs and stages
+STAGE_SECONDS = Histogram("gmail_crew_stage_duration_seconds",
+                          "Duration of traced stages (IMAP commands, parsing, tools, LLM calls, tasks).", ["stage"])
+RUNS = Counter("gmail_crew_runs_total", "Crew runs finished.", ["result"])
+LAST_RUN = Gauge("gmail_crew_last_run_timestamp_seconds", "Unix time the last crew run finished.")
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """Start the /metrics endpoint on METRICS_PORT (localhost only unless METRICS_HOST says otherwise)."""
+    global _server
+    port = os.environ.get("METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = REGISTRY.serve(int(port), os.environ.get("METRICS_HOST", "127.0.0.1"))
+            except (OSError, ValueError) as e:
+                logger.warning("Could not start the metrics endpoint on port %s: %s", port, e)
+        return _server
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, SkipValidation
+from pydantic import BaseModel, Field, PrivateAttr, SkipValidation
 from typing import List, Optional, Dict, Literal, Callable, Any
 from datetime import datetime
 
@@ -15,9 +15,49 @@ class EmailDetails(BaseModel):
     thread_size: Optional[int] = Field(1, description="Number of emails in this thread")
     thread_position: Optional[int] = Field(1, description="Position of this email in the thread (1 = first)")
 
+    # Loader for a body that has not been downloaded yet (two-phase fetch)
+    _body_loader: Optional[Callable[[], str]] = PrivateAttr(default=None)
+
+    def __getattr__(self, name):
+        # `body` is removed from __dict__ while a loader is pending, so the
+        # first access lands here and downloads it.
+        if name == "body" and self.__pydantic_private__.get("_body_loader") is not None:
+            return self.load_body()
+        return super().__getattr__(name)
+
+    @property
+    def body_loaded(self) -> bool:
+        """Whether the body has been downloaded."""
+        return "body" in self.__dict__
+
+    def set_body_loader(self, loader: Callable[[], str]):
+        """Defer loading the body until it is first accessed."""
+        self._body_loader = loader
+        self.__dict__.pop("body", None)
+
+    def load_body(self) -> Optional[str]:
+        """Download the body now if it is still pending."""
+        loader = self._body_loader
+        self._body_loader = None
+        if loader is not None and "body" not in self.__dict__:
+            self.__dict__["body"] = loader()
+        return self.__dict__.get("body")
+
+    def model_dump(self, **kwargs) -> Dict[str, Any]:
+        exclude = kwargs.get("exclude")
+        if not (exclude and "body" in exclude):
+            self.load_body()
+        return super().model_dump(**kwargs)
+
+    def model_dump_json(self, **kwargs) -> str:
+        exclude = kwargs.get("exclude")
+        if not (exclude and "body" in exclude):
+            self.load_body()
+        return super().model_dump_json(**kwargs)
+
     @classmethod
     def from_email_tuple(cls, email_tuple):
-        """Create an EmailDetails from an email tuple."""
+        """Create an EmailDetails from an email tuple. The body may be a loader callable."""
         if not email_tuple or len(email_tuple) < 5:
             return cls(email_id=None, subject=None)
         
@@ -27,15 +67,18 @@ class EmailDetails(BaseModel):
         date = ""
         if isinstance(thread_info, dict) and 'date' in thread_info:
             date = thread_info['date']
-            
-        return cls(
+
+        details = cls(
             email_id=email_id,
             subject=subject,
             sender=sender,
-            body=body,
+            body=None if callable(body) else body,
             date=date,
             thread_info=thread_info
         )
+        if callable(body):
+            details.set_body_loader(body)
+        return details
 
 # Define the valid categories, priorities, and actions as type aliases
 EmailCategoryType = Literal["NEWSLETTERS", "PROMOTIONS", "PERSONAL", "GITHUB", 
@@ -123,7 +166,7 @@ class SimpleCategorizedEmail(BaseModel):
         date = ""
         if isinstance(thread_info, dict) and 'date' in thread_info:
             date = thread_info['date']
-        elif body and body.startswith("EMAIL DATE:"):
+        elif isinstance(body, str) and body.startswith("EMAIL DATE:"):
             date_line = body.split("\n")[0]
             date = date_line.replace("EMAIL DATE:", "").strip()
         
@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from gmail_crew_ai.crew import GmailCrewAi, compact_email_payload
+from gmail_crew_ai.metrics import RUNS
+from gmail_crew_ai.models import SimpleCategorizedEmail
+from gmail_crew_ai.tools.imap_utils import chunked
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILES = [
+    "categorization_report.json",
+    "organization_report.json",
+    "response_report.json",
+    "notification_report.json",
+]
+
+# Deleting and emptying the trash happen once, after every batch is done
+CLEANUP_TASK = "cleanup_task"
+BATCH_ONLY_TASKS = ["organization_task", "response_task", "notification_task"]
+
+
+def run_parallel(inputs: Dict[str, Any], concurrency: int = 4, batch_size: int = 1,
+                 output_dir: str = "output") -> List[Any]:
+    """
+    Fetch once, then run one crew per email (or per `batch_size` emails) on a
+    bounded thread pool.
+
+    Each crew writes its reports to output/batches/<n>/; once all of them are
+    done the reports are merged into the usual files in `output_dir` and a
+    single cleanup crew deletes and empties the trash for the whole run. The
+    sync checkpoint only advances if every crew succeeded, so a failed run is
+    simply fetched again next time (cached LLM results make that cheap).
+    """
+    inputs = dict(inputs, output_dir=output_dir)
+    coordinator = GmailCrewAi()
+    os.makedirs(output_dir, exist_ok=True)
+    emails = coordinator.collect_emails(inputs)
+    if inputs.get('audit_fetched_emails', True):
+        with open(os.path.join(output_dir, 'fetched_emails.json'), 'w') as f:
+            f.write(compact_email_payload(emails))
+
+    if emails and inputs.get('batch_categorization', False):
+        categorized = coordinator.categorize_emails(emails, inputs)
+    else:
+        # Batches whose emails are all cached skip the categorization task
+        categorized = coordinator.cached_categorizations()
+
+    batches = list(chunked(emails, max(1, batch_size)))
+    logger.info("Processing %d emails in %d crews, %d at a time...", len(emails), len(batches), concurrency)
+
+    results: Dict[int, Any] = {}
+    failed = 0
+    batch_dirs = [os.path.join(output_dir, "batches", f"{index:03d}") for index in range(len(batches))]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(_run_batch, inputs, batch, batch_dir, categorized): index
+            for index, (batch, batch_dir) in enumerate(zip(batches, batch_dirs))
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error("Batch %d failed: %s", index, e)
+                RUNS.inc(result="error")
+
+    ordered = [results[index] for index in sorted(results)]
+    for result in ordered:
+        coordinator.store_llm_results(result)
+
+    merge_reports([batch_dirs[index] for index in sorted(results)], output_dir)
+
+    if results:
+        try:
+            _run_cleanup(inputs, emails, output_dir)
+        except Exception as e:
+            failed += 1
+            logger.error("Cleanup failed: %s", e)
+            RUNS.inc(result="error")
+
+    if failed:
+        logger.warning("%d of %d crews failed; leaving the sync checkpoint where it was.", failed, len(batches) + 1)
+    else:
+        coordinator.save_sync_checkpoint(None)
+    return ordered
+
+
+def _run_batch(inputs: Dict[str, Any], batch: List[Dict[str, Any]], batch_dir: str,
+               categorized: Dict[str, Any]):
+    batch_inputs = dict(inputs, output_dir=batch_dir, email_batch=batch, skip_tasks=[CLEANUP_TASK])
+    if categorized:
+        batch_inputs['precategorized'] = {email['email_id']: categorized[email['email_id']]
+                                          for email in batch if email['email_id'] in categorized}
+    return GmailCrewAi().crew().kickoff(inputs=batch_inputs)
+
+
+def _run_cleanup(inputs: Dict[str, Any], emails: List[Dict[str, Any]], output_dir: str):
+    """Run the cleanup task once over every email the batches categorized."""
+    categorized = {}
+    for report in _read_report(os.path.join(output_dir, "categorization_report.json")) or []:
+        try:
+            result = SimpleCategorizedEmail.model_validate(report)
+        except Exception:
+            continue
+        categorized[result.email_id] = result
+    emails = [email for email in emails if email['email_id'] in categorized]
+    if not emails:
+        logger.info("No categorized emails to clean up.")
+        return None
+    cleanup_inputs = dict(inputs, output_dir=output_dir, email_batch=emails, precategorized=categorized,
+                          skip_tasks=BATCH_ONLY_TASKS, audit_fetched_emails=False)
+    return GmailCrewAi().crew().kickoff(inputs=cleanup_inputs)
+
+
+def merge_reports(batch_dirs: List[str], output_dir: str = "output"):
+    """Combine the per-batch report files into one JSON list per report."""
+    for name in REPORT_FILES:
+        merged = []
+        for batch_dir in batch_dirs:
+            report = _read_report(os.path.join(batch_dir, name))
+            if report is None:
+                continue
+            if isinstance(report, list):
+                merged.extend(report)
+            else:
+                merged.append(report)
+        with open(os.path.join(output_dir, name), 'w') as f:
+            json.dump(merged, f, indent=2)
+    logger.info("Merged reports from %d batches into %s/", len(batch_dirs), output_dir)
+
+
+def _read_report(path: str) -> Optional[Any]:
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        content = f.read()
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        # Markdown reports (response/notification) are kept as text
+        return content.strip() or None
@@ -0,0 +1,163 @@
+import os
+import re
+from datetime import date, datetime
+from email.utils import parseaddr, parsedate_to_datetime
+from typing import Any, Dict, List, Mapping, Optional
+
+import yaml
+from pydantic import BaseModel, Field
+
+from gmail_crew_ai.models import EmailDetails, SimpleCategorizedEmail
+from gmail_crew_ai.tools.gmail_tools import decode_header_safe
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "config", "rules.yaml")
+
+BULK_PRECEDENCE = {"bulk", "list", "junk"}
+
+
+class RuleMatch(BaseModel):
+    """Outcome of a deterministic rule."""
+    rule: str = Field(..., description="Name of the rule that matched")
+    category: Optional[str] = Field(None, description="Category assigned by the rule")
+    priority: Optional[str] = Field(None, description="Priority assigned by the rule")
+    required_action: Optional[str] = Field(None, description="Required action assigned by the rule")
+    labels: List[str] = Field(default_factory=list, description="Labels to apply")
+    star: bool = Field(default=False, description="Whether to star the email")
+    delete: bool = Field(default=False, description="Whether to move the email to Trash")
+    defer_to_llm: bool = Field(default=False, description="Whether the email should still go to the categorizer")
+
+    def to_categorized(self, email_detail: EmailDetails) -> SimpleCategorizedEmail:
+        """Build the categorization result the categorizer agent would have produced."""
+        return SimpleCategorizedEmail(
+            email_id=email_detail.email_id,
+            subject=email_detail.subject,
+            sender=email_detail.sender,
+            category=self.category,
+            priority=self.priority,
+            required_action=self.required_action,
+            date=email_detail.date,
+            age_days=email_detail.age_days,
+        )
+
+
+class CompiledRule:
+    """A rule from rules.yaml with its regexes compiled and domains normalized."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.name = spec.get("name", "unnamed")
+        self.sender_domains = tuple(d.lower().lstrip("@") for d in spec.get("sender_domain", []) or [])
+        self.sender_regex = self._compile(spec.get("sender_regex"))
+        self.subject_regex = self._compile(spec.get("subject_regex"))
+        self.text_regex = self._compile(spec.get("text_regex"))
+        self.subject_excludes_regex = self._compile(spec.get("subject_excludes_regex"))
+        self.list_unsubscribe = spec.get("list_unsubscribe")
+        self.precedence = {p.lower() for p in spec.get("precedence", []) or []}
+        self.bulk = spec.get("bulk")
+        self.min_age_days = spec.get("min_age_days")
+        self.outcome = RuleMatch(
+            rule=self.name,
+            category=spec.get("category"),
+            priority=spec.get("priority"),
+            required_action=spec.get("required_action"),
+            labels=spec.get("labels", []) or [],
+            star=bool(spec.get("star", False)),
+            delete=bool(spec.get("delete", False)),
+            defer_to_llm=bool(spec.get("defer_to_llm", False)),
+        )
+
+    @staticmethod
+    def _compile(pattern: Optional[str]):
+        return re.compile(pattern, re.IGNORECASE) if pattern else None
+
+    def matches(self, sender: str, domain: str, subject: str, has_list_unsubscribe: bool,
+                precedence: str, age_days: Optional[int]) -> bool:
+        if self.sender_domains and not any(domain == d or domain.endswith("." + d) for d in self.sender_domains):
+            return False
+        if self.sender_regex and not self.sender_regex.search(sender):
+            return False
+        if self.subject_regex and not self.subject_regex.search(subject):
+            return False
+        if self.text_regex and not (self.text_regex.search(sender) or self.text_regex.search(subject)):
+            return False
+        if self.subject_excludes_regex and self.subject_excludes_regex.search(subject):
+            return False
+        if self.list_unsubscribe is not None and bool(self.list_unsubscribe) != has_list_unsubscribe:
+            return False
+        if self.precedence and precedence not in self.precedence:
+            return False
+        if self.bulk is not None and bool(self.bulk) != (has_list_unsubscribe or precedence in BULK_PRECEDENCE):
+            return False
+        if self.min_age_days is not None and (age_days is None or age_days < self.min_age_days):
+            return False
+        return True
+
+
+class RuleEngine:
+    """
+    Deterministic pre-classifier for obvious automated mail.
+
+    Runs before the crew starts so that mail the rules already decide on
+    never costs an LLM call. The first matching rule wins.
+
+    Rules that delete mail only apply when allow_delete is set; otherwise
+    they defer to the LLM so the cleaner agent makes the call.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], allow_delete: bool = False):
+        self.rules = [CompiledRule(spec) for spec in rules]
+        self.allow_delete = allow_delete
+
+    @classmethod
+    def from_config(cls, path: Optional[str] = None, allow_delete: bool = False) -> "RuleEngine":
+        """Load rules from config/rules.yaml (or the given path)."""
+        with open(path or DEFAULT_RULES_PATH, "r") as f:
+            config = yaml.safe_load(f) or {}
+        return cls(config.get("rules", []), allow_delete=allow_delete)
+
+    def classify(self, sender: str, subject: str, headers: Mapping[str, Any],
+                 age_days: Optional[int]) -> Optional[RuleMatch]:
+        """Return the outcome of the first matching rule, or None when the LLM should decide."""
+        sender = sender or ""
+        subject = subject or ""
+        domain = parseaddr(sender)[1].rpartition("@")[2].lower()
+        has_list_unsubscribe = bool(headers.get("List-Unsubscribe") or headers.get("list_unsubscribe"))
+        precedence = str(headers.get("Precedence") or headers.get("precedence") or "").strip().lower()
+
+        for rule in self.rules:
+            if rule.matches(sender, domain, subject, has_list_unsubscribe, precedence, age_days):
+                if rule.outcome.defer_to_llm or (rule.outcome.delete and not self.allow_delete):
+                    return None
+                return rule.outcome
+        return None
+
+    def classify_email(self, email_detail: EmailDetails) -> Optional[RuleMatch]:
+        """Classify an EmailDetails, reading the list headers from its thread_info."""
+        return self.classify(email_detail.sender, email_detail.subject,
+                             email_detail.thread_info or {}, email_detail.age_days)
+
+    def classify_headers(self, header: Dict[str, Any]) -> Optional[RuleMatch]:
+        """Classify a phase-one header record from GetUnreadEmailsTool.fetch_headers()."""
+        msg = header['msg']
+        return self.classify(decode_header_safe(msg.get("From", "")), decode_header_safe(msg.get("Subject", "")), msg,
+                             age_in_days(email_date(msg.get("Date", ""))))
+
+
+def email_date(date_str: str) -> str:
+    """Parse an email Date header into YYYY-MM-DD, or "" if it can't be parsed."""
+    if not date_str:
+        return ""
+    try:
+        parsed = parsedate_to_datetime(re.sub(r'\s+\([A-Z]{3,4}\)', '', date_str))
+        return parsed.strftime("%Y-%m-%d")
+    except Exception:
+        return ""
+
+
+def age_in_days(date_str: Optional[str], today: Optional[date] = None) -> Optional[int]:
+    """Age in days of a YYYY-MM-DD date, or None if it is missing or malformed."""
+    if not date_str:
+        return None
+    try:
+        return ((today or date.today()) - datetime.strptime(date_str, "%Y-%m-%d").date()).days
+    except ValueError:
+        return None
@@ -0,0 +1,517 @@
+import asyncio
+import imaplib
+import logging
+import os
+import re
+import ssl
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from gmail_crew_ai.metrics import IMAP_BYTES, IMAP_COMMANDS, IMAP_CONNECTIONS
+from gmail_crew_ai.tracing import span
+
+logger = logging.getLogger(__name__)
+
+GMAIL_IMAP_HOST = "imap.gmail.com"
+IMAP_SSL_PORT = 993
+
+_TAGGED = re.compile(rb"(?P<tag>A\d+) (?P<type>[A-Z]+) ?(?P<data>.*)", re.ASCII)
+_CONTINUATION = re.compile(rb"\+( (?P<data>.*))?")
+
+
+class _Pending:
+    """A command waiting for its tagged completion, with the untagged data it collected."""
+
+    def __init__(self, name: str, future: "asyncio.Future"):
+        self.name = name
+        self.future = future
+        self.untagged: Dict[str, List[Any]] = {}
+
+
+class AsyncIMAPClient:
+    """
+    asyncio IMAP4rev1 client with pipelined commands.
+
+    Every command gets its own tag and is written as soon as the previous
+    command's bytes are out, without waiting for its completion, so
+    concurrent callers (`asyncio.gather` over several `uid()` calls) share
+    one connection and one round trip. A single reader task parses the
+    responses and completes each command when its tagged line arrives.
+
+    Untagged data is credited to the oldest command still running: servers
+    answer pipelined commands in order (RFC 3501 §5.5), so that is the one
+    it belongs to. Results have imaplib's `(typ, data)` shapes, and errors
+    are imaplib's `IMAP4.error` / `IMAP4.abort`, so code written against
+    imaplib can read them unchanged.
+    """
+
+    def __init__(self, host: str = GMAIL_IMAP_HOST, port: int = IMAP_SSL_PORT,
+                 ssl_context: Optional[ssl.SSLContext] = None, timeout: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.timeout = timeout
+        self.capabilities: Tuple[str, ...] = ()
+        self.welcome = b""
+        self.last_used = 0.0
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional["asyncio.Task"] = None
+        self._send_lock: Optional[asyncio.Lock] = None
+        self._continuation: Optional["asyncio.Future"] = None
+        self._continuation_tag: Optional[bytes] = None
+        self._pending: "OrderedDict[bytes, _Pending]" = OrderedDict()
+        self._tag_counter = 0
+        self._closing = False
+        self._error: Optional[BaseException] = None
+        # Response codes ([UIDVALIDITY n], [APPENDUID ...]) and unsolicited data, for response()
+        self._responses: Dict[str, List[Any]] = {}
+        # ((mailbox, readonly), SELECT result, its response codes)
+        self._selected: Optional[Tuple[Tuple[str, bool], Tuple[str, List[Any]], Dict[str, List[Any]]]] = None
+
+    @staticmethod
+    async def open_connection(host: str, port: int, ssl_context: Optional[ssl.SSLContext],
+                              timeout: Optional[float]) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Open the transport. Replaced by the offline benchmarks' fake server."""
+        return await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context or ssl.create_default_context()), timeout)
+
+    @property
+    def open(self) -> bool:
+        return self._writer is not None and self._error is None and not self._closing
+
+    async def connect(self):
+        """Open the connection, read the greeting and learn the server's capabilities."""
+        self._send_lock = asyncio.Lock()
+        self._reader, self._writer = await self.open_connection(self.host, self.port, self.ssl_context, self.timeout)
+        greeting = await self._reader.readline()
+        IMAP_BYTES.inc(len(greeting), command="CONNECT", direction="received")
+        self.welcome = greeting.rstrip(b"\r\n")
+        if not self.welcome.startswith((b"* OK", b"* PREAUTH")):
+            raise imaplib.IMAP4.error(f"Unexpected IMAP greeting: {self.welcome!r}")
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+        self._note_capabilities(self.welcome)
+        if not self.capabilities:
+            _, data = await self.command("CAPABILITY", untagged="CAPABILITY")
+            self._note_capabilities(b"[CAPABILITY " + (data[-1] or b"") + b"]")
+        self.last_used = time.monotonic()
+
+    # -- commands -----------------------------------------------------------
+
+    async def command(self, name: str, *args, untagged: Optional[str] = None,
+                      literal: Optional[bytes] = None) -> Tuple[str, List[Any]]:
+        """
+        Send one command and wait for its completion.
+
+        Returns `(typ, data)` like imaplib: `data` holds the `untagged`
+        responses the command produced (`[None]` if there were none), or the
+        text of the tagged response when `untagged` isn't given. A BAD
+        response raises IMAP4.error.
+        """
+        if self._error is not None:
+            raise self._error
+        if self._writer is None:
+            raise imaplib.IMAP4.abort("Not connected")
+        label = f"UID {str(args[0]).upper()}" if name == "UID" and args else name
+        IMAP_COMMANDS.inc(command=label)
+
+        line = self._command_line(name, args)
+        future = asyncio.get_running_loop().create_future()
+        async with self._send_lock:
+            self._tag_counter += 1
+            tag = b"A%d" % self._tag_counter
+            self._pending[tag] = _Pending(label, future)
+            if literal is None:
+                await self._send(tag + b" " + line + b"\r\n", label)
+            else:
+                # Synchronizing literal: hold the line until the server says go ahead
+                self._continuation = asyncio.get_running_loop().create_future()
+                self._continuation_tag = tag
+                await self._send(tag + b" " + line + b" {%d}\r\n" % len(literal), label)
+                if await self._continuation is not None:
+                    await self._send(literal + b"\r\n", label)
+
+        typ, data, collected = await future
+        self.last_used = time.monotonic()
+        if typ == "BAD":
+            raise imaplib.IMAP4.error(f"{label} command error: {typ} {data}")
+        if untagged is None or typ == "NO":
+            return typ, data
+        return typ, collected.get(untagged, [None])
+
+    async def pipeline(self, *commands: Tuple) -> List[Tuple[str, List[Any]]]:
+        """
+        Send several `uid()` argument tuples back to back and wait for them all.
+
+        `await client.pipeline(("STORE", "1:3", "+FLAGS", "(\\\\Seen)"), ("FETCH", "4", "(UID)"))`
+        costs one round trip instead of two.
+        """
+        return list(await asyncio.gather(*(self.uid(*command) for command in commands)))
+
+    async def login(self, user: str, password: str) -> Tuple[str, List[Any]]:
+        typ, data = await self.command("LOGIN", user, _quote(password))
+        if typ != "OK":
+            raise imaplib.IMAP4.error(data[-1])
+        self._note_capabilities(data[-1] or b"")
+        return typ, data
+
+    async def select(self, mailbox: str = "INBOX", readonly: bool = False) -> Tuple[str, List[Any]]:
+        """SELECT (or EXAMINE) a mailbox; selecting the current one again costs no round trip."""
+        key = (mailbox, readonly)
+        if self._selected is not None and self._selected[0] == key:
+            self._responses = {code: list(data) for code, data in self._selected[2].items()}
+            return self._selected[1]
+        self._selected = None
+        self._responses.clear()
+        response = await self.command("EXAMINE" if readonly else "SELECT", mailbox, untagged="EXISTS")
+        if response[0] == "OK":
+            self._selected = (key, response, {code: list(data) for code, data in self._responses.items()})
+        return response
+
+    async def uid(self, command: str, *args) -> Tuple[str, List[Any]]:
+        command = command.upper()
+        untagged = command if command in ("SEARCH", "SORT", "THREAD") else "FETCH"
+        return await self.command("UID", command, *args, untagged=untagged)
+
+    async def append(self, mailbox: Optional[str], flags: Optional[str], date_time: Any,
+                     message: bytes) -> Tuple[str, List[Any]]:
+        if flags and not (flags.startswith("(") and flags.endswith(")")):
+            flags = f"({flags})"
+        date_time = imaplib.Time2Internaldate(date_time) if date_time else None
+        message = re.sub(rb"\r\n|\r|\n", b"\r\n", message)
+        return await self.command("APPEND", mailbox or "INBOX", flags, date_time, literal=message)
+
+    async def list(self, directory: str = '""', pattern: str = "*") -> Tuple[str, List[Any]]:
+        return await self.command("LIST", directory, pattern, untagged="LIST")
+
+    async def status(self, mailbox: str, names: str) -> Tuple[str, List[Any]]:
+        return await self.command("STATUS", mailbox, names, untagged="STATUS")
+
+    async def create(self, mailbox: str) -> Tuple[str, List[Any]]:
+        return await self.command("CREATE", mailbox)
+
+    async def expunge(self) -> Tuple[str, List[Any]]:
+        return await self.command("EXPUNGE", untagged="EXPUNGE")
+
+    async def noop(self) -> Tuple[str, List[Any]]:
+        return await self.command("NOOP")
+
+    async def close(self) -> Tuple[str, List[Any]]:
+        self._selected = None
+        return await self.command("CLOSE")
+
+    async def logout(self) -> Tuple[str, List[Any]]:
+        """Log out and close the connection; never raises for a connection that is already gone."""
+        result: Tuple[str, List[Any]] = ("BYE", [None])
+        if self.open:
+            self._closing = True
+            try:
+                result = await asyncio.wait_for(self.command("LOGOUT"), self.timeout or 10)
+            except Exception:
+                pass
+        await self._shutdown()
+        return result
+
+    def response(self, code: str) -> Tuple[str, List[Any]]:
+        """Pop the data of a response code (e.g. UIDVALIDITY) seen since the last SELECT, as imaplib does."""
+        return code, self._responses.pop(code.upper(), [None])
+
+    # -- transport ----------------------------------------------------------
+
+    @staticmethod
+    def _command_line(name: str, args: Tuple) -> bytes:
+        parts = [name.encode()]
+        for arg in args:
+            if arg is None:
+                continue
+            parts.append(arg if isinstance(arg, bytes) else str(arg).encode())
+        return b" ".join(parts)
+
+    async def _send(self, data: bytes, label: str):
+        IMAP_BYTES.inc(len(data), command=label, direction="sent")
+        try:
+            self._writer.write(data)
+            await self._writer.drain()
+        except (ConnectionError, OSError) as e:
+            self._fail(imaplib.IMAP4.abort(f"Connection lost: {e}"))
+            raise self._error
+
+    async def _read_loop(self):
+        try:
+            while True:
+                await self._read_response()
+        except asyncio.CancelledError:
+            self._fail(imaplib.IMAP4.abort("Connection closed"))
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, ssl.SSLError) as e:
+            self._fail(imaplib.IMAP4.abort(f"Connection lost: {e}"))
+        except imaplib.IMAP4.abort as e:
+            self._fail(e)
+
+    async def _readline(self) -> bytes:
+        line = await self._reader.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Socket closed by the server")
+        self._charge(len(line))
+        return line.rstrip(b"\r\n")
+
+    def _charge(self, size: int):
+        label = next(iter(self._pending.values())).name if self._pending else "UNSOLICITED"
+        IMAP_BYTES.inc(size, command=label, direction="received")
+
+    async def _read_response(self):
+        line = await self._readline()
+        tagged = _TAGGED.fullmatch(line)
+        if tagged and tagged.group("tag") in self._pending:
+            pending = self._pending.pop(tagged.group("tag"))
+            typ, data = tagged.group("type").decode(), tagged.group("data")
+            self._note_response_code(typ, data, pending)
+            if tagged.group("tag") == self._continuation_tag and not self._continuation.done():
+                # Rejected before the literal was sent
+                self._continuation.set_result(None)
+            if not pending.future.done():
+                pending.future.set_result((typ, [data], pending.untagged))
+            return
+
+        if line.startswith(b"+"):
+            if self._continuation is not None and not self._continuation.done():
+                match = _CONTINUATION.fullmatch(line)
+                self._continuation.set_result(match.group("data") if match else b"")
+            return
+
+        match = imaplib.Untagged_response.fullmatch(line)
+        if match:
+            data = match.group("data")
+        else:
+            match = imaplib.Untagged_status.fullmatch(line)
+            if not match:
+                raise imaplib.IMAP4.abort(f"Unexpected response: {line!r}")
+            data = match.group("data") + (b" " + match.group("data2") if match.group("data2") else b"")
+        typ = match.group("type").decode()
+        data = data or b""
+
+        pending = next(iter(self._pending.values())) if self._pending else None
+        target = pending.untagged if pending else self._responses
+        # Literals: each "{n}" is followed by n bytes and the rest of the line
+        while True:
+            literal = imaplib.Literal.match(data)
+            if not literal:
+                break
+            size = int(literal.group("size"))
+            body = await self._reader.readexactly(size)
+            self._charge(size)
+            target.setdefault(typ, []).append((data, body))
+            data = await self._readline()
+        target.setdefault(typ, []).append(data)
+        self._note_response_code(typ, data, pending)
+
+        if typ == "BYE" and not self._closing:
+            raise imaplib.IMAP4.abort(f"Server closed the connection: {data!r}")
+
+    def _note_response_code(self, typ: str, data: bytes, pending: Optional[_Pending]):
+        if typ not in ("OK", "NO", "BAD") or not isinstance(data, bytes):
+            return
+        code = imaplib.Response_code.match(data)
+        if code:
+            name = code.group("type").decode()
+            self._responses.setdefault(name, []).append(code.group("data"))
+            if pending is not None:
+                pending.untagged.setdefault(name, []).append(code.group("data"))
+
+    def _note_capabilities(self, text: bytes):
+        match = re.search(rb"\[CAPABILITY ([^\]]*)\]", text, re.IGNORECASE)
+        if match:
+            self.capabilities = tuple(match.group(1).decode().upper().split())
+
+    def _fail(self, error: BaseException):
+        """Fail every waiting command; the connection can't be trusted after this."""
+        if self._error is None:
+            self._error = error
+        for pending in self._pending.values():
+            if not pending.future.done():
+                pending.future.set_exception(self._error)
+        self._pending.clear()
+        if self._continuation is not None and not self._continuation.done():
+            self._continuation.set_exception(self._error)
+
+    async def _shutdown(self):
+        self._closing = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except BaseException:
+                pass
+            self._reader_task = None
+        if self._writer is not None:
+            try:
+                self._writer.close()
+                await asyncio.wait_for(self._writer.wait_closed(), 5)
+            except Exception:
+                pass
+            self._writer = None
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class AsyncIMAPPool:
+    """
+    Pool of logged-in AsyncIMAPClient sessions for one event loop, keyed by
+    (host, account).
+
+    At most `max_connections` sessions per account are handed out at once;
+    each of them can still carry many pipelined commands. Sessions idle for
+    longer than `keepalive_interval` get a NOOP before reuse and are replaced
+    if the server has dropped them.
+    """
+
+    def __init__(self, max_connections: int = 4, keepalive_interval: float = 60.0, max_idle: float = 600.0):
+        self.max_connections = max_connections
+        self.keepalive_interval = keepalive_interval
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple[str, str], List[AsyncIMAPClient]] = {}
+        self._slots: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self._accounts: Dict[int, Tuple[str, str]] = {}
+
+    async def acquire(self, email_address: str, app_password: str,
+                      host: str = GMAIL_IMAP_HOST) -> AsyncIMAPClient:
+        """Borrow a live session for the account, logging in a new one if needed."""
+        key = (host, email_address)
+        slots = self._slots.setdefault(key, asyncio.Semaphore(self.max_connections))
+        await slots.acquire()
+        try:
+            client = await self._reuse(key)
+            if client is None:
+                logger.info("Connecting to Gmail (asyncio) with email: %s...%s", email_address[:3], email_address[-8:])
+                with span("imap.connect", host=host, backend="asyncio"):
+                    client = AsyncIMAPClient(host)
+                    await client.connect()
+                    await client.login(email_address, app_password)
+                IMAP_CONNECTIONS.inc(event="connect")
+            self._accounts[id(client)] = key
+            return client
+        except BaseException:
+            slots.release()
+            raise
+
+    def release(self, client: AsyncIMAPClient):
+        """Return a session to the pool; broken sessions are dropped."""
+        key = self._accounts.pop(id(client), None)
+        if key is None:
+            return
+        if client.open:
+            self._idle.setdefault(key, []).append(client)
+        else:
+            asyncio.ensure_future(client.logout())
+        self._slots[key].release()
+
+    @asynccontextmanager
+    async def session(self, email_address: str, app_password: str, host: str = GMAIL_IMAP_HOST):
+        """Context manager form of acquire()/release()."""
+        client = await self.acquire(email_address, app_password, host)
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    async def close_all(self):
+        """Log out every idle session."""
+        clients = [client for idle in self._idle.values() for client in idle]
+        self._idle.clear()
+        await asyncio.gather(*(client.logout() for client in clients), return_exceptions=True)
+
+    async def _reuse(self, key: Tuple[str, str]) -> Optional[AsyncIMAPClient]:
+        idle = self._idle.get(key) or []
+        while idle:
+            client = idle.pop()
+            idle_for = time.monotonic() - client.last_used
+            if client.open and idle_for <= self.max_idle:
+                if idle_for <= self.keepalive_interval:
+                    IMAP_CONNECTIONS.inc(event="reuse")
+                    return client
+                try:
+                    if (await client.noop())[0] == "OK":
+                        IMAP_CONNECTIONS.inc(event="reuse")
+                        return client
+                except (imaplib.IMAP4.error, OSError):
+                    pass
+            logger.info("IMAP session went stale, reconnecting...")
+            IMAP_CONNECTIONS.inc(event="reconnect")
+            await client.logout()
+        return None
+
+
+_async_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncIMAPPool]" = weakref.WeakKeyDictionary()
+_async_pools_lock = threading.Lock()
+
+
+def get_async_imap_pool() -> AsyncIMAPPool:
+    """Return the IMAP session pool of the running event loop."""
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        with _async_pools_lock:
+            pool = _async_pools.get(loop)
+            if pool is None:
+                pool = _async_pools[loop] = AsyncIMAPPool(
+                    max_connections=int(os.environ.get("IMAP_POOL_SIZE", "4")),
+                    keepalive_interval=float(os.environ.get("IMAP_KEEPALIVE_SECONDS", "60")),
+                )
+    return pool
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_imap_loop() -> asyncio.AbstractEventLoop:
+    """Return the event loop (on its own daemon thread) that serves every BlockingIMAPClient."""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="imap-asyncio", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+class BlockingIMAPClient:
+    """
+    imaplib-compatible blocking facade over an AsyncIMAPClient.
+
+    The client runs on the shared IMAP event loop, so however many blocking
+    sessions the pool holds, their sockets are all served by that one
+    thread; callers just wait for their command's result. Used by
+    PooledIMAPSession when IMAP_BACKEND=asyncio.
+    """
+
+    def __init__(self, host: str = GMAIL_IMAP_HOST, port: int = IMAP_SSL_PORT, timeout: Optional[float] = None):
+        self._loop = get_imap_loop()
+        self._client = AsyncIMAPClient(host, port, timeout=timeout)
+        self._call(self._client.connect())
+
+    def _call(self, coroutine):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            coroutine.close()
+            raise RuntimeError("BlockingIMAPClient can't be used from the IMAP event loop; use AsyncIMAPClient")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            return self._call(attr(*args, **kwargs))
+
+        return wrapper
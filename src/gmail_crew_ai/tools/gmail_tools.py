@@ -1,18 +1,49 @@
+import asyncio
 import imaplib
 import email
+import logging
 from email.header import decode_header
-from typing import List, Tuple, Literal, Optional, Type, Dict, Any
+from typing import List, Tuple, Literal, Optional, Type, Dict, Any, Iterable, Iterator, Callable
 import re
 from bs4 import BeautifulSoup
 from crewai.tools import BaseTool
 import os
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from crewai.tools import tool
 import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import base64
 
+from gmail_crew_ai.metrics import EMAIL_ACTIONS
+from gmail_crew_ai.tracing import span, traced_tool
+from gmail_crew_ai.tools.aio_imap import AsyncIMAPClient, get_async_imap_pool
+from gmail_crew_ai.tools.html_text import collapse_whitespace, fast_html_to_text
+from gmail_crew_ai.tools.imap_pool import PooledIMAPSession, get_imap_pool
+from gmail_crew_ai.tools.prefetch import Prefetcher
+from gmail_crew_ai.tools.mime_stream import DEFAULT_MAX_BODY_CHARS, StreamedMessage, extract_text_streaming
+from gmail_crew_ai.tools.special_use import ALL_MAIL, DRAFTS, TRASH, get_mailbox_resolver
+from gmail_crew_ai.tools.sync_state import get_sync_state
+from gmail_crew_ai.tools.thread_index import get_thread_index
+from gmail_crew_ai.tools.imap_utils import (
+    chunked,
+    compress_uid_set,
+    decode_part_payload,
+    find_text_parts,
+    parse_fetch_response,
+    parse_list_response,
+    parse_status_response,
+    quote_astring,
+)
+
+logger = logging.getLogger(__name__)
+
+# Byte cap per text body section when only part of a message is downloaded
+DEFAULT_MAX_BODY_BYTES = 65536
+
+# Headers fetched in the first phase of a two-phase fetch
+HEADER_FIELDS = "SUBJECT FROM TO DATE MESSAGE-ID IN-REPLY-TO REFERENCES LIST-UNSUBSCRIBE PRECEDENCE"
+
 def decode_header_safe(header):
     """
     Safely decode email headers that might contain encoded words or non-ASCII characters.
@@ -38,17 +69,30 @@ def decode_header_safe(header):
 def clean_email_body(email_body: str) -> str:
     """
     Clean the email body by removing HTML tags and excessive whitespace.
+
+    Plain text only has its whitespace collapsed. HTML goes through the
+    regex-based fast path first; BeautifulSoup is only used when that fails.
     """
-    try:
-        soup = BeautifulSoup(email_body, "html.parser")
-        text = soup.get_text(separator=" ")  # Get text with spaces instead of <br/>
-    except Exception as e:
-        print(f"Error parsing HTML: {e}")
-        text = email_body  # Fallback to raw body if parsing fails
+    if "<" not in email_body:
+        return collapse_whitespace(email_body)
+
+    with span("clean", chars=len(email_body)) as attrs:
+        text = fast_html_to_text(email_body)
+        if text is not None:
+            return text
 
-    # Remove excessive whitespace and newlines
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+        attrs['parser'] = "bs4"
+        try:
+            soup = BeautifulSoup(email_body, "html.parser")
+            for element in soup(["script", "style", "head", "title", "noscript"]):
+                element.decompose()
+            text = soup.get_text(separator=" ")  # Get text with spaces instead of <br/>
+        except Exception as e:
+            logger.warning("Could not parse HTML: %s", e)
+            text = email_body  # Fallback to raw body if parsing fails
+
+        # Remove excessive whitespace and newlines
+        return collapse_whitespace(text)
 
 class GmailToolBase(BaseTool):
     """Base class for Gmail tools, handling connection and credentials."""
@@ -60,83 +104,255 @@ class GmailToolBase(BaseTool):
     app_password: Optional[str] = Field(None, description="Gmail app password")
 
     def __init__(self, description: str = ""):
-        super().__init__(description=description)
+        if description:
+            super().__init__(description=description)
+        else:
+            super().__init__()
         self.email_address = os.environ.get("EMAIL_ADDRESS")
         self.app_password = os.environ.get("APP_PASSWORD")
 
         if not self.email_address or not self.app_password:
             raise ValueError("EMAIL_ADDRESS and APP_PASSWORD must be set in the environment.")
 
-    def _connect(self):
-        """Connect to Gmail."""
+    def _connect(self) -> PooledIMAPSession:
+        """Borrow an authenticated Gmail session from the shared pool."""
         try:
-            print(f"Connecting to Gmail with email: {self.email_address[:3]}...{self.email_address[-8:]}")
-            mail = imaplib.IMAP4_SSL("imap.gmail.com")
-            mail.login(self.email_address, self.app_password)
-            print("Successfully logged in to Gmail")
-            return mail
+            return get_imap_pool().acquire(self.email_address, self.app_password)
         except Exception as e:
-            print(f"Error connecting to Gmail: {e}")
+            logger.error("Could not connect to Gmail: %s", e)
             raise e
 
-    def _disconnect(self, mail):
-        """Disconnect from Gmail."""
+    def _disconnect(self, mail: Optional[PooledIMAPSession]):
+        """Return the session to the shared pool."""
+        if mail is None:
+            return
         try:
-            mail.close()
-            mail.logout()
-            print("Successfully disconnected from Gmail")
-        except:
+            get_imap_pool().release(mail)
+        except Exception:
             pass
 
-    def _get_thread_messages(self, mail: imaplib.IMAP4_SSL, msg) -> List[str]:
-        """Get all messages in the thread by following References and In-Reply-To headers."""
-        thread_messages = []
-        
+    async def _aconnect(self) -> AsyncIMAPClient:
+        """Borrow an authenticated asyncio session from the running loop's pool."""
+        try:
+            return await get_async_imap_pool().acquire(self.email_address, self.app_password)
+        except Exception as e:
+            logger.error("Could not connect to Gmail: %s", e)
+            raise e
+
+    def _adisconnect(self, mail: Optional[AsyncIMAPClient]):
+        """Return the asyncio session to its pool."""
+        if mail is None:
+            return
+        try:
+            get_async_imap_pool().release(mail)
+        except Exception:
+            pass
+
+    async def _arun(self, *args, **kwargs):
+        """
+        Async variant of `_run`.
+
+        Tools without a native asyncio implementation run `_run` on a worker
+        thread; with IMAP_BACKEND=asyncio its IMAP traffic still goes through
+        the shared event loop.
+        """
+        return await asyncio.to_thread(self._run, *args, **kwargs)
+
+    def _get_thread_messages(self, mail: PooledIMAPSession, msg, thread_id: Optional[str] = None) -> List[str]:
+        """
+        Get the bodies of the messages this one replies to, in References order.
+
+        Bodies come from the shared ThreadIndex whenever possible. Missing
+        ancestors are pulled with a single UID FETCH of the whole Gmail thread
+        (X-GM-THRID), or of the matching Message-IDs when no thread id is known,
+        and indexed so no ancestor is fetched or cleaned twice. The search runs
+        in All Mail, since archived and sent messages are part of the thread
+        too; INBOX is selected again afterwards.
+        """
         # Get message IDs from References and In-Reply-To headers
         references = msg.get("References", "").split()
         in_reply_to = msg.get("In-Reply-To", "").split()
-        message_ids = list(set(references + in_reply_to))  # Remove duplicates
-        
-        if message_ids:
-            # Search for messages with these Message-IDs
-            search_criteria = ' OR '.join(f'HEADER MESSAGE-ID "{mid}"' for mid in message_ids)
-            result, data = mail.search(None, search_criteria)
-            
-            if result == "OK":
-                thread_ids = data[0].split()
-                for thread_id in thread_ids:
-                    result, msg_data = mail.fetch(thread_id, "(RFC822)")
-                    if result == "OK":
-                        thread_msg = email.message_from_bytes(msg_data[0][1])
-                        # Extract body from thread message
-                        thread_body = self._extract_body(thread_msg)
-                        thread_messages.append(thread_body)
-        
-        return thread_messages
+        message_ids = list(dict.fromkeys(references + in_reply_to))  # Remove duplicates, keep order
+
+        if not message_ids:
+            return []
+
+        index = get_thread_index()
+        bodies = index.get_bodies(message_ids)
+        missing = [mid for mid in message_ids if mid not in bodies]
+
+        if missing and not index.thread_pulled(thread_id):
+            mailbox = get_mailbox_resolver().select(mail, ALL_MAIL, readonly=True)
+            try:
+                if mailbox is None:
+                    mailbox = "INBOX"
+                    mail.select("INBOX")
+                if thread_id:
+                    result, data = mail.uid("SEARCH", None, "X-GM-THRID", thread_id)
+                else:
+                    # Fall back to a header search for just the ancestors we don't have
+                    search_criteria = ' '.join(f'HEADER MESSAGE-ID "{mid}"' for mid in missing)
+                    search_criteria = 'OR ' * (len(missing) - 1) + search_criteria
+                    result, data = mail.uid("SEARCH", None, search_criteria)
+
+                if result == "OK" and data and data[0]:
+                    uids = [uid.decode('utf-8') for uid in data[0].split()]
+                    known = set(index.known_uids(mailbox, mail.uidvalidity, uids))
+                    uids = [uid for uid in uids if uid not in known]
+                    if uids:
+                        self._index_messages(mail, uids, mailbox)
+            finally:
+                mail.select("INBOX")
+            index.mark_thread_pulled(thread_id)
+            bodies = index.get_bodies(message_ids)
+
+        return [bodies[mid] for mid in message_ids if mid in bodies]
+
+    def _index_messages(self, mail: PooledIMAPSession, uids: List[str], mailbox: str = "INBOX"):
+        """Fetch, clean and index the given messages of the selected mailbox in one header + one body round trip."""
+        index = get_thread_index()
+        for batch in chunked(uids, 50):
+            headers = self.fetch_headers(mail, batch)
+            bodies = self.fetch_text_bodies(mail, list(headers.values()))
+            for uid, header in headers.items():
+                index.add(
+                    header['msg'].get('Message-ID', '').strip(),
+                    bodies.get(uid, ""),
+                    mailbox=mailbox,
+                    uidvalidity=mail.uidvalidity,
+                    uid=uid,
+                    thread_id=header['thread_id'],
+                )
+
+    def fetch_headers(self, mail: PooledIMAPSession, email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Phase one: fetch headers, RFC822.SIZE and BODYSTRUCTURE for a batch of UIDs.
+
+        Returns {uid: {"email_id", "thread_id", "msg", "size", "text_parts"}} where
+        `msg` is a header-only email.message.Message.
+        """
+        query = f"(UID X-GM-THRID RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])"
+        with span("imap.fetch", phase="headers", uids=len(email_ids)):
+            result, data = mail.uid("FETCH", compress_uid_set(email_ids), query)
+        if result != "OK":
+            logger.error("Failed to fetch headers for %s: %s", compress_uid_set(email_ids), result)
+            return {}
+
+        headers = {}
+        with span("parse", phase="headers"):
+            for item in parse_fetch_response(data):
+                if item.uid is None:
+                    continue
+                bodystructure = item.parenthesized("BODYSTRUCTURE")
+                headers[item.uid] = {
+                    'email_id': item.uid,
+                    'thread_id': item.atom("X-GM-THRID"),
+                    'msg': email.message_from_bytes(item.literal("BODY[HEADER") or b""),
+                    'size': int(item.atom("RFC822.SIZE") or 0),
+                    'text_parts': find_text_parts(bodystructure) if bodystructure else [],
+                }
+        return headers
+
+    def fetch_summaries(self, mail: PooledIMAPSession, email_ids: List[str]) -> List[Dict[str, str]]:
+        """Fetch only Subject, From and Date for a batch of UIDs, e.g. for audit logs."""
+        result, data = mail.uid('FETCH', compress_uid_set(email_ids), '(UID BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE)])')
+        if result != 'OK':
+            logger.error("Failed to fetch headers for %s: %s", compress_uid_set(email_ids), data)
+            return []
+        summaries = []
+        for item in parse_fetch_response(data):
+            if item.uid is None:
+                continue
+            msg = email.message_from_bytes(item.literal("BODY[HEADER") or b"")
+            summaries.append({
+                'email_id': item.uid,
+                'subject': decode_header_safe(msg["Subject"]),
+                'sender': decode_header_safe(msg["From"]),
+                'date': msg.get("Date", ""),
+            })
+        return summaries
+
+    def search_raw(self, mail: PooledIMAPSession, query: str) -> List[str]:
+        """Run a Gmail search (X-GM-RAW) in the selected mailbox and return the matching UIDs."""
+        with span("imap.search", query=query):
+            result, data = mail.uid('SEARCH', 'X-GM-RAW', quote_astring(query))
+        if result != 'OK':
+            logger.error("Search for %r failed: %s", query, data)
+            return []
+        return [uid.decode() for uid in data[0].split()] if data and data[0] else []
+
+    def fetch_text_bodies(self, mail: PooledIMAPSession, headers: List[Dict[str, Any]],
+                          max_body_bytes: int = DEFAULT_MAX_BODY_BYTES) -> Dict[str, str]:
+        """
+        Phase two: fetch only the text sections of the given messages, capped at
+        `max_body_bytes` each. Messages with the same part layout share one UID FETCH.
+        """
+        groups: Dict[Tuple[str, ...], List[str]] = {}
+        chosen: Dict[str, List[Dict[str, Any]]] = {}
+        for header in headers:
+            parts = header['text_parts']
+            plain = [part for part in parts if part['subtype'] == 'plain']
+            parts = plain or parts
+            if not parts:
+                continue
+            chosen[header['email_id']] = parts
+            groups.setdefault(tuple(part['part'] for part in parts), []).append(header['email_id'])
+
+        bodies: Dict[str, str] = {}
+        for part_numbers, uids in groups.items():
+            sections = " ".join(f"BODY.PEEK[{number}]<0.{max_body_bytes}>" for number in part_numbers)
+            with span("imap.fetch", phase="bodies", uids=len(uids)):
+                result, data = mail.uid("FETCH", compress_uid_set(uids), f"(UID {sections})")
+            if result != "OK":
+                logger.error("Failed to fetch bodies for %s: %s", compress_uid_set(uids), result)
+                continue
+            for item in parse_fetch_response(data):
+                if item.uid not in chosen:
+                    continue
+                texts = []
+                for part in chosen[item.uid]:
+                    payload = item.literals.get(f"BODY[{part['part']}]<0>", item.literals.get(f"BODY[{part['part']}]"))
+                    if payload is None:
+                        continue
+                    text = decode_part_payload(payload, part['encoding'], part['charset'])
+                    # HTML always needs stripping; a single-part plain body gets the
+                    # same whitespace cleanup _extract_body gives it
+                    texts.append(clean_email_body(text) if part['subtype'] == 'html' or part.get('whole') else text)
+                bodies[item.uid] = "".join(texts)
+        return bodies
 
     def _extract_body(self, msg) -> str:
-        """Extract body from an email message."""
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition"))
-
-                try:
-                    email_body = part.get_payload(decode=True).decode()
-                except:
-                    email_body = ""
-
-                if content_type == "text/plain" and "attachment" not in content_disposition:
-                    body += email_body
-                elif content_type == "text/html" and "attachment" not in content_disposition:
-                    body += clean_email_body(email_body)
-        else:
+        """
+        Extract body from an email message.
+
+        Only text/plain and text/html parts that aren't attachments are decoded;
+        plain text is preferred over HTML when both are present.
+        """
+        plain, html = [], []
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            if content_type not in ("text/plain", "text/html"):
+                continue
+            if "attachment" in str(part.get("Content-Disposition", "")).lower():
+                continue
             try:
-                body = clean_email_body(msg.get_payload(decode=True).decode())
+                payload = part.get_payload(decode=True) or b""
+                text = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+            except LookupError:
+                text = payload.decode("utf-8", errors="replace")
             except Exception as e:
-                body = f"Error decoding body: {e}"
-        return body
+                logger.warning("Could not decode body part: %s", e)
+                continue
+            (plain if content_type == "text/plain" else html).append(text)
+        if plain:
+            return "".join(plain) if msg.is_multipart() else clean_email_body(plain[0])
+        return "".join(clean_email_body(text) for text in html)
+
+    def _streamed_body(self, streamed: StreamedMessage) -> str:
+        """Body text from a streaming extraction, preferring plain text over HTML."""
+        if streamed.plain.strip():
+            return streamed.plain if streamed.multipart else clean_email_body(streamed.plain)
+        return clean_email_body(streamed.html) if streamed.html else ""
 
 class GetUnreadEmailsSchema(BaseModel):
     """Schema for GetUnreadEmailsTool input."""
@@ -152,86 +368,297 @@ class GetUnreadEmailsTool(GmailToolBase):
     description: str = "Gets unread emails from Gmail"
     args_schema: Type[BaseModel] = GetUnreadEmailsSchema
     
-    def _run(self, limit: Optional[int] = 5) -> List[Tuple[str, str, str, str, Dict]]:
+    fetch_batch_size: int = Field(default=25, description="Number of UIDs requested per UID FETCH round trip")
+    two_phase: bool = Field(default=True, description="Fetch headers first and only download text body sections")
+    max_body_bytes: int = Field(default=DEFAULT_MAX_BODY_BYTES, description="Byte cap per text body section in two-phase mode")
+    max_body_chars: int = Field(default=DEFAULT_MAX_BODY_CHARS, description="Character budget per body when whole messages are fetched")
+    queue_size: int = Field(default=8, description="Emails the background fetch may run ahead of the consumer when streaming")
+
+    @traced_tool
+    def _run(self, limit: Optional[int] = 5, batch_size: Optional[int] = None,
+             two_phase: Optional[bool] = None, max_body_bytes: Optional[int] = None,
+             since_uid: Optional[int] = None,
+             header_filter: Optional[Callable[[Dict[str, Any]], bool]] = None) -> List[Tuple[str, str, str, str, Dict]]:
+        emails = []
+        try:
+            for email_tuple in self.iter_unread_emails(limit=limit, batch_size=batch_size,
+                                                       two_phase=two_phase, max_body_bytes=max_body_bytes,
+                                                       since_uid=since_uid, header_filter=header_filter):
+                emails.append(email_tuple)
+        except Exception as e:
+            logger.exception("Exception in GetUnreadEmailsTool: %s", e)
+        logger.debug("Returning %d email tuples", len(emails))
+        return emails
+
+    def iter_unread_emails(self, limit: Optional[int] = 5, batch_size: Optional[int] = None,
+                           two_phase: Optional[bool] = None, max_body_bytes: Optional[int] = None,
+                           header_filter: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                           since_uid: Optional[int] = None) -> Iterator[Tuple[str, str, str, str, Dict]]:
+        """
+        Yield unread emails (newest first) as they arrive.
+
+        UIDs are fetched in chunks of `batch_size` with one UID FETCH per chunk,
+        so N messages cost about N/batch_size round trips. The yielded email IDs
+        are UIDs, which stay valid for GmailOrganizeTool and GmailDeleteTool even
+        if other messages are expunged in the meantime.
+
+        By default (two-phase mode) only headers, size and BODYSTRUCTURE are
+        fetched for the whole chunk; the text/plain or text/html sections (capped
+        at `max_body_bytes`) are then fetched for the messages `header_filter`
+        keeps, so attachments never leave the server. Messages it rejects are
+        yielded with a lazy body that is only downloaded if something asks for
+        it. With `two_phase=False` whole messages are fetched with BODY.PEEK[];
+        the full literal is then held in memory and only the decoding of
+        non-text parts is skipped.
+
+        With `since_uid` only messages with a higher UID are considered, and the
+        oldest `limit` of them are taken so that a checkpoint at the highest
+        processed UID never skips anything.
+
+        A failed SEARCH raises imaplib.IMAP4.error, and so does the end of the
+        iteration when any of the found messages could not be fetched, after
+        every message that could be was yielded.
+        """
+        batch_size = batch_size or self.fetch_batch_size
+        two_phase = self.two_phase if two_phase is None else two_phase
+        max_body_bytes = max_body_bytes or self.max_body_bytes
+        # Threads may have new replies since the last run, so pull them again
+        get_thread_index().reset_pulled_threads()
         mail = self._connect()
         try:
-            print("DEBUG: Connecting to Gmail...")
             mail.select("INBOX")
-            result, data = mail.search(None, 'UNSEEN')
-            
-            print(f"DEBUG: Search result: {result}")
-            
+            with span("imap.search", query="UNSEEN", since_uid=since_uid) as attrs:
+                if since_uid is not None:
+                    result, data = mail.uid("SEARCH", None, f"UID {int(since_uid) + 1}:*", "UNSEEN")
+                else:
+                    result, data = mail.uid("SEARCH", None, "UNSEEN")
+                attrs['result'] = result
+
+            logger.debug("Search result: %s", result)
+
             if result != "OK":
-                print("DEBUG: Error searching for unseen emails")
-                return []
-            
+                raise imaplib.IMAP4.error(f"Search for unseen emails failed: {data}")
+
             email_ids = data[0].split()
-            print(f"DEBUG: Found {len(email_ids)} unread emails")
-            
+            logger.debug("Found %d unread emails", len(email_ids))
+
             if not email_ids:
-                print("DEBUG: No unread emails found.")
-                return []
-            
-            email_ids = list(reversed(email_ids))
+                logger.debug("No unread emails found.")
+                return
+
+            if since_uid is not None:
+                # "N:*" always matches the last message, even below N
+                email_ids = [uid for uid in email_ids if int(uid) > int(since_uid)][:limit]
+            email_ids = [uid.decode('utf-8') for uid in reversed(email_ids)]
             email_ids = email_ids[:limit]
-            print(f"DEBUG: Processing {len(email_ids)} emails")
-            
-            emails = []
-            for i, email_id in enumerate(email_ids):
-                print(f"DEBUG: Processing email {i+1}/{len(email_ids)}")
-                result, msg_data = mail.fetch(email_id, "(RFC822)")
-                if result != "OK":
-                    print(f"Error fetching email {email_id}:", result)
-                    continue
+            logger.debug("Processing %d emails in batches of %d", len(email_ids), batch_size)
 
-                raw_email = msg_data[0][1]
-                msg = email.message_from_bytes(raw_email)
+            yielded = set()
+            for batch in chunked(email_ids, batch_size):
+                if two_phase:
+                    emails = self._iter_two_phase_batch(mail, batch, max_body_bytes, header_filter)
+                else:
+                    emails = self._iter_full_batch(mail, batch)
+                for email_tuple in emails:
+                    yielded.add(email_tuple[3])
+                    yield email_tuple
 
-                # Decode headers properly (handles encoded characters)
-                subject = decode_header_safe(msg["Subject"])
-                sender = decode_header_safe(msg["From"])
-                
-                # Extract and standardize the date
-                date_str = msg.get("Date", "")
-                received_date = self._parse_email_date(date_str)
-                
-                # Get the current message body
-                current_body = self._extract_body(msg)
-                
-                # Get thread messages
-                thread_messages = self._get_thread_messages(mail, msg)
-                
-                # Combine current message with thread history
-                full_body = "\n\n--- Previous Messages ---\n".join([current_body] + thread_messages)
-
-                # Get thread metadata
-                thread_info = {
-                    'message_id': msg.get('Message-ID', ''),
-                    'in_reply_to': msg.get('In-Reply-To', ''),
-                    'references': msg.get('References', ''),
-                    'date': received_date,  # Use standardized date
-                    'raw_date': date_str,   # Keep original date string
-                    'email_id': email_id.decode('utf-8')
-                }
+            # Fail loudly so a sync checkpoint never moves past mail that didn't arrive
+            missing = [email_id for email_id in email_ids if email_id not in yielded]
+            if missing:
+                raise imaplib.IMAP4.error(f"{len(missing)} of {len(email_ids)} unread emails could not be fetched: "
+                                          f"{compress_uid_set(missing)}")
+        finally:
+            self._disconnect(mail)
 
-                # Add a clear date indicator in the body for easier extraction
-                full_body = f"EMAIL DATE: {received_date}\n\n{full_body}"
-                
-                # Print the structure of what we're appending
-                print(f"DEBUG: Email tuple structure: subject={subject}, sender={sender}, body_length={len(full_body)}, email_id={email_id.decode('utf-8')}, thread_info_keys={thread_info.keys()}")
-                
-                emails.append((subject, sender, full_body, email_id.decode('utf-8'), thread_info))
-            
-            print(f"DEBUG: Returning {len(emails)} email tuples")
-            return emails
-        except Exception as e:
-            print(f"DEBUG: Exception in GetUnreadEmailsTool: {e}")
-            import traceback
-            traceback.print_exc()
-            return []
+    def _iter_full_batch(self, mail: PooledIMAPSession, batch: List[str]) -> Iterator[Tuple[str, str, str, str, Dict]]:
+        with span("imap.fetch", phase="messages", uids=len(batch)):
+            # BODY.PEEK[] rather than RFC822, which would mark the message \Seen
+            result, msg_data = mail.uid("FETCH", compress_uid_set(batch), "(UID X-GM-THRID BODY.PEEK[])")
+        if result != "OK":
+            logger.error("Failed to fetch emails %s: %s", compress_uid_set(batch), result)
+            return
+
+        with span("parse", phase="fetch_response"):
+            fetched = {item.uid: item for item in parse_fetch_response(msg_data)}
+        for email_id in batch:
+            item = fetched.get(email_id)
+            if item is None or item.literal("BODY[]") is None:
+                logger.error("Email %s missing from FETCH response", email_id)
+                continue
+            # Decode only the text parts; attachments stream past undecoded
+            with span("parse", phase="message", bytes=len(item.literal("BODY[]"))):
+                streamed = extract_text_streaming(item.literal("BODY[]"), self.max_body_chars)
+            yield self._build_email_tuple(mail, email_id, streamed.headers, self._streamed_body(streamed),
+                                          thread_id=item.atom("X-GM-THRID"))
+
+    def stream_unread_emails(self, queue_size: Optional[int] = None, **kwargs) -> Prefetcher:
+        """
+        iter_unread_emails() on a background thread, feeding a bounded queue.
+
+        The consumer can work on the first emails while later ones are still
+        downloading; once `queue_size` emails are waiting the fetch pauses, so
+        memory is capped by the queue depth rather than by `limit`. Takes the
+        same keyword arguments as iter_unread_emails(). Close the returned
+        iterator (or use it as a context manager) if it isn't read to the end.
+        """
+        return Prefetcher(self.iter_unread_emails(**kwargs), queue_size or self.queue_size, name="imap-fetch")
+
+    def plan_sync(self, mailbox: str = "INBOX") -> Dict[str, Any]:
+        """
+        Compare the mailbox STATUS with the stored sync checkpoint.
+
+        Returns the server's uidvalidity/uidnext/highestmodseq plus `since_uid`
+        and `unchanged` (True when no message has arrived since the checkpoint).
+        Without a usable checkpoint `since_uid` is 0, so the first sync takes
+        the oldest unread messages: starting from the newest ones would put
+        the checkpoint above every older unread message and skip them for good.
+        A checkpoint recorded under a different UIDVALIDITY is dropped, since
+        its UIDs no longer mean anything.
+        """
+        store = get_sync_state()
+        checkpoint = store.get(self.email_address, mailbox)
+        mail = self._connect()
+        try:
+            result, data = mail.status(mailbox, "(UIDVALIDITY UIDNEXT HIGHESTMODSEQ)")
         finally:
             self._disconnect(mail)
 
+        status = parse_status_response(data[0]) if result == "OK" and data else {}
+        plan = {
+            'mailbox': mailbox,
+            'uidvalidity': status.get('UIDVALIDITY'),
+            'uidnext': status.get('UIDNEXT'),
+            'highestmodseq': status.get('HIGHESTMODSEQ'),
+            'since_uid': 0,
+            'unchanged': False,
+        }
+
+        if checkpoint and checkpoint['uidvalidity'] != plan['uidvalidity']:
+            logger.info("UIDVALIDITY of %s changed, resetting sync checkpoint", mailbox)
+            store.reset(self.email_address, mailbox)
+            checkpoint = None
+
+        if checkpoint:
+            plan['since_uid'] = checkpoint['last_uid']
+            if plan['uidnext'] is not None:
+                plan['unchanged'] = int(plan['uidnext']) <= checkpoint['last_uid'] + 1
+            else:
+                plan['unchanged'] = plan['highestmodseq'] is not None and plan['highestmodseq'] == checkpoint['highestmodseq']
+        return plan
+
+    def commit_sync(self, plan: Dict[str, Any], processed_ids: List[str], drained: bool = False):
+        """
+        Advance the sync checkpoint past the processed UIDs.
+
+        `drained` means the run took every new unread message, so the checkpoint
+        can move up to the UIDNEXT seen in `plan` even past already-read mail.
+        """
+        last_uid = max([int(uid) for uid in processed_ids] + [int(plan.get('since_uid') or 0)])
+        if drained and plan.get('uidnext'):
+            last_uid = max(last_uid, int(plan['uidnext']) - 1)
+        if last_uid <= 0 or plan.get('uidvalidity') is None:
+            return
+        get_sync_state().save(self.email_address, plan['mailbox'], plan['uidvalidity'], last_uid,
+                              plan.get('highestmodseq'))
+        logger.debug("Sync checkpoint for %s advanced to UID %s", plan['mailbox'], last_uid)
+
+    def _iter_two_phase_batch(self, mail: PooledIMAPSession, batch: List[str], max_body_bytes: int,
+                              header_filter: Optional[Callable[[Dict[str, Any]], bool]]) -> Iterator[Tuple[str, str, str, str, Dict]]:
+        headers = self.fetch_headers(mail, batch)
+        keep = [headers[uid] for uid in batch if uid in headers and (header_filter is None or header_filter(headers[uid]))]
+        kept_ids = {header['email_id'] for header in keep}
+        bodies = self.fetch_text_bodies(mail, keep, max_body_bytes)
+        for email_id in batch:
+            header = headers.get(email_id)
+            if header is None:
+                logger.error("Email %s missing from FETCH response", email_id)
+                continue
+            if email_id in kept_ids:
+                if header['text_parts'] and email_id not in bodies:
+                    # Left out, so the end of the iteration reports it as not fetched
+                    logger.error("Body of email %s missing from FETCH response", email_id)
+                    continue
+                yield self._build_email_tuple(mail, email_id, header['msg'], bodies.get(email_id, ""),
+                                              thread_id=header['thread_id'])
+            else:
+                yield self._build_email_tuple(mail, email_id, header['msg'], lazy_body=self._lazy_body(header, max_body_bytes),
+                                              thread_id=header['thread_id'])
+
+    def _lazy_body(self, header: Dict[str, Any], max_body_bytes: int) -> Callable[[], str]:
+        """Build a loader that downloads a message's text body on first use."""
+        def load() -> str:
+            mail = self._connect()
+            try:
+                mail.select("INBOX")
+                current_body = self.fetch_text_bodies(mail, [header], max_body_bytes).get(header['email_id'], "")
+                received_date = self._parse_email_date(header['msg'].get("Date", ""))
+                return self._compose_body(mail, email_id=header['email_id'], msg=header['msg'], current_body=current_body,
+                                          received_date=received_date, thread_id=header['thread_id'])
+            finally:
+                self._disconnect(mail)
+        return load
+
+    def _compose_body(self, mail: PooledIMAPSession, email_id: str, msg, current_body: str, received_date: str,
+                      thread_id: Optional[str] = None) -> str:
+        """Combine the current body with its thread history under an EMAIL DATE header."""
+        # Index this message so later replies in the batch don't fetch it again
+        get_thread_index().add(msg.get('Message-ID', '').strip(), current_body, mailbox="INBOX",
+                               uidvalidity=mail.uidvalidity, uid=email_id, thread_id=thread_id)
+
+        # Get thread messages
+        thread_messages = self._get_thread_messages(mail, msg, thread_id)
+
+        # Combine current message with thread history
+        full_body = "\n\n--- Previous Messages ---\n".join([current_body] + thread_messages)
+
+        # Add a clear date indicator in the body for easier extraction
+        return f"EMAIL DATE: {received_date}\n\n{full_body}"
+
+    def _build_email_tuple(self, mail: PooledIMAPSession, email_id: str, msg, current_body: Optional[str] = None,
+                           lazy_body: Optional[Callable[[], str]] = None,
+                           thread_id: Optional[str] = None) -> Tuple[str, str, Any, str, Dict]:
+        """
+        Turn a parsed message into the (subject, sender, body, email_id, thread_info) tuple.
+
+        When `lazy_body` is given it is placed in the tuple instead of the body text.
+        """
+        # Decode headers properly (handles encoded characters)
+        subject = decode_header_safe(msg["Subject"])
+        sender = decode_header_safe(msg["From"])
+
+        # Extract and standardize the date
+        date_str = msg.get("Date", "")
+        received_date = self._parse_email_date(date_str)
+
+        if lazy_body is not None:
+            full_body = lazy_body
+        else:
+            # Get the current message body
+            if current_body is None:
+                current_body = self._extract_body(msg)
+            full_body = self._compose_body(mail, email_id, msg, current_body, received_date, thread_id)
+
+        # Get thread metadata
+        thread_info = {
+            'message_id': msg.get('Message-ID', ''),
+            'in_reply_to': msg.get('In-Reply-To', ''),
+            'references': msg.get('References', ''),
+            'date': received_date,  # Use standardized date
+            'raw_date': date_str,   # Keep original date string
+            'email_id': email_id,
+            'thread_id': thread_id,  # Gmail X-GM-THRID
+            'list_unsubscribe': msg.get('List-Unsubscribe', ''),
+            'precedence': msg.get('Precedence', '')
+        }
+
+        if logger.isEnabledFor(logging.DEBUG):
+            body_length = len(full_body) if isinstance(full_body, str) else "lazy"
+            logger.debug("Email tuple structure: subject=%s, sender=%s, body_length=%s, email_id=%s, thread_info_keys=%s",
+                         subject, sender, body_length, email_id, list(thread_info))
+
+        return (subject, sender, full_body, email_id, thread_info)
+
     def _parse_email_date(self, date_str: str) -> str:
         """
         Parse email date string into a standardized format.
@@ -250,7 +677,7 @@ class GetUnreadEmailsTool(GmailToolBase):
             if parsed_date:
                 return parsed_date.strftime("%Y-%m-%d")
         except Exception as e:
-            print(f"Error parsing date '{date_str}': {e}")
+            logger.warning("Could not parse date '%s': %s", date_str, e)
         
         return ""
 
@@ -261,7 +688,7 @@ class SaveDraftSchema(BaseModel):
     recipient: str = Field(..., description="Recipient email address")
     thread_info: Optional[Dict[str, Any]] = Field(None, description="Thread information for replies")
 
-class SaveDraftTool(BaseTool):
+class SaveDraftTool(GmailToolBase):
     """Tool to save an email as a draft using IMAP."""
     name: str = "save_email_draft"
     description: str = "Saves an email as a draft in Gmail"
@@ -278,174 +705,116 @@ class SaveDraftTool(BaseTool):
         
         return body
 
-    def _connect(self):
-        """Connect to Gmail using IMAP."""
-        # Get email credentials from environment
-        email_address = os.environ.get('EMAIL_ADDRESS')
-        app_password = os.environ.get('APP_PASSWORD')
-        
-        if not email_address or not app_password:
-            raise ValueError("EMAIL_ADDRESS or APP_PASSWORD environment variables not set")
-        
-        # Connect to Gmail's IMAP server
-        mail = imaplib.IMAP4_SSL('imap.gmail.com')
-        print(f"Connecting to Gmail with email: {email_address[:3]}...{email_address[-10:]}")
-        mail.login(email_address, app_password)
-        return mail, email_address
-
-    def _disconnect(self, mail):
-        """Disconnect from Gmail."""
-        try:
-            mail.logout()
-        except:
-            pass
+    def _build_message(self, subject: str, body: str, recipient: str,
+                       thread_info: Optional[Dict[str, Any]] = None) -> email.message.EmailMessage:
+        """Create the draft message, with reply headers when thread_info is given."""
+        message = email.message.EmailMessage()
+        message["From"] = self.email_address
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(self._format_body(body))
 
-    def _check_drafts_folder(self, mail):
-        """Check available mailboxes to find the drafts folder."""
-        print("Checking available mailboxes...")
-        result, mailboxes = mail.list()
-        if result == 'OK':
-            drafts_folders = []
-            for mailbox in mailboxes:
-                if b'Drafts' in mailbox or b'Draft' in mailbox:
-                    drafts_folders.append(mailbox.decode())
-                    print(f"Found drafts folder: {mailbox.decode()}")
-            return drafts_folders
-        return []
-
-    def _verify_draft_saved(self, mail, subject, recipient):
-        """Verify if the draft was actually saved by searching for it."""
-        try:
-            # Try different drafts folder names
-            drafts_folders = [
-                '"[Gmail]/Drafts"', 
-                'Drafts',
-                'DRAFTS',
-                '"[Google Mail]/Drafts"',
-                '[Gmail]/Drafts'
-            ]
+        # Add thread headers if this is a reply
+        if thread_info:
+            # References header should include all previous message IDs
+            references = []
+            if thread_info.get('references'):
+                references.extend(thread_info['references'].split())
+            if thread_info.get('message_id'):
+                references.append(thread_info['message_id'])
             
-            for folder in drafts_folders:
-                try:
-                    print(f"Checking folder: {folder}")
-                    result, _ = mail.select(folder, readonly=True)
-                    if result != 'OK':
-                        continue
-                        
-                    # Search for drafts with this subject
-                    search_criteria = f'SUBJECT "{subject}"'
-                    result, data = mail.search(None, search_criteria)
-                    
-                    if result == 'OK' and data[0]:
-                        draft_count = len(data[0].split())
-                        print(f"Found {draft_count} drafts matching subject '{subject}' in folder {folder}")
-                        return True, folder
-                    else:
-                        print(f"No drafts found matching subject '{subject}' in folder {folder}")
-                except Exception as e:
-                    print(f"Error checking folder {folder}: {e}")
-                    continue
-                    
-            return False, None
-        except Exception as e:
-            print(f"Error verifying draft: {e}")
-            return False, None
+            if references:
+                message["References"] = " ".join(references)
+            
+            # In-Reply-To should point to the immediate parent message
+            if thread_info.get('message_id'):
+                message["In-Reply-To"] = thread_info['message_id']
+
+            # Make sure subject has "Re: " prefix
+            if not subject.lower().startswith('re:'):
+                message.replace_header("Subject", f"Re: {subject}")
+
+        return message
 
+    @traced_tool
     def _run(self, subject: str, body: str, recipient: str, thread_info: Optional[Dict[str, Any]] = None) -> str:
-        try:
-            mail, email_address = self._connect()
-            
-            # Check available drafts folders
-            drafts_folders = self._check_drafts_folder(mail)
-            print(f"Available drafts folders: {drafts_folders}")
-            
-            # Try with quoted folder name first
-            drafts_folder = '"[Gmail]/Drafts"'
-            print(f"Selecting drafts folder: {drafts_folder}")
-            result, _ = mail.select(drafts_folder)
-            
-            # If that fails, try without quotes
-            if result != 'OK':
-                drafts_folder = '[Gmail]/Drafts'
-                print(f"First attempt failed. Trying: {drafts_folder}")
-                result, _ = mail.select(drafts_folder)
-                
-            # If that also fails, try just 'Drafts'
-            if result != 'OK':
-                drafts_folder = 'Drafts'
-                print(f"Second attempt failed. Trying: {drafts_folder}")
-                result, _ = mail.select(drafts_folder)
-                
-            if result != 'OK':
-                return f"Error: Could not select drafts folder. Available folders: {drafts_folders}"
-                
-            print(f"Successfully selected drafts folder: {drafts_folder}")
-            
-            # Format body and add signature
-            body_with_signature = self._format_body(body)
-            
-            # Create the email message
-            message = email.message.EmailMessage()
-            message["From"] = email_address
-            message["To"] = recipient
-            message["Subject"] = subject
-            message.set_content(body_with_signature)
-            print(f"Created message with subject: {subject}")
-
-            # Add thread headers if this is a reply
-            if thread_info:
-                # References header should include all previous message IDs
-                references = []
-                if thread_info.get('references'):
-                    references.extend(thread_info['references'].split())
-                if thread_info.get('message_id'):
-                    references.append(thread_info['message_id'])
-                
-                if references:
-                    message["References"] = " ".join(references)
-                
-                # In-Reply-To should point to the immediate parent message
-                if thread_info.get('message_id'):
-                    message["In-Reply-To"] = thread_info['message_id']
-
-                # Make sure subject has "Re: " prefix
-                if not subject.lower().startswith('re:'):
-                    message["Subject"] = f"Re: {subject}"
-                    
-                print(f"Added thread information for reply")
-
-            # Save to drafts
-            print(f"Attempting to save draft to {drafts_folder}...")
-            date = imaplib.Time2Internaldate(time.time())
-            result, data = mail.append(drafts_folder, '\\Draft', date, message.as_bytes())
-            
-            if result != 'OK':
-                return f"Error saving draft: {result}, {data}"
-                
-            print(f"Draft save attempt result: {result}")
-            
-            # Verify the draft was actually saved
-            verified, folder = self._verify_draft_saved(mail, subject, recipient)
-            
-            if verified:
-                return f"VERIFIED: Draft email saved with subject: '{subject}' in folder {folder}"
-            else:
-                # Try Gmail's API approach as a fallback
-                try:
-                    # Try saving directly to All Mail and flagging as draft
-                    result, data = mail.append('[Gmail]/All Mail', '\\Draft', date, message.as_bytes())
-                    if result == 'OK':
-                        return f"Draft saved to All Mail with subject: '{subject}' (flagged as draft)"
-                    else:
-                        return f"WARNING: Draft save attempt returned {result}, but verification failed. Please check your Gmail Drafts folder."
-                except Exception as e:
-                    return f"WARNING: Draft may not have been saved properly: {str(e)}"
+        saved = self.save_many([{
+            'subject': subject,
+            'body': body,
+            'recipient': recipient,
+            'thread_info': thread_info,
+        }])[0]
+        if saved['status'] != 'saved':
+            return f"Error saving draft: {saved['error']}"
+        if saved['uid']:
+            return f"VERIFIED: Draft email saved with subject: '{subject}' in folder {saved['folder']} (UID {saved['uid']})"
+        return f"Draft email saved with subject: '{subject}' in folder {saved['folder']}"
+
+    def save_many(self, drafts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Save drafts ({subject, body, recipient, thread_info}) with one APPEND each over one session.
 
+        The APPENDUID code of a UIDPLUS server is the proof a draft landed, so
+        nothing is searched or appended again afterwards. If an APPEND is
+        rejected the drafts folder is resolved again once, in case it moved.
+        """
+        results = []
+        mail = None
+        try:
+            mail = self._connect()
+            resolver = get_mailbox_resolver()
+            drafts_folder = resolver.resolve(mail, DRAFTS)
+            retried = False
+            for draft in drafts:
+                saved = {'subject': draft['subject'], 'recipient': draft['recipient'],
+                         'status': 'failed', 'folder': drafts_folder, 'uid': None, 'error': None}
+                results.append(saved)
+                if drafts_folder is None:
+                    saved['error'] = "no drafts folder found"
+                    continue
+                message = self._build_message(draft['subject'], draft['body'], draft['recipient'],
+                                              draft.get('thread_info')).as_bytes()
+                date = imaplib.Time2Internaldate(time.time())
+                result, data = mail.append(quote_astring(drafts_folder), '\\Draft', date, message)
+                if result != 'OK' and not retried:
+                    retried = True
+                    resolver.invalidate(mail.email_address)
+                    drafts_folder = saved['folder'] = resolver.resolve(mail, DRAFTS)
+                    if drafts_folder is not None:
+                        result, data = mail.append(quote_astring(drafts_folder), '\\Draft', date, message)
+                if result != 'OK':
+                    saved['error'] = f"{result}, {data}"
+                    continue
+                saved['status'] = 'saved'
+                saved['uid'] = _append_uid(data)
         except Exception as e:
-            return f"Error saving draft: {str(e)}"
+            for saved in results:
+                if saved['status'] != 'saved':
+                    saved['error'] = saved['error'] or str(e)
+            results.extend({'subject': draft['subject'], 'recipient': draft['recipient'], 'status': 'failed',
+                            'folder': None, 'uid': None, 'error': str(e)}
+                           for draft in drafts[len(results):])
         finally:
             self._disconnect(mail)
 
+        saved_count = sum(1 for saved in results if saved['status'] == 'saved')
+        EMAIL_ACTIONS.inc(saved_count, action="draft")
+        logger.info("Saved %d/%d drafts", saved_count, len(drafts))
+        return results
+
+
+_APPENDUID = re.compile(rb"\[APPENDUID \d+ ([\d:,]+)\]", re.IGNORECASE)
+
+
+def _append_uid(data: Any) -> Optional[str]:
+    """The UID from a UIDPLUS `[APPENDUID <uidvalidity> <uid>]` response code, if the server sent one."""
+    for item in data or []:
+        if isinstance(item, bytes):
+            match = _APPENDUID.search(item)
+            if match:
+                return match.group(1).decode()
+    return None
+
 class GmailOrganizeSchema(BaseModel):
     """Schema for GmailOrganizeTool input."""
     email_id: str = Field(..., description="Email ID to organize")
@@ -460,60 +829,239 @@ class GmailOrganizeTool(GmailToolBase):
     description: str = "Organizes emails using Gmail's priority features based on category and priority"
     args_schema: Type[BaseModel] = GmailOrganizeSchema
 
+    # UIDs per STORE command, to keep command lines a sane length
+    store_chunk_size: int = 500
+
+    # Decisions from concurrent `_arun` calls waiting for their shared batch, per event loop
+    _pending_organize: Dict[Any, List[Tuple[Tuple[str, List[str], Any], Any]]] = PrivateAttr(default_factory=dict)
+
+    @traced_tool
     def _run(self, email_id: str, category: str, priority: str, should_star: bool = False, labels: List[str] = None) -> str:
         """Organize an email with the specified parameters."""
         if labels is None:
             # Provide a default empty list to avoid validation errors
             labels = []
         
-        print(f"Organizing email {email_id} with category {category}, priority {priority}, star={should_star}, labels={labels}")
+        logger.info("Organizing email %s with category %s, priority %s, star=%s, labels=%s",
+                    email_id, category, priority, should_star, labels)
         
+        labels, flags = self._plan_decision(category, priority, should_star, labels)
+        try:
+            result = self.organize_many([(email_id, labels, flags)])
+            if result['failed']:
+                return f"Error organizing email: the server rejected the update for {email_id}"
+            return f"Email organized: Starred={bool(flags)}, Labels={labels}"
+        except Exception as e:
+            return f"Error organizing email: {e}"
+
+    @staticmethod
+    def _plan_decision(category: Optional[str], priority: Optional[str], should_star: bool,
+                       labels: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Turn an organize decision into the labels and flags to store.
+
+        Only urgent, high-priority mail is starred. \\Important is a Gmail
+        label rather than an IMAP flag, so it goes with the X-GM-LABELS.
+        """
+        labels = list(labels)
+        flags = []
+        if category == "Urgent Response Needed" and priority == "High":
+            if should_star:
+                flags.append('\\Flagged')
+            # Mark as important and apply the URGENT label
+            for label in ('\\Important', 'URGENT'):
+                if label not in labels:
+                    labels.append(label)
+        return labels, flags
+
+    def organize_many(self, decisions: List[Tuple[str, List[str], Any]]) -> Dict[str, Any]:
+        """
+        Apply many organize decisions with as few IMAP commands as possible.
+
+        Each decision is `(email_id, labels, star)`, where `star` is a bool or
+        a list of flags. Decisions with identical label and flag sets share one
+        UID STORE over a compressed UID set, and labels are only created when
+        the cached LIST result doesn't already have them. Emails whose STORE
+        the server rejected are returned under `failed`.
+        """
+        groups = self._group_decisions(decisions)
         mail = self._connect()
         try:
-            # Select inbox to ensure we can access the email
             mail.select("INBOX")
-            
-            # Apply organization based on category and priority
-            if category == "Urgent Response Needed" and priority == "High":
-                # Star the email
-                if should_star:
-                    mail.store(email_id, '+FLAGS', '\\Flagged')
-                
-                # Mark as important
-                mail.store(email_id, '+FLAGS', '\\Important')
-                
-                # Apply URGENT label if it doesn't exist
-                if "URGENT" not in labels:
-                    labels.append("URGENT")
-
-            # Apply all specified labels
-            for label in labels:
-                try:
-                    # Create label if it doesn't exist
-                    mail.create(label)
-                except:
-                    pass  # Label might already exist
-                
-                # Apply label
-                mail.store(email_id, '+X-GM-LABELS', label)
+            self._ensure_labels(mail, {label for labels, _ in groups for label in labels})
+            stores = self._store_commands(groups)
+            results = [mail.uid('STORE', *store) for _, store in stores]
+            return self._organized(decisions, groups, stores, results)
+        finally:
+            self._disconnect(mail)
 
-            return f"Email organized: Starred={should_star}, Labels={labels}"
+    async def organize_many_async(self, decisions: List[Tuple[str, List[str], Any]]) -> Dict[str, Any]:
+        """
+        organize_many() on the asyncio backend.
+
+        The label CREATEs and then all the STOREs are pipelined, so each
+        batch of commands costs one round trip however many groups there are.
+        """
+        groups = self._group_decisions(decisions)
+        mail = await self._aconnect()
+        try:
+            await mail.select("INBOX")
+            wanted = {label for labels, _ in groups for label in labels}
+            if self._labels_to_create(wanted) is None:
+                self._remember_labels(await mail.list())
+            missing = self._labels_to_create(wanted)
+            results = await asyncio.gather(*(mail.create(quote_astring(label)) for label in missing))
+            for label, (result, data) in zip(missing, results):
+                self._created_label(label, result, data)
+            stores = self._store_commands(groups)
+            results = await mail.pipeline(*(('STORE',) + store for _, store in stores))
+            return self._organized(decisions, groups, stores, results)
+        finally:
+            self._adisconnect(mail)
 
+    @traced_tool
+    async def _arun(self, email_id: str, category: str, priority: str, should_star: bool = False,
+                    labels: List[str] = None) -> str:
+        """Organize an email on the asyncio backend."""
+        labels, flags = self._plan_decision(category, priority, should_star, labels or [])
+        try:
+            result = await self._organize_coalesced((email_id, labels, flags))
+            if email_id in result['failed']:
+                return f"Error organizing email: the server rejected the update for {email_id}"
+            return f"Email organized: Starred={bool(flags)}, Labels={labels}"
         except Exception as e:
             return f"Error organizing email: {e}"
-        finally:
-            self._disconnect(mail)
+
+    async def _organize_coalesced(self, decision: Tuple[str, List[str], Any]) -> Dict[str, Any]:
+        """
+        Queue one decision and wait for the batch it ends up in.
+
+        Calls made together on one event loop are applied by a single
+        organize_many_async(), so N concurrent `_arun` calls share one
+        connection and one pipelined round of CREATEs and STOREs instead of
+        each borrowing a session of its own.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending_organize.setdefault(loop, [])
+        pending.append((decision, future))
+        if len(pending) == 1:
+            # Let every call that is already scheduled queue up before flushing
+            loop.call_soon(lambda: loop.create_task(self._flush_organize(loop)))
+        return await future
+
+    async def _flush_organize(self, loop: asyncio.AbstractEventLoop):
+        batch = self._pending_organize.pop(loop, [])
+        try:
+            result = await self.organize_many_async([decision for decision, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for _, future in batch:
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    def _group_decisions(decisions: List[Tuple[str, List[str], Any]]) -> Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], List[str]]:
+        """Group email IDs by their (labels, flags) so each group needs one STORE per item."""
+        groups: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], List[str]] = {}
+        for email_id, labels, star in decisions:
+            if isinstance(star, bool):
+                flags = ['\\Flagged'] if star else []
+            else:
+                flags = list(star or [])
+            key = (tuple(sorted(set(labels or []))), tuple(sorted(set(flags))))
+            groups.setdefault(key, []).append(str(email_id))
+        return groups
+
+    def _store_commands(self, groups: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], List[str]]) -> List[Tuple[List[str], Tuple[str, str, str]]]:
+        """The `UID STORE` arguments that apply every group, each with the email IDs it covers."""
+        stores = []
+        for (labels, flags), email_ids in groups.items():
+            for chunk in chunked(email_ids, self.store_chunk_size):
+                uid_set = compress_uid_set(chunk)
+                if labels:
+                    stores.append((chunk, (uid_set, '+X-GM-LABELS', '(' + ' '.join(_label_atom(l) for l in labels) + ')')))
+                if flags:
+                    stores.append((chunk, (uid_set, '+FLAGS', '(' + ' '.join(flags) + ')')))
+        return stores
+
+    @staticmethod
+    def _organized(decisions: List[Tuple[str, List[str], Any]], groups: Dict, stores: List,
+                   results: List[Tuple[str, List[Any]]]) -> Dict[str, Any]:
+        """Summarize a batch, counting only emails whose every STORE came back OK."""
+        failed = set()
+        for (email_ids, store), (result, data) in zip(stores, results):
+            if result != 'OK':
+                logger.warning("STORE %s %s failed for %d emails: %s", store[1], store[2], len(email_ids), data)
+                failed.update(email_ids)
+        organized = len(decisions) - len(failed)
+        logger.debug("Organized %d emails in %d groups with %d STORE commands", organized, len(groups), len(stores))
+        EMAIL_ACTIONS.inc(organized, action="organize")
+        return {'emails': organized, 'groups': len(groups), 'stores': len(stores), 'failed': sorted(failed, key=int)}
+
+    def _ensure_labels(self, mail: PooledIMAPSession, labels: Iterable[str]):
+        """CREATE the user labels that don't exist yet, using one cached LIST per account."""
+        labels = list(labels)
+        if self._labels_to_create(labels) is None:
+            self._remember_labels(mail.list())
+        for label in self._labels_to_create(labels):
+            result, data = mail.create(quote_astring(label))
+            self._created_label(label, result, data)
+
+    def _labels_to_create(self, labels: Iterable[str]) -> Optional[List[str]]:
+        """User labels missing from the account's cached LIST, or None if there is no LIST yet."""
+        wanted = [label for label in labels if not label.startswith('\\')]
+        if not wanted:
+            return []
+        known = _known_labels.get(self.email_address)
+        if known is None:
+            return None
+        return [label for label in wanted if label.lower() not in known]
+
+    def _remember_labels(self, response: Tuple[str, List[Any]]):
+        result, data = response
+        known = set()
+        if result == 'OK':
+            for line in data or []:
+                entry = parse_list_response(line) if line else None
+                if entry:
+                    known.add(entry['name'].lower())
+        _known_labels[self.email_address] = known
+
+    def _created_label(self, label: str, result: str, data: Any):
+        """Cache a label once CREATE succeeded or the server says it already exists."""
+        if result != 'OK' and 'ALREADYEXISTS' not in str(data).upper():
+            logger.warning("Could not create label %s: %s %s", label, result, data)
+            return
+        _known_labels[self.email_address].add(label.lower())
+
+
+def _label_atom(label: str) -> str:
+    """System labels (\\Important, \\Starred, ...) are sent bare, user labels quoted as needed."""
+    return label if label.startswith('\\') else quote_astring(label)
+
+
+# Label names seen in LIST, per account, so CREATE is only sent for new labels
+_known_labels: Dict[str, set] = {}
 
 class GmailDeleteSchema(BaseModel):
     """Schema for GmailDeleteTool input."""
     email_id: str = Field(..., description="Email ID to delete")
     reason: str = Field(..., description="Reason for deletion")
 
-class GmailDeleteTool(BaseTool):
+class GmailDeleteTool(GmailToolBase):
     """Tool to delete an email using IMAP."""
     name: str = "delete_email"
     description: str = "Deletes an email from Gmail"
+    args_schema: Type[BaseModel] = GmailDeleteSchema
+
+    # UIDs per FETCH/STORE command
+    delete_chunk_size: int = 500
     
+    @traced_tool
     def _run(self, email_id: str, reason: str) -> str:
         """
         Delete an email by ID.
@@ -529,117 +1077,163 @@ class GmailDeleteTool(BaseTool):
             if not reason or not isinstance(reason, str):
                 return f"Error: Invalid reason format: {reason}"
                 
-            mail = self._connect()
-            try:
-                mail.select("INBOX")
-                
-                # First verify the email exists and get its details for logging
-                result, data = mail.fetch(email_id, "(RFC822)")
-                if result != "OK" or not data or data[0] is None:
-                    return f"Error: Email with ID {email_id} not found"
-                    
-                msg = email.message_from_bytes(data[0][1])
-                subject = decode_header_safe(msg["Subject"])
-                sender = decode_header_safe(msg["From"])
-                
-                # Move to Trash
-                mail.store(email_id, '+X-GM-LABELS', '\\Trash')
-                mail.store(email_id, '-X-GM-LABELS', '\\Inbox')
-                
-                return f"Email deleted: '{subject}' from {sender}. Reason: {reason}"
-            except Exception as e:
-                return f"Error deleting email: {e}"
-            finally:
-                self._disconnect(mail)
+            deleted = self.delete_many([email_id], reason)
+            if not deleted:
+                return f"Error: Email with ID {email_id} not found or could not be moved to Trash"
+            return f"Email deleted: '{deleted[0]['subject']}' from {deleted[0]['sender']}. Reason: {reason}"
 
         except Exception as e:
             return f"Error deleting email: {str(e)}"
 
-class EmptyTrashTool(BaseTool):
+    def delete_many(self, email_ids: List[str], reason: str, mailbox: str = "INBOX") -> List[Dict[str, str]]:
+        """
+        Move many emails to Trash and return an audit record for each one that existed.
+
+        Only the Subject, From and Date headers are fetched for the audit log. The
+        move is a UID MOVE when the server supports it, otherwise one label
+        STORE pair per chunk of UIDs. Chunks the server refuses to move are
+        logged and left out of the result.
+        """
+        mail = self._connect()
+        deleted = []
+        try:
+            mail.select(mailbox)
+            trash = get_mailbox_resolver().resolve(mail, TRASH) if 'MOVE' in mail.capabilities else None
+            for chunk in chunked([str(email_id) for email_id in email_ids], self.delete_chunk_size):
+                found = [dict(summary, reason=reason) for summary in self.fetch_summaries(mail, chunk)]
+                if not found:
+                    continue
+
+                uid_set = compress_uid_set([record['email_id'] for record in found])
+                if trash:
+                    result, data = mail.uid('MOVE', uid_set, quote_astring(trash))
+                else:
+                    result, data = mail.uid('STORE', uid_set, '+X-GM-LABELS', '(\\Trash)')
+                    if result == 'OK':
+                        result, data = mail.uid('STORE', uid_set, '-X-GM-LABELS', '(\\Inbox)')
+                if result != 'OK':
+                    logger.error("Could not move %d emails to Trash: %s", len(found), data)
+                    continue
+                deleted.extend(found)
+
+            EMAIL_ACTIONS.inc(len(deleted), action="delete")
+            for record in deleted:
+                logger.info("Deleted email %s: '%s' from %s. Reason: %s", record['email_id'], record['subject'],
+                            record['sender'], reason)
+            return deleted
+        finally:
+            self._disconnect(mail)
+
+class GmailArchiveSchema(BaseModel):
+    """Schema for GmailArchiveTool input."""
+    email_id: str = Field(..., description="Email ID to archive")
+    reason: str = Field(..., description="Reason for archiving")
+
+class GmailArchiveTool(GmailToolBase):
+    """Tool to archive an email (remove it from the Inbox) using IMAP."""
+    name: str = "GmailArchiveTool"
+    description: str = "Archives an email: removes it from the Inbox but keeps it in All Mail"
+    args_schema: Type[BaseModel] = GmailArchiveSchema
+
+    # UIDs per FETCH/STORE command
+    archive_chunk_size: int = 500
+
+    @traced_tool
+    def _run(self, email_id: str, reason: str) -> str:
+        """Archive an email by ID."""
+        try:
+            archived = self.archive_many([email_id], reason)
+            if not archived:
+                return f"Error: Email with ID {email_id} not found or could not be archived"
+            return f"Email archived: '{archived[0]['subject']}' from {archived[0]['sender']}. Reason: {reason}"
+        except Exception as e:
+            return f"Error archiving email: {str(e)}"
+
+    def archive_many(self, email_ids: List[str], reason: str, mailbox: str = "INBOX") -> List[Dict[str, str]]:
+        """Remove many emails from the Inbox and return an audit record for each one that was archived."""
+        mail = self._connect()
+        archived = []
+        try:
+            mail.select(mailbox)
+            for chunk in chunked([str(email_id) for email_id in email_ids], self.archive_chunk_size):
+                found = [dict(summary, reason=reason) for summary in self.fetch_summaries(mail, chunk)]
+                if not found:
+                    continue
+                result, data = mail.uid('STORE', compress_uid_set([record['email_id'] for record in found]),
+                                        '-X-GM-LABELS', '(\\Inbox)')
+                if result != 'OK':
+                    logger.error("Could not archive %d emails: %s", len(found), data)
+                    continue
+                archived.extend(found)
+
+            EMAIL_ACTIONS.inc(len(archived), action="archive")
+            for record in archived:
+                logger.info("Archived email %s: '%s' from %s. Reason: %s", record['email_id'], record['subject'],
+                            record['sender'], reason)
+            return archived
+        finally:
+            self._disconnect(mail)
+
+class EmptyTrashTool(GmailToolBase):
     """Tool to empty Gmail trash."""
     name: str = "empty_gmail_trash"
     description: str = "Empties the Gmail trash folder to free up space"
 
-    def _connect(self):
-        """Connect to Gmail using IMAP."""
-        # Get email credentials from environment
-        email_address = os.environ.get('EMAIL_ADDRESS')
-        app_password = os.environ.get('APP_PASSWORD')
-        
-        if not email_address or not app_password:
-            raise ValueError("EMAIL_ADDRESS or APP_PASSWORD environment variables not set")
-        
-        # Connect to Gmail's IMAP server
-        mail = imaplib.IMAP4_SSL('imap.gmail.com')
-        print(f"Connecting to Gmail with email: {email_address[:3]}...{email_address[-10:]}")
-        mail.login(email_address, app_password)
-        return mail
-
-    def _disconnect(self, mail):
-        """Disconnect from Gmail."""
-        try:
-            mail.logout()
-        except:
-            pass
-    
+    # Above this many messages the \\Deleted flag is set in UID ranges instead of 1:*
+    trash_chunk_size: int = 5000
+
+    @traced_tool
     def _run(self) -> str:
         """Empty the Gmail trash folder."""
+        mail = None
         try:
             mail = self._connect()
             
-            # Try different trash folder names (Gmail can have different naming conventions)
-            trash_folders = [
-                '"[Gmail]/Trash"',
-                '[Gmail]/Trash',
-                'Trash',
-                '"[Google Mail]/Trash"',
-                '[Google Mail]/Trash'
-            ]
+            trash_folder = get_mailbox_resolver().select(mail, TRASH)
+            if trash_folder is None:
+                return "Could not empty trash. No trash folder found or accessible."
             
-            success = False
-            trash_folder_used = None
+            result, data = mail.uid('SEARCH', None, 'ALL')
+            if result != 'OK':
+                return f"Could not empty trash. Search failed: {data}"
             
-            for folder in trash_folders:
-                try:
-                    print(f"Attempting to select trash folder: {folder}")
-                    result, data = mail.select(folder)
-                    
-                    if result == 'OK':
-                        trash_folder_used = folder
-                        print(f"Successfully selected trash folder: {folder}")
-                        
-                        # Search for all messages in trash
-                        result, data = mail.search(None, 'ALL')
-                        
-                        if result == 'OK':
-                            email_ids = data[0].split()
-                            count = len(email_ids)
-                            
-                            if count == 0:
-                                print("No messages found in trash.")
-                                return "Trash is already empty. No messages to delete."
-                            
-                            print(f"Found {count} messages in trash.")
-                            
-                            # Delete all messages in trash
-                            for email_id in email_ids:
-                                mail.store(email_id, '+FLAGS', '\\Deleted')
-                            
-                            # Permanently remove messages marked for deletion
-                            mail.expunge()
-                            success = True
-                            break
-                        
-                except Exception as e:
-                    print(f"Error accessing trash folder {folder}: {e}")
-                    continue
+            uids = data[0].split() if data and data[0] else []
+            count = len(uids)
+            if count == 0:
+                logger.info("No messages found in trash.")
+                return "Trash is already empty. No messages to delete."
+            
+            logger.info("Found %d messages in trash.", count)
             
-            if success:
-                return f"Successfully emptied Gmail trash folder ({trash_folder_used}). Deleted {count} messages."
+            # Flag everything in as few commands as possible, then expunge once
+            flagged = 0
+            if count <= self.trash_chunk_size:
+                result, data = mail.uid('STORE', '1:*', '+FLAGS.SILENT', '(\\Deleted)')
+                if result == 'OK':
+                    flagged = count
+                else:
+                    logger.error("Could not flag the trash for deletion: %s", data)
             else:
-                return "Could not empty trash. No trash folder found or accessible."
+                for chunk in chunked(uids, self.trash_chunk_size):
+                    result, data = mail.uid('STORE', compress_uid_set(chunk), '+FLAGS.SILENT', '(\\Deleted)')
+                    if result == 'OK':
+                        flagged += len(chunk)
+                    else:
+                        logger.error("Could not flag %d trash messages for deletion: %s", len(chunk), data)
+            if not flagged:
+                return f"Could not empty trash. The server refused to flag any of the {count} messages."
+            
+            result, data = mail.expunge()
+            if result != 'OK':
+                return f"Could not empty trash. Expunge failed: {data}"
+            
+            if flagged < count:
+                return (f"Partially emptied Gmail trash folder ({trash_folder}). "
+                        f"Deleted {flagged} of {count} messages.")
+            return f"Successfully emptied Gmail trash folder ({trash_folder}). Deleted {count} messages."
 
         except Exception as e:
             return f"Error emptying trash: {str(e)}"
         finally:
-            self._disconnect(mail)
\ No newline at end of file
+            self._disconnect(mail)
+
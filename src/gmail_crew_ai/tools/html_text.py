@@ -0,0 +1,35 @@
+import html
+import re
+from typing import Optional
+
+# Elements whose content is never visible text
+_SKIPPED_BLOCKS = re.compile(
+    r"<(script|style|head|title|noscript|template|svg)\b[^>]*>.*?</\1\s*>|<!--.*?-->|<!\[CDATA\[.*?\]\]>",
+    re.IGNORECASE | re.DOTALL,
+)
+# Any remaining tag (including <img> tracking pixels, which carry no text)
+_TAG = re.compile(r"""<[a-zA-Z/!?](?:[^<>"']|"[^"]*"|'[^']*')*>""")
+# Something that still looks like markup after tag stripping means the fast path got confused
+_LEFTOVER_MARKUP = re.compile(r"<[a-zA-Z/!]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def collapse_whitespace(text: str) -> str:
+    """Replace every run of whitespace with a single space."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def fast_html_to_text(markup: str) -> Optional[str]:
+    """
+    Convert HTML to plain text with a few compiled regexes.
+
+    Skips <style>, <script>, <head> and comments, drops all tags (so tracking
+    pixels and other images vanish), unescapes entities and collapses
+    whitespace. Returns None when the markup is too broken to trust the
+    result, so the caller can fall back to a real parser.
+    """
+    text = _SKIPPED_BLOCKS.sub(" ", markup)
+    text = _TAG.sub(" ", text)
+    if _LEFTOVER_MARKUP.search(text):
+        return None
+    return collapse_whitespace(html.unescape(text))
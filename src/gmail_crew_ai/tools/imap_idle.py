@@ -0,0 +1,151 @@
+import imaplib
+import logging
+import re
+import select
+import time
+from typing import Optional
+
+from gmail_crew_ai.tools.imap_pool import GMAIL_IMAP_HOST, PooledIMAPSession
+
+logger = logging.getLogger(__name__)
+
+_UNTAGGED_COUNT = re.compile(rb"^\* (\d+) (EXISTS|EXPUNGE)", re.IGNORECASE)
+
+
+class IdleWatcher:
+    """
+    Hold an IMAP IDLE session on a mailbox and report new mail in micro-batches.
+
+    `wait_for_batch()` blocks until at least one message arrives, then keeps
+    collecting EXISTS notifications until `max_wait` seconds have passed since
+    the first one or `max_batch` new messages have arrived. IDLE is renewed
+    every `renew_interval` seconds because servers drop idle sessions.
+
+    The watcher owns a dedicated session rather than borrowing one from the
+    shared pool, since it sits in IDLE for most of its life. It always uses
+    imaplib, as it reads the session's socket directly.
+    """
+
+    def __init__(self, email_address: str, app_password: str, mailbox: str = "INBOX",
+                 max_wait: float = 10.0, max_batch: int = 20, renew_interval: float = 540.0):
+        self.mailbox = mailbox
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.renew_interval = renew_interval
+        self.session = PooledIMAPSession(GMAIL_IMAP_HOST, email_address, app_password, backend="imaplib")
+        result, data = self.session.select(mailbox, readonly=True)
+        if result != "OK":
+            raise imaplib.IMAP4.error(f"Could not select {mailbox}: {data}")
+        self.exists = int(data[0]) if data and data[0] else 0
+        self._buffer = b""
+        self._tag: Optional[bytes] = None
+
+    def wait_for_batch(self) -> int:
+        """Block until new mail arrives and return how many messages the batch holds."""
+        new_messages = 0
+        first_seen = None
+        self._start_idle()
+        idle_started = time.monotonic()
+        try:
+            while new_messages < self.max_batch:
+                now = time.monotonic()
+                if first_seen is not None:
+                    timeout = first_seen + self.max_wait - now
+                else:
+                    timeout = idle_started + self.renew_interval - now
+
+                line = self._readline(max(timeout, 0))
+                if line is None:
+                    if first_seen is not None:
+                        break
+                    # Nothing arrived for a while; restart IDLE before the server gives up on us
+                    arrived = self._stop_idle()
+                    self._start_idle()
+                    idle_started = time.monotonic()
+                else:
+                    arrived = self._handle_untagged(line)
+                if arrived:
+                    new_messages += arrived
+                    if first_seen is None:
+                        first_seen = time.monotonic()
+        finally:
+            new_messages += self._stop_idle()
+        logger.debug("IDLE batch closed with %d new message(s)", new_messages)
+        return new_messages
+
+    def close(self):
+        self.session.logout()
+
+    def _start_idle(self):
+        self._tag = self.session.mail._new_tag()
+        self.session.mail.send(self._tag + b" IDLE\r\n")
+        while True:
+            line = self._readline(30)
+            if line is None:
+                raise imaplib.IMAP4.abort("No response to IDLE")
+            if line.startswith(b"+"):
+                return
+            if line.startswith(self._tag):
+                raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+            self._handle_untagged(line)
+
+    def _stop_idle(self) -> int:
+        """End IDLE and return any new messages reported while it wound down."""
+        if self._tag is None:
+            return 0
+        arrived = 0
+        try:
+            self.session.mail.send(b"DONE\r\n")
+            while True:
+                line = self._readline(30)
+                if line is None:
+                    raise imaplib.IMAP4.abort("No response to DONE")
+                if line.startswith(self._tag):
+                    break
+                arrived += self._handle_untagged(line)
+        finally:
+            self._tag = None
+        self.session.last_used = time.monotonic()
+        return arrived
+
+    def _handle_untagged(self, line: bytes) -> int:
+        """Track EXISTS/EXPUNGE counts. Returns the number of newly arrived messages."""
+        if line.upper().startswith(b"* BYE"):
+            self.session.broken = True
+            raise imaplib.IMAP4.abort(line.decode("utf-8", errors="replace"))
+        match = _UNTAGGED_COUNT.match(line)
+        if not match:
+            return 0
+        count = int(match.group(1))
+        if match.group(2).upper() == b"EXPUNGE":
+            self.exists = max(self.exists - 1, 0)
+            return 0
+        arrived = max(count - self.exists, 0)
+        self.exists = count
+        return arrived
+
+    def _readline(self, timeout: float) -> Optional[bytes]:
+        """
+        Read one CRLF-terminated line straight from the socket, or None on timeout.
+
+        imaplib's buffered reader can't be polled with a timeout, so IDLE
+        traffic is read here instead.
+        """
+        deadline = time.monotonic() + timeout
+        sock = self.session.mail.sock
+        while b"\r\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            pending = sock.pending() if hasattr(sock, "pending") else 0
+            if not pending:
+                if remaining <= 0:
+                    return None
+                ready, _, _ = select.select([sock], [], [], remaining)
+                if not ready:
+                    return None
+            chunk = sock.recv(4096)
+            if not chunk:
+                self.session.broken = True
+                raise imaplib.IMAP4.abort("Connection closed during IDLE")
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b"\r\n")
+        return line
@@ -0,0 +1,240 @@
+import imaplib
+import logging
+import os
+import socket
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from gmail_crew_ai.metrics import IMAP_CONNECTIONS
+from gmail_crew_ai.tools.aio_imap import GMAIL_IMAP_HOST, BlockingIMAPClient
+from gmail_crew_ai.tracing import instrument_imap, span
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the underlying socket/session can no longer be trusted.
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, ssl.SSLError, socket.error, EOFError)
+
+
+class PooledIMAPSession:
+    """
+    An authenticated IMAP session owned by the pool.
+
+    Behaves like the wrapped `imaplib.IMAP4_SSL` object, but remembers the
+    currently selected mailbox so repeated `select()` calls are free, and
+    flags itself as broken when the connection drops mid-command.
+
+    With `backend="asyncio"` (or IMAP_BACKEND=asyncio) the wrapped object is
+    a BlockingIMAPClient instead, whose socket is served by the shared
+    asyncio loop rather than by the thread holding the session.
+    """
+
+    def __init__(self, host: str, email_address: str, app_password: str, backend: Optional[str] = None):
+        self.host = host
+        self.email_address = email_address
+        self._app_password = app_password
+        self.backend = backend or os.environ.get("IMAP_BACKEND", "imaplib")
+        self.mail: Optional[imaplib.IMAP4_SSL] = None
+        self.selected: Optional[Tuple[str, bool]] = None
+        self.select_response: Optional[Tuple[str, List]] = None
+        self.uidvalidity: Optional[str] = None
+        self.broken = False
+        self.last_used = 0.0
+        self.connect()
+
+    def connect(self):
+        """Open the TLS connection and log in."""
+        logger.info("Connecting to Gmail with email: %s...%s", self.email_address[:3], self.email_address[-8:])
+        with span("imap.connect", host=self.host, backend=self.backend):
+            if self.backend == "asyncio":
+                self.mail = BlockingIMAPClient(self.host)
+            else:
+                self.mail = instrument_imap(imaplib.IMAP4_SSL(self.host))
+            self.mail.login(self.email_address, self._app_password)
+        self.selected = None
+        self.select_response = None
+        self.broken = False
+        self.last_used = time.monotonic()
+        logger.info("Successfully logged in to Gmail")
+
+    def reconnect(self):
+        """Drop the current connection and log in again."""
+        self.logout()
+        self.connect()
+
+    def noop(self) -> bool:
+        """Send a keep-alive NOOP. Returns False if the session is dead."""
+        try:
+            result, _ = self.mail.noop()
+            self.last_used = time.monotonic()
+            return result == "OK"
+        except CONNECTION_ERRORS + (imaplib.IMAP4.error,):
+            self.broken = True
+            return False
+
+    def select(self, mailbox: str = "INBOX", readonly: bool = False):
+        """Select a mailbox, skipping the round trip if it is already selected."""
+        key = (mailbox, readonly)
+        if self.selected == key and self.select_response is not None:
+            return self.select_response
+        response = self._call("select", mailbox, readonly)
+        if response[0] == "OK":
+            self.selected = key
+            self.select_response = response
+            _, data = self.mail.response("UIDVALIDITY")
+            self.uidvalidity = data[0].decode() if data and data[0] else None
+        else:
+            self.selected = None
+            self.select_response = None
+            self.uidvalidity = None
+        return response
+
+    def close(self):
+        """Close the selected mailbox (expunging as IMAP CLOSE does)."""
+        self.selected = None
+        self.select_response = None
+        return self._call("close")
+
+    def logout(self):
+        """Log out and forget the connection."""
+        self.selected = None
+        self.select_response = None
+        try:
+            if self.mail is not None:
+                self.mail.logout()
+        except Exception:
+            pass
+        self.mail = None
+
+    def _call(self, name: str, *args, **kwargs):
+        try:
+            result = getattr(self.mail, name)(*args, **kwargs)
+            self.last_used = time.monotonic()
+            return result
+        except CONNECTION_ERRORS:
+            self.broken = True
+            raise
+
+    def __getattr__(self, name):
+        attr = getattr(self.mail, name)
+        if not callable(attr):
+            return attr
+
+        def wrapper(*args, **kwargs):
+            return self._call(name, *args, **kwargs)
+
+        return wrapper
+
+
+class IMAPConnectionPool:
+    """
+    Process-wide, thread-safe pool of authenticated IMAP sessions keyed by
+    (host, account).
+
+    Idle sessions are health-checked with a NOOP before being handed out
+    again once they have been idle longer than `keepalive_interval`, and
+    transparently reconnected if the server has dropped them.
+    """
+
+    def __init__(self, max_connections: int = 4, keepalive_interval: float = 60.0,
+                 max_idle: float = 600.0):
+        self.max_connections = max_connections
+        self.keepalive_interval = keepalive_interval
+        self.max_idle = max_idle
+        self._lock = threading.Condition()
+        self._idle: Dict[Tuple[str, str], List[PooledIMAPSession]] = {}
+        self._in_use: Dict[Tuple[str, str], int] = {}
+        self.stats = {"connects": 0, "reuses": 0, "reconnects": 0}
+
+    def acquire(self, email_address: str, app_password: str,
+                host: str = GMAIL_IMAP_HOST, timeout: Optional[float] = None) -> PooledIMAPSession:
+        """Borrow a live session for the account, creating one if needed."""
+        key = (host, email_address)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    session = idle.pop()
+                    break
+                if self._in_use.get(key, 0) < self.max_connections:
+                    session = None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No IMAP session available for {email_address}")
+                self._lock.wait(remaining)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+        try:
+            if session is None:
+                session = PooledIMAPSession(host, email_address, app_password)
+                self.stats["connects"] += 1
+                IMAP_CONNECTIONS.inc(event="connect")
+            else:
+                session = self._revive(session)
+        except Exception:
+            with self._lock:
+                self._in_use[key] -= 1
+                self._lock.notify()
+            raise
+        return session
+
+    def release(self, session: PooledIMAPSession):
+        """Return a session to the pool, discarding it if it is broken."""
+        key = (session.host, session.email_address)
+        if session.broken or session.mail is None:
+            session.logout()
+        with self._lock:
+            self._in_use[key] = max(self._in_use.get(key, 1) - 1, 0)
+            if not session.broken and session.mail is not None:
+                self._idle.setdefault(key, []).append(session)
+            self._lock.notify()
+
+    @contextmanager
+    def session(self, email_address: str, app_password: str, host: str = GMAIL_IMAP_HOST):
+        """Context manager form of acquire()/release()."""
+        session = self.acquire(email_address, app_password, host)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def close_all(self):
+        """Log out every idle session."""
+        with self._lock:
+            sessions = [s for idle in self._idle.values() for s in idle]
+            self._idle.clear()
+        for session in sessions:
+            session.logout()
+
+    def _revive(self, session: PooledIMAPSession) -> PooledIMAPSession:
+        idle_for = time.monotonic() - session.last_used
+        if idle_for > self.max_idle or (idle_for > self.keepalive_interval and not session.noop()):
+            logger.info("IMAP session went stale, reconnecting...")
+            session.reconnect()
+            self.stats["reconnects"] += 1
+            IMAP_CONNECTIONS.inc(event="reconnect")
+        else:
+            self.stats["reuses"] += 1
+            IMAP_CONNECTIONS.inc(event="reuse")
+        return session
+
+
+_pool: Optional[IMAPConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_imap_pool() -> IMAPConnectionPool:
+    """Return the process-wide IMAP connection pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = IMAPConnectionPool(
+                    max_connections=int(os.environ.get("IMAP_POOL_SIZE", "4")),
+                    keepalive_interval=float(os.environ.get("IMAP_KEEPALIVE_SECONDS", "60")),
+                )
+    return _pool
@@ -0,0 +1,262 @@
+import base64
+import binascii
+import quopri
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+_FETCH_START = re.compile(rb"^(\d+) \(")
+_LITERAL_KEY = re.compile(rb"(BODY\[[^\]]*\](?:<\d+>)?|[A-Z0-9.\-]+)\s*\{\d+\}$")
+_UID = re.compile(rb"\bUID (\d+)")
+
+
+def _as_int(value: Union[str, bytes, int]) -> int:
+    if isinstance(value, bytes):
+        value = value.decode()
+    return int(value)
+
+
+def compress_uid_set(uids: Iterable[Union[str, bytes, int]]) -> str:
+    """
+    Compress UIDs into an IMAP sequence set, e.g. [1, 2, 3, 7, 9, 10] -> "1:3,7,9:10".
+    """
+    ordered = sorted({_as_int(uid) for uid in uids})
+    if not ordered:
+        return ""
+
+    ranges = []
+    start = prev = ordered[0]
+    for uid in ordered[1:]:
+        if uid == prev + 1:
+            prev = uid
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = uid
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(ranges)
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    """Yield successive slices of at most `size` items."""
+    size = max(1, int(size))
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class FetchItem:
+    """One message from a FETCH response: its metadata text and its literals."""
+
+    def __init__(self, seq: str):
+        self.seq = seq
+        self.meta = b""
+        self.literals: Dict[str, bytes] = {}
+
+    @property
+    def uid(self) -> Optional[str]:
+        match = _UID.search(self.meta)
+        return match.group(1).decode() if match else None
+
+    def atom(self, name: str) -> Optional[str]:
+        """Return a simple atom such as RFC822.SIZE or X-GM-THRID."""
+        match = re.search(rb"\b" + re.escape(name.encode()) + rb" (\S+?)[ )]", self.meta + b")")
+        return match.group(1).decode() if match else None
+
+    def parenthesized(self, name: str) -> Optional[str]:
+        """Return a balanced parenthesized value such as FLAGS or BODYSTRUCTURE."""
+        key = name.encode() + b" ("
+        start = self.meta.find(key)
+        if start < 0:
+            return None
+        pos = start + len(key) - 1
+        depth = 0
+        in_quote = False
+        for end in range(pos, len(self.meta)):
+            char = self.meta[end:end + 1]
+            if char == b'"' and self.meta[end - 1:end] != b"\\":
+                in_quote = not in_quote
+            elif not in_quote and char == b"(":
+                depth += 1
+            elif not in_quote and char == b")":
+                depth -= 1
+                if depth == 0:
+                    return self.meta[pos:end + 1].decode("utf-8", errors="replace")
+        return None
+
+    def literal(self, prefix: str) -> Optional[bytes]:
+        """Return the first literal whose item name starts with `prefix`."""
+        for key, value in self.literals.items():
+            if key.startswith(prefix):
+                return value
+        return None
+
+
+def parse_fetch_response(data: List[Any]) -> Iterator[FetchItem]:
+    """
+    Parse the raw data list imaplib returns for a FETCH/UID FETCH command.
+
+    Yields one FetchItem per message, with literals keyed by their item name
+    (e.g. "RFC822", "BODY[HEADER.FIELDS (SUBJECT FROM)]", "BODY[1]<0>").
+    """
+    current: Optional[FetchItem] = None
+    for part in data or []:
+        if part is None:
+            continue
+        prefix = part[0] if isinstance(part, tuple) else part
+        start = _FETCH_START.match(prefix)
+        if start:
+            if current is not None:
+                yield current
+            current = FetchItem(start.group(1).decode())
+        if current is None:
+            continue
+
+        if isinstance(part, tuple):
+            key_match = _LITERAL_KEY.search(prefix)
+            key = key_match.group(1).decode() if key_match else "RFC822"
+            current.meta += _LITERAL_KEY.sub(b"", prefix) + b" "
+            current.literals[key] = part[1]
+        else:
+            current.meta += part + b" "
+    if current is not None:
+        yield current
+
+
+def parse_status_response(line: Union[str, bytes]) -> Dict[str, str]:
+    """Parse a STATUS response line, e.g. b'"INBOX" (UIDNEXT 12 UIDVALIDITY 3)' -> {"UIDNEXT": "12", ...}."""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    inner = line[line.rfind("(") + 1:line.rfind(")")] if "(" in line else ""
+    tokens = inner.split()
+    return {tokens[i].upper(): tokens[i + 1] for i in range(0, len(tokens) - 1, 2)}
+
+
+_LIST_LINE = re.compile(r'^\((?P<flags>[^)]*)\)\s+(?P<delimiter>"(?:[^"\\]|\\.)*"|NIL)\s+(?P<name>.+)$', re.IGNORECASE)
+
+
+def parse_list_response(line: Union[str, bytes]) -> Optional[Dict[str, Any]]:
+    """
+    Parse a LIST response line, e.g. b'(\\HasNoChildren \\Trash) "/" "[Gmail]/Trash"'
+    -> {"flags": ["\\HasNoChildren", "\\Trash"], "delimiter": "/", "name": "[Gmail]/Trash"}.
+    """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    match = _LIST_LINE.match(line.strip())
+    if not match:
+        return None
+    name = match.group("name").strip()
+    if name.startswith('"') and name.endswith('"'):
+        name = re.sub(r'\\(.)', r'\1', name[1:-1])
+    delimiter = match.group("delimiter")
+    return {
+        "flags": match.group("flags").split(),
+        "delimiter": None if delimiter.upper() == "NIL" else delimiter[1:-1],
+        "name": name,
+    }
+
+
+def quote_astring(value: str) -> str:
+    """Quote a mailbox or label name for use in an IMAP command if it needs it."""
+    if value and re.fullmatch(r'[^\s()"{%*\\\]]+', value):
+        return value
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+_SEXP_TOKEN = re.compile(r'\s*(\(|\)|"(?:[^"\\]|\\.)*"|\{\d+\}|[^\s()"]+)')
+
+
+def parse_sexp(text: str) -> List[Any]:
+    """
+    Parse an IMAP parenthesized list (e.g. a BODYSTRUCTURE) into nested lists.
+
+    Quoted strings are unquoted, NIL becomes None and everything else stays a string.
+    """
+    stack: List[List[Any]] = [[]]
+    pos = 0
+    while pos < len(text):
+        match = _SEXP_TOKEN.match(text, pos)
+        if not match:
+            break
+        pos = match.end()
+        token = match.group(1)
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            if len(stack) > 1:
+                done = stack.pop()
+                stack[-1].append(done)
+        elif token.startswith('"'):
+            stack[-1].append(re.sub(r'\\(.)', r'\1', token[1:-1]))
+        elif token.upper() == "NIL":
+            stack[-1].append(None)
+        elif not token.startswith("{"):
+            stack[-1].append(token)
+    return stack[0][0] if stack[0] and isinstance(stack[0][0], list) else stack[0]
+
+
+def _param_dict(params: Any) -> Dict[str, str]:
+    if not isinstance(params, list):
+        return {}
+    return {str(params[i]).lower(): params[i + 1] for i in range(0, len(params) - 1, 2)}
+
+
+def find_text_parts(bodystructure: Union[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Locate the inline text/plain and text/html sections of a BODYSTRUCTURE.
+
+    Returns dicts with the IMAP part number, subtype, transfer encoding, charset,
+    declared size and whether the part is the whole (single-part) message.
+    Attachments and encapsulated messages are skipped.
+    """
+    if isinstance(bodystructure, str):
+        bodystructure = parse_sexp(bodystructure)
+
+    parts: List[Dict[str, Any]] = []
+
+    def walk(node: List[Any], number: str):
+        if not node:
+            return
+        if isinstance(node[0], list):
+            index = 1
+            for child in node:
+                if not isinstance(child, list):
+                    break
+                walk(child, f"{number}.{index}" if number else str(index))
+                index += 1
+            return
+
+        main_type = str(node[0]).lower()
+        sub_type = str(node[1]).lower() if len(node) > 1 else ""
+        if main_type != "text" or sub_type not in ("plain", "html"):
+            return
+        disposition = node[9] if len(node) > 9 else None
+        if isinstance(disposition, list) and disposition and str(disposition[0]).lower() == "attachment":
+            return
+        parts.append({
+            "part": number or "1",
+            "subtype": sub_type,
+            "encoding": str(node[5] or "7bit").lower() if len(node) > 5 else "7bit",
+            "charset": _param_dict(node[2] if len(node) > 2 else None).get("charset") or "utf-8",
+            "size": int(node[6]) if len(node) > 6 and str(node[6]).isdigit() else 0,
+            "whole": not number,
+        })
+
+    walk(bodystructure, "")
+    return parts
+
+
+def decode_part_payload(payload: bytes, encoding: str, charset: str) -> str:
+    """Undo the transfer encoding of a (possibly truncated) body section and decode its charset."""
+    encoding = (encoding or "").lower()
+    if encoding == "base64":
+        compact = re.sub(rb"\s+", b"", payload)
+        compact = compact[:len(compact) - len(compact) % 4]
+        try:
+            payload = base64.b64decode(compact)
+        except (binascii.Error, ValueError):
+            pass
+    elif encoding == "quoted-printable":
+        payload = quopri.decodestring(payload)
+
+    try:
+        return payload.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
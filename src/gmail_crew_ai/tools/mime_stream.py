@@ -0,0 +1,140 @@
+from email.message import Message
+from email.parser import BytesFeedParser
+from typing import Iterable, List, Optional, Union
+
+from gmail_crew_ai.tools.imap_utils import decode_part_payload
+
+# Character budget for the extracted body of one message
+DEFAULT_MAX_BODY_CHARS = 65536
+
+# Raw bytes kept per text part for every character of budget: covers base64
+# and quoted-printable overhead on top of multi-byte charsets
+_RAW_BYTES_PER_CHAR = 4
+
+
+class StreamedMessage:
+    """Result of a streaming extraction: header-only message plus its text bodies."""
+
+    def __init__(self, headers: Message, plain: str, html: str, truncated: bool):
+        self.headers = headers
+        self.multipart = headers.get_content_maintype() == "multipart"
+        self.plain = plain
+        self.html = html
+        self.truncated = truncated
+
+
+class _Part:
+    def __init__(self, headers: Message):
+        self.headers = headers
+        content_type = headers.get_content_type()
+        disposition = str(headers.get("Content-Disposition", "")).lower()
+        self.multipart = headers.get_content_maintype() == "multipart"
+        self.boundary = headers.get_boundary() if self.multipart else None
+        self.subtype = content_type.split("/", 1)[1] if content_type in ("text/plain", "text/html") else None
+        if "attachment" in disposition:
+            self.subtype = None
+        self.encoding = str(headers.get("Content-Transfer-Encoding", "")).strip().lower()
+        self.charset = headers.get_content_charset() or "utf-8"
+        self.lines: List[bytes] = []
+        self.size = 0
+
+
+def _iter_lines(raw: Union[bytes, Iterable[bytes]]) -> Iterable[bytes]:
+    """Yield lines (with their line endings) from bytes or an iterable of byte chunks."""
+    chunks = [raw] if isinstance(raw, (bytes, bytearray, memoryview)) else raw
+    pending = b""
+    for chunk in chunks:
+        data = pending + bytes(chunk)
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                break
+            yield data[start:end + 1]
+            start = end + 1
+        pending = data[start:]
+    if pending:
+        yield pending
+
+
+def extract_text_streaming(raw: Union[bytes, Iterable[bytes]],
+                           max_chars: int = DEFAULT_MAX_BODY_CHARS) -> StreamedMessage:
+    """
+    Walk a raw RFC822 message line by line and decode only its text parts.
+
+    Part headers go through BytesFeedParser; part bodies are never handed to
+    the email package. Attachment and other non-text lines are skipped as they
+    stream past, text/plain and text/html lines are kept up to the character
+    budget, and the walk stops early once a plain-text body fills the budget.
+    """
+    raw_limit = max_chars * _RAW_BYTES_PER_CHAR
+    top_headers: Optional[Message] = None
+    boundaries: List[bytes] = []
+    plain: List[str] = []
+    html: List[str] = []
+    plain_chars = html_chars = 0
+    truncated = False
+
+    parser: Optional[BytesFeedParser] = BytesFeedParser()
+    part: Optional[_Part] = None
+
+    def finish(current: Optional[_Part]):
+        nonlocal plain_chars, html_chars
+        if current is None or current.subtype is None or not current.lines:
+            return
+        # The line break before a boundary belongs to the boundary, not the part
+        current.lines[-1] = current.lines[-1].rstrip(b"\r\n")
+        text = decode_part_payload(b"".join(current.lines), current.encoding, current.charset)
+        if current.subtype == "plain" and plain_chars < max_chars:
+            plain.append(text[:max_chars - plain_chars])
+            plain_chars += len(plain[-1])
+        elif current.subtype == "html" and html_chars < max_chars:
+            html.append(text[:max_chars - html_chars])
+            html_chars += len(html[-1])
+
+    for line in _iter_lines(raw):
+        if parser is not None:
+            # Header block of the message or of a part
+            parser.feed(line)
+            if line.strip():
+                continue
+            part = _Part(parser.close())
+            parser = None
+            if top_headers is None:
+                top_headers = part.headers
+            if part.multipart and part.boundary:
+                boundaries.append(b"--" + part.boundary.encode("utf-8", errors="replace"))
+                part.subtype = None
+            continue
+
+        if boundaries and line.startswith(b"--"):
+            stripped = line.rstrip()
+            matched = next((b for b in reversed(boundaries) if stripped.startswith(b)), None)
+            if matched is not None:
+                finish(part)
+                part = None
+                if stripped == matched + b"--":
+                    # End of this multipart; drop it and anything nested inside
+                    del boundaries[boundaries.index(matched):]
+                elif stripped == matched:
+                    del boundaries[boundaries.index(matched) + 1:]
+                    parser = BytesFeedParser()
+                if plain_chars >= max_chars:
+                    truncated = True
+                    break
+                continue
+
+        if part is not None and part.subtype is not None:
+            if part.size < raw_limit:
+                part.lines.append(line)
+                part.size += len(line)
+            else:
+                truncated = True
+
+    if parser is not None and top_headers is None:
+        top_headers = parser.close()
+    finish(part)
+
+    return StreamedMessage(top_headers if top_headers is not None else Message(),
+                           "".join(plain), "".join(html), truncated)
+
@@ -0,0 +1,101 @@
+import queue
+import threading
+import time
+from typing import Generic, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class Prefetcher(Generic[T]):
+    """
+    Iterate `source` on a background thread, at most `maxsize` items ahead of the consumer.
+
+    The bounded queue is the backpressure: once it is full the producer
+    blocks until the consumer takes an item, so memory is capped by the
+    queue depth no matter how long the source is. Exceptions raised by the
+    source are re-raised in the consumer. Closing the prefetcher early (or
+    leaving its `with` block) stops the producer and closes the source, so
+    a generator's `finally` (e.g. returning an IMAP session) still runs.
+
+    `producer_blocked` and `consumer_waited` add up the seconds each side
+    spent waiting on the other, showing which stage is the bottleneck.
+    """
+
+    def __init__(self, source: Iterable[T], maxsize: int = 8, name: str = "prefetch"):
+        self.maxsize = max(1, maxsize)
+        self.produced = 0
+        self.producer_blocked = 0.0
+        self.consumer_waited = 0.0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.maxsize)
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._finished = False
+        self._thread = threading.Thread(target=self._produce, args=(source,), name=name, daemon=True)
+        self._thread.start()
+
+    def _produce(self, source: Iterable[T]):
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                if not self._put(item):
+                    break
+                self.produced += 1
+        except BaseException as e:
+            self._error = e
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            self._put(_DONE)
+
+    def _put(self, item) -> bool:
+        started = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            self.producer_blocked += time.perf_counter() - started
+            return True
+        return False
+
+    def __iter__(self) -> Iterator[T]:
+        return self
+
+    def __next__(self) -> T:
+        if self._finished:
+            raise StopIteration
+        started = time.perf_counter()
+        item = self._queue.get()
+        self.consumer_waited += time.perf_counter() - started
+        if item is _DONE:
+            self._finished = True
+            self._thread.join()
+            if self._error is not None:
+                raise self._error
+            raise StopIteration
+        return item
+
+    def close(self, timeout: float = 30.0):
+        """Stop the producer, drop whatever it had queued and wait for it to finish."""
+        self._finished = True
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        while self._thread.is_alive() and time.monotonic() < deadline:
+            # Make room in case the producer is blocked on a full queue
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self._thread.join(0.05)
+
+    def __enter__(self) -> "Prefetcher[T]":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
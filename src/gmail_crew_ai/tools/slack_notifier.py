@@ -0,0 +1,201 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from gmail_crew_ai.metrics import SLACK_NOTIFICATIONS, SLACK_RETRIES
+from gmail_crew_ai.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Slack rejects messages with more than 50 blocks
+MAX_BLOCKS_PER_MESSAGE = 50
+# Incoming webhooks allow roughly one message per second
+MIN_SEND_INTERVAL = 1.0
+# Status codes worth retrying besides 429
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+
+class SlackNotifier:
+    """
+    Background sender for Slack webhook notifications.
+
+    `notify()` only queues the blocks of one notification and returns. A
+    daemon thread waits `digest_window` seconds for more notifications to
+    arrive, coalesces them into one digest message (one set of sections per
+    email, up to Slack's block limit) and posts it over a pooled
+    `requests.Session`, at most one message per `min_interval`. Rate limits
+    (429) are honoured through Retry-After; server and connection errors are
+    retried with exponential backoff and jitter, up to `max_attempts`.
+    """
+
+    def __init__(self, webhook_url: str, digest_window: float = 2.0, timeout: float = 10.0,
+                 max_attempts: int = 5, backoff: float = 1.0, max_backoff: float = 30.0,
+                 min_interval: float = MIN_SEND_INTERVAL):
+        self.webhook_url = webhook_url
+        self.digest_window = digest_window
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.min_interval = min_interval
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.headers["Content-Type"] = "application/json"
+        self.stats = {"queued": 0, "messages": 0, "delivered": 0, "failed": 0, "retries": 0, "rate_limited": 0}
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._last_send = 0.0
+
+    def notify(self, blocks: List[Dict[str, Any]]):
+        """Queue one notification (a header block followed by its sections)."""
+        with self._lock:
+            self.stats["queued"] += 1
+            SLACK_NOTIFICATIONS.inc(result="queued")
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._work, name="slack-notifier", daemon=True)
+                self._worker.start()
+        self._queue.put(blocks)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued notification has been sent or given up on."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _work(self):
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.monotonic() + self.digest_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                for group in self._pack(pending):
+                    self._send(group)
+            except Exception as e:
+                logger.exception("Slack notifier failed: %s", e)
+            finally:
+                for _ in pending:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _pack(pending: List[List[Dict[str, Any]]]) -> List[List[List[Dict[str, Any]]]]:
+        """Split queued notifications into groups that fit one message each."""
+        groups, current, used = [], [], 1
+        for blocks in pending:
+            if current and used + len(blocks) > MAX_BLOCKS_PER_MESSAGE:
+                groups.append(current)
+                current, used = [], 1
+            current.append(blocks)
+            used += len(blocks)
+        if current:
+            groups.append(current)
+        return groups
+
+    @staticmethod
+    def digest_payload(group: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """One notification is sent as is; several share a digest header."""
+        if len(group) == 1:
+            return {"blocks": group[0]}
+        blocks = [{
+            "type": "header",
+            "text": {"type": "plain_text", "text": f"{len(group)} Important Emails"},
+        }]
+        for notification in group:
+            for block in notification:
+                if block.get("type") == "header":
+                    # Per-email headers become bold sections under the digest header
+                    block = {"type": "section", "text": {"type": "mrkdwn", "text": f"*{block['text']['text']}*"}}
+                blocks.append(block)
+        return {"blocks": blocks[:MAX_BLOCKS_PER_MESSAGE]}
+
+    def _send(self, group: List[List[Dict[str, Any]]]):
+        body = json.dumps(self.digest_payload(group))
+        self.stats["messages"] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            wait = self._last_send + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_send = time.monotonic()
+
+            try:
+                with span("slack.post", emails=len(group), attempt=attempt):
+                    response = self.session.post(self.webhook_url, data=body, timeout=self.timeout)
+            except requests.RequestException as e:
+                error, delay, reason = str(e), self._backoff(attempt), "connection_error"
+            else:
+                if response.status_code < 300:
+                    self.stats["delivered"] += len(group)
+                    SLACK_NOTIFICATIONS.inc(len(group), result="delivered")
+                    return
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code == 429:
+                    self.stats["rate_limited"] += 1
+                    delay, reason = self._retry_after(response, attempt), "rate_limited"
+                elif response.status_code in RETRYABLE_STATUS:
+                    delay, reason = self._backoff(attempt), "server_error"
+                else:
+                    break
+
+            if attempt < self.max_attempts:
+                self.stats["retries"] += 1
+                SLACK_RETRIES.inc(reason=reason)
+                time.sleep(delay)
+
+        self.stats["failed"] += len(group)
+        SLACK_NOTIFICATIONS.inc(len(group), result="failed")
+        logger.error("Could not send Slack notification for %d emails: %s", len(group), error)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _retry_after(self, response: requests.Response, attempt: int) -> float:
+        try:
+            return min(float(response.headers["Retry-After"]), self.max_backoff) + random.uniform(0, 0.5)
+        except (KeyError, ValueError):
+            return self._backoff(attempt)
+
+
+_notifiers: Dict[str, SlackNotifier] = {}
+_notifiers_lock = threading.Lock()
+
+
+def get_slack_notifier(webhook_url: str) -> SlackNotifier:
+    """Return the process-wide notifier for a webhook, flushed at interpreter exit."""
+    with _notifiers_lock:
+        notifier = _notifiers.get(webhook_url)
+        if notifier is None:
+            notifier = SlackNotifier(
+                webhook_url,
+                digest_window=float(os.environ.get("SLACK_DIGEST_WINDOW_SECONDS", "2")),
+            )
+            _notifiers[webhook_url] = notifier
+            atexit.register(notifier.flush, float(os.environ.get("SLACK_FLUSH_TIMEOUT_SECONDS", "60")))
+        return notifier
+
+
+def flush_slack_notifiers(timeout: Optional[float] = None) -> bool:
+    """Wait for every notifier in this process to drain its queue."""
+    with _notifiers_lock:
+        notifiers = list(_notifiers.values())
+    return all(notifier.flush(timeout) for notifier in notifiers)
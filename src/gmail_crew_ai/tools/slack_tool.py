@@ -1,10 +1,11 @@
 import os
-import json
-import requests
 from typing import List, Dict, Optional, Type
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
 
+from gmail_crew_ai.tools.slack_notifier import get_slack_notifier
+from gmail_crew_ai.tracing import traced_tool
+
 class SlackNotificationSchema(BaseModel):
     """Schema for SlackNotificationTool input."""
     subject: str = Field(..., description="Email subject")
@@ -18,7 +19,13 @@ class SlackNotificationSchema(BaseModel):
     action_header: Optional[str] = Field(None, description="Custom header for the action section")
 
 class SlackNotificationTool(BaseTool):
-    """Tool to send notifications to Slack."""
+    """
+    Tool to send notifications to Slack.
+
+    Notifications are handed to a background SlackNotifier, which coalesces
+    bursts into digest messages and handles rate limits and retries, so the
+    tool returns as soon as the message is queued.
+    """
     name: str = "slack_notification"
     description: str = "Sends notifications about important emails to Slack"
     args_schema: Type[BaseModel] = SlackNotificationSchema
@@ -32,6 +39,7 @@ class SlackNotificationTool(BaseTool):
         if not self._webhook_url:
             raise ValueError("SLACK_WEBHOOK_URL must be set in the environment.")
 
+    @traced_tool
     def _run(self, subject: str, sender: str, category: str, 
              priority: str, summary: str, action_needed: Optional[str] = None,
              headline: Optional[str] = None, intro: Optional[str] = None,
@@ -91,19 +99,5 @@ class SlackNotificationTool(BaseTool):
         # Add divider
         blocks.append({"type": "divider"})
         
-        # Prepare the payload
-        payload = {
-            "blocks": blocks
-        }
-        
-        # Send the notification
-        try:
-            response = requests.post(
-                self._webhook_url,
-                data=json.dumps(payload),
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            return f"Slack notification sent successfully for email: {subject}"
-        except Exception as e:
-            return f"Error sending Slack notification: {e}" 
\ No newline at end of file
+        get_slack_notifier(self._webhook_url).notify(blocks)
+        return f"Slack notification queued for email: {subject}"
@@ -0,0 +1,172 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from gmail_crew_ai.tools.imap_pool import PooledIMAPSession
+from gmail_crew_ai.tools.imap_utils import parse_list_response, quote_astring
+from gmail_crew_ai.tools.state import state_path
+
+logger = logging.getLogger(__name__)
+
+# RFC 6154 SPECIAL-USE attributes the tools care about
+DRAFTS = "\\Drafts"
+TRASH = "\\Trash"
+ALL_MAIL = "\\All"
+
+# Names to try when the server doesn't flag its special mailboxes
+FALLBACK_NAMES = {
+    DRAFTS: ("[Gmail]/Drafts", "[Google Mail]/Drafts", "Drafts"),
+    TRASH: ("[Gmail]/Trash", "[Google Mail]/Trash", "Trash"),
+    ALL_MAIL: ("[Gmail]/All Mail", "[Google Mail]/All Mail"),
+}
+
+# Re-LIST at least this often even if nothing looks stale
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+
+class MailboxResolver:
+    """
+    Per-account map from SPECIAL-USE role to mailbox name.
+
+    One LIST per account fills every role at once; the result is kept in
+    memory and on disk, together with the UIDVALIDITY each mailbox had when
+    it was last selected. A failed select or a changed UIDVALIDITY means the
+    mailbox was renamed or recreated, so the account is listed again.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: float = DEFAULT_MAX_AGE):
+        self.path = path or state_path("special_use.sqlite")
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._memory: Dict[str, Dict[str, Dict[str, Optional[str]]]] = {}
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS special_use (
+                account TEXT,
+                role TEXT,
+                name TEXT,
+                uidvalidity TEXT,
+                updated_at REAL,
+                PRIMARY KEY (account, role)
+            )"""
+        )
+        self._db.commit()
+
+    def resolve(self, mail: PooledIMAPSession, role: str) -> Optional[str]:
+        """Return the mailbox name for a role, listing the account only if nothing usable is cached."""
+        entry = self._roles(mail).get(role)
+        return entry['name'] if entry else None
+
+    def select(self, mail: PooledIMAPSession, role: str, readonly: bool = False) -> Optional[str]:
+        """
+        Select the mailbox for a role and return its name (None if the account has none).
+
+        If the cached name no longer selects, or selects with a different
+        UIDVALIDITY than last time, the account is listed again once.
+        """
+        for attempt in range(2):
+            name = self.resolve(mail, role)
+            if name is None:
+                return None
+            result, _ = mail.select(quote_astring(name), readonly=readonly)
+            if result == 'OK':
+                cached = self._roles(mail)[role]['uidvalidity']
+                if cached is None or cached == mail.uidvalidity or attempt:
+                    self._remember_uidvalidity(mail.email_address, role, mail.uidvalidity)
+                    return name
+            logger.info("Cached %s mailbox '%s' looks stale, listing mailboxes again...", role, name)
+            self.invalidate(mail.email_address)
+        return None
+
+    def invalidate(self, account: str):
+        """Forget every cached role for an account."""
+        with self._lock:
+            self._memory.pop(account, None)
+            self._db.execute("DELETE FROM special_use WHERE account = ?", (account,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _roles(self, mail: PooledIMAPSession) -> Dict[str, Dict[str, Optional[str]]]:
+        account = mail.email_address
+        with self._lock:
+            roles = self._memory.get(account)
+            if roles is None:
+                roles = self._load(account)
+                if roles is not None:
+                    self._memory[account] = roles
+        if roles is None:
+            roles = self._discover(mail)
+        return roles
+
+    def _load(self, account: str) -> Optional[Dict[str, Dict[str, Optional[str]]]]:
+        rows = self._db.execute(
+            "SELECT role, name, uidvalidity, updated_at FROM special_use WHERE account = ?", (account,)
+        ).fetchall()
+        if not rows or min(row[3] for row in rows) < time.time() - self.max_age:
+            return None
+        return {role: {'name': name, 'uidvalidity': uidvalidity} for role, name, uidvalidity, _ in rows}
+
+    def _discover(self, mail: PooledIMAPSession) -> Dict[str, Dict[str, Optional[str]]]:
+        result, data = mail.list()
+        names = []
+        roles: Dict[str, Dict[str, Optional[str]]] = {}
+        if result == 'OK':
+            for line in data or []:
+                entry = parse_list_response(line) if line else None
+                if not entry:
+                    continue
+                names.append(entry['name'])
+                for flag in entry['flags']:
+                    role = next((r for r in FALLBACK_NAMES if r.lower() == flag.lower()), None)
+                    if role and role not in roles:
+                        roles[role] = {'name': entry['name'], 'uidvalidity': None}
+        for role, fallbacks in FALLBACK_NAMES.items():
+            if role not in roles:
+                name = next((n for n in fallbacks if n in names), None)
+                if name:
+                    roles[role] = {'name': name, 'uidvalidity': None}
+
+        if logger.isEnabledFor(logging.DEBUG):
+            found = ", ".join(f"{role}={entry['name']}" for role, entry in roles.items())
+            logger.debug("Special-use mailboxes: %s", found or 'none found')
+        now = time.time()
+        with self._lock:
+            self._memory[mail.email_address] = roles
+            self._db.execute("DELETE FROM special_use WHERE account = ?", (mail.email_address,))
+            self._db.executemany(
+                "INSERT INTO special_use VALUES (?, ?, ?, ?, ?)",
+                [(mail.email_address, role, v['name'], None, now) for role, v in roles.items()],
+            )
+            self._db.commit()
+        return roles
+
+    def _remember_uidvalidity(self, account: str, role: str, uidvalidity: Optional[str]):
+        with self._lock:
+            entry = self._memory.get(account, {}).get(role)
+            if entry is None or entry['uidvalidity'] == uidvalidity:
+                return
+            entry['uidvalidity'] = uidvalidity
+            self._db.execute(
+                "UPDATE special_use SET uidvalidity = ? WHERE account = ? AND role = ?",
+                (uidvalidity, account, role),
+            )
+            self._db.commit()
+
+
+_resolver: Optional[MailboxResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_mailbox_resolver() -> MailboxResolver:
+    """Return the process-wide special-use mailbox resolver."""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = MailboxResolver()
+    return _resolver
@@ -0,0 +1,12 @@
+import os
+
+
+def state_path(filename: str) -> str:
+    """
+    Return the path of a persisted state file (indexes, checkpoints, caches).
+
+    Files live in GMAIL_CREW_STATE_DIR, which defaults to output/state.
+    """
+    state_dir = os.environ.get("GMAIL_CREW_STATE_DIR", os.path.join("output", "state"))
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, filename)
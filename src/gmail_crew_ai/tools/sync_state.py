@@ -0,0 +1,80 @@
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from gmail_crew_ai.tools.state import state_path
+
+
+class SyncStateStore:
+    """
+    Persisted per-mailbox sync checkpoints: UIDVALIDITY, the last processed
+    UID and the CONDSTORE HIGHESTMODSEQ seen at that point.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or state_path("sync_state.sqlite")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS mailboxes (
+                account TEXT,
+                mailbox TEXT,
+                uidvalidity TEXT,
+                last_uid INTEGER,
+                highestmodseq TEXT,
+                updated_at REAL,
+                PRIMARY KEY (account, mailbox)
+            )"""
+        )
+        self._db.commit()
+
+    def get(self, account: str, mailbox: str = "INBOX") -> Optional[Dict[str, Any]]:
+        """Return the checkpoint for a mailbox, or None if it was never synced."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT uidvalidity, last_uid, highestmodseq, updated_at FROM mailboxes WHERE account = ? AND mailbox = ?",
+                (account, mailbox),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'uidvalidity': row[0],
+            'last_uid': row[1],
+            'highestmodseq': row[2],
+            'updated_at': row[3],
+        }
+
+    def save(self, account: str, mailbox: str, uidvalidity: Optional[str], last_uid: int,
+             highestmodseq: Optional[str] = None):
+        """Record how far a mailbox has been processed."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO mailboxes VALUES (?, ?, ?, ?, ?, ?)",
+                (account, mailbox, uidvalidity, int(last_uid), highestmodseq, time.time()),
+            )
+            self._db.commit()
+
+    def reset(self, account: str, mailbox: str = "INBOX"):
+        """Forget a mailbox checkpoint, e.g. after its UIDVALIDITY changed."""
+        with self._lock:
+            self._db.execute("DELETE FROM mailboxes WHERE account = ? AND mailbox = ?", (account, mailbox))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_store: Optional[SyncStateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_sync_state() -> SyncStateStore:
+    """Return the process-wide sync state store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SyncStateStore()
+    return _store
@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from gmail_crew_ai.tools.state import state_path
+
+
+class ThreadIndex:
+    """
+    Persistent Message-ID -> (UID, thread id, cleaned body) index.
+
+    Thread ancestors are fetched and cleaned once, then served from here for
+    every later email in the batch and for later runs. UIDs are only trusted
+    while the mailbox UIDVALIDITY they were recorded under still matches.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age_days: int = 90):
+        self.path = path or state_path("thread_index.sqlite")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS messages (
+                message_id TEXT PRIMARY KEY,
+                mailbox TEXT,
+                uidvalidity TEXT,
+                uid TEXT,
+                thread_id TEXT,
+                body TEXT,
+                updated_at REAL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_thread ON messages (thread_id)")
+        self._db.execute("DELETE FROM messages WHERE updated_at < ?", (time.time() - max_age_days * 86400,))
+        self._db.commit()
+        # Threads already pulled from the server during the current fetch
+        self._pulled_threads = set()
+
+    def get_bodies(self, message_ids: Iterable[str]) -> Dict[str, str]:
+        """Return cached bodies for whichever of `message_ids` are indexed."""
+        message_ids = [mid for mid in message_ids if mid]
+        if not message_ids:
+            return {}
+        placeholders = ",".join("?" * len(message_ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT message_id, body FROM messages WHERE body IS NOT NULL AND message_id IN ({placeholders})",
+                message_ids,
+            ).fetchall()
+        return dict(rows)
+
+    def known_uids(self, mailbox: str, uidvalidity: Optional[str], uids: Iterable[str]) -> List[str]:
+        """Return which of `uids` are already indexed for this mailbox/UIDVALIDITY."""
+        uids = list(uids)
+        if not uids or uidvalidity is None:
+            return []
+        placeholders = ",".join("?" * len(uids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT uid FROM messages WHERE mailbox = ? AND uidvalidity = ? AND body IS NOT NULL AND uid IN ({placeholders})",
+                [mailbox, str(uidvalidity)] + uids,
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add(self, message_id: str, body: str, mailbox: str = "INBOX", uidvalidity: Optional[str] = None,
+            uid: Optional[str] = None, thread_id: Optional[str] = None):
+        """Record a cleaned message body under its Message-ID."""
+        if not message_id:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (message_id, mailbox, None if uidvalidity is None else str(uidvalidity), uid, thread_id, body, time.time()),
+            )
+            self._db.commit()
+
+    def thread_pulled(self, thread_id: Optional[str]) -> bool:
+        """Whether the whole thread was already pulled during the current fetch."""
+        return thread_id is not None and thread_id in self._pulled_threads
+
+    def mark_thread_pulled(self, thread_id: Optional[str]):
+        if thread_id is not None:
+            self._pulled_threads.add(thread_id)
+
+    def reset_pulled_threads(self):
+        """Start a new fetch: threads may have new replies, so each is pulled again once."""
+        self._pulled_threads.clear()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_index: Optional[ThreadIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_thread_index() -> ThreadIndex:
+    """Return the process-wide thread index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ThreadIndex()
+    return _index
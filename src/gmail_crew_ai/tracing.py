@@ -0,0 +1,272 @@
+import asyncio
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional
+
+from gmail_crew_ai.metrics import IMAP_BYTES, IMAP_COMMANDS, LLM_TOKENS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACE_FILE = "output/trace.jsonl"
+
+
+class _LevelFormatter(logging.Formatter):
+    """Plain messages for INFO, "LEVEL: message" for everything else (as the old prints did)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        if record.levelno == logging.INFO:
+            return message
+        return f"{record.levelname}: {message}"
+
+
+def configure_logging(level: Optional[str] = None):
+    """
+    Send the package's log records to stdout.
+
+    The level comes from LOG_LEVEL (default INFO); DEBUG brings back the
+    detailed per-email and per-step output. Below the configured level the
+    log calls return before formatting anything.
+    """
+    level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+    package_logger = logging.getLogger("gmail_crew_ai")
+    package_logger.setLevel(getattr(logging, level, logging.INFO))
+    if not any(getattr(handler, "_gmail_crew_ai", False) for handler in package_logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(_LevelFormatter("%(message)s"))
+        handler._gmail_crew_ai = True
+        package_logger.addHandler(handler)
+    package_logger.propagate = False
+
+
+class Tracer:
+    """
+    Spans and counters for one process.
+
+    Every finished span is appended to a JSON-lines trace file, folded into
+    per-name totals and observed in the stage latency histogram. Trace lines
+    go through the file's write buffer, which is flushed by write_summary(),
+    close() and at exit, so spans on hot paths never wait on disk. LLM token
+    usage is counted per crew task; `summary_table()` renders both together
+    with the IMAP command counters for the end of a run.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_TRACE_FILE):
+        self.path = path
+        self.run_id = uuid.uuid4().hex[:12]
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.tasks: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._file = None
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict[str, Any]]:
+        """
+        Time the enclosed block as a span.
+
+        Yields the span's attribute dict so the block can add results (counts,
+        sizes) before the span is recorded.
+        """
+        stack = self._stack()
+        span_id = uuid.uuid4().hex[:8]
+        parent = stack[-1] if stack else None
+        stack.append(span_id)
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stack.pop()
+            self.record_span(name, start, time.perf_counter() - started, span_id=span_id, parent=parent, **attrs)
+
+    def record_span(self, name: str, start: float, duration: float, span_id: Optional[str] = None,
+                    parent: Optional[str] = None, **attrs):
+        """Record a span measured elsewhere (e.g. a crew task's start and end times)."""
+        record = {
+            'type': 'span',
+            'run': self.run_id,
+            'id': span_id or uuid.uuid4().hex[:8],
+            'parent': parent,
+            'name': name,
+            'thread': threading.current_thread().name,
+            'start': round(start, 6),
+            'duration_ms': round(duration * 1000, 3),
+        }
+        record.update(attrs)
+        line = json.dumps(record, default=str) if self.path else None
+        with self._lock:
+            totals = self.spans.setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0, 'errors': 0})
+            totals['count'] += 1
+            totals['total'] += duration
+            totals['max'] = max(totals['max'], duration)
+            totals['errors'] += 'error' in attrs
+            self._write(line)
+        STAGE_SECONDS.observe(duration, stage=name)
+
+    def record_tokens(self, task: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+                      cached_prompt_tokens: int = 0, requests: int = 0):
+        with self._lock:
+            usage = self.tasks.setdefault(task, {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                                 'cached_prompt_tokens': 0})
+            usage['requests'] += requests
+            usage['prompt_tokens'] += prompt_tokens
+            usage['completion_tokens'] += completion_tokens
+            usage['cached_prompt_tokens'] += cached_prompt_tokens
+        LLM_TOKENS.inc(prompt_tokens, task=task, kind="prompt")
+        LLM_TOKENS.inc(completion_tokens, task=task, kind="completion")
+
+    def summary(self) -> Dict[str, Any]:
+        imap = {command: {'commands': count, 'bytes_sent': 0, 'bytes_received': 0}
+                for (command,), count in IMAP_COMMANDS.collect().items()}
+        for (command, direction), count in IMAP_BYTES.collect().items():
+            imap.setdefault(command, {'commands': 0, 'bytes_sent': 0, 'bytes_received': 0})[f"bytes_{direction}"] = count
+        with self._lock:
+            return {
+                'type': 'summary',
+                'run': self.run_id,
+                'spans': {name: {key: round(value, 6) for key, value in totals.items()}
+                          for name, totals in self.spans.items()},
+                'imap': imap,
+                'tokens': {task: dict(usage) for task, usage in self.tasks.items()},
+            }
+
+    def summary_table(self) -> str:
+        """Per-stage timings, IMAP traffic per command and LLM tokens per task as text tables."""
+        summary = self.summary()
+        lines = [f"{'stage':<32} {'count':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9}"]
+        for name, totals in sorted(summary['spans'].items(), key=lambda item: -item[1]['total']):
+            mean = totals['total'] / totals['count'] * 1000 if totals['count'] else 0.0
+            errors = f"  ({totals['errors']} failed)" if totals['errors'] else ""
+            lines.append(f"{name:<32} {totals['count']:>6} {totals['total']:>9.3f} {mean:>9.1f} "
+                         f"{totals['max'] * 1000:>9.1f}{errors}")
+
+        if summary['imap']:
+            lines += ["", f"{'IMAP command':<32} {'count':>6} {'KB sent':>9} {'KB recv':>9}"]
+            for command, counts in sorted(summary['imap'].items(), key=lambda item: -item[1]['bytes_received']):
+                lines.append(f"{command:<32} {counts['commands']:>6} {counts['bytes_sent'] / 1024:>9.1f} "
+                             f"{counts['bytes_received'] / 1024:>9.1f}")
+
+        if summary['tokens']:
+            lines += ["", f"{'task':<32} {'calls':>6} {'prompt':>9} {'complete':>9} {'cached':>9}"]
+            for task, usage in summary['tokens'].items():
+                lines.append(f"{task:<32} {usage['requests']:>6} {usage['prompt_tokens']:>9} "
+                             f"{usage['completion_tokens']:>9} {usage['cached_prompt_tokens']:>9}")
+        return "\n".join(lines)
+
+    def write_summary(self):
+        """Append the run's totals to the trace file as a final "summary" record."""
+        line = json.dumps(self.summary(), default=str)
+        with self._lock:
+            self._write(line)
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _stack(self) -> List[str]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _write(self, line: Optional[str]):
+        if not self.path or line is None:
+            return
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+        except OSError as e:
+            logger.warning("Could not write trace file %s: %s", self.path, e)
+            self.path = None
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Return the process-wide tracer, or None unless tracing is turned on with TRACE_ENABLED=1."""
+    global _tracer
+    if os.environ.get("TRACE_ENABLED", "0") != "1":
+        return None
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer(os.environ.get("TRACE_FILE", DEFAULT_TRACE_FILE) or None)
+                atexit.register(_tracer.close)
+    return _tracer
+
+
+def span(name: str, **attrs):
+    """Span on the process-wide tracer; a no-op context (yielding a plain dict) when tracing is off."""
+    tracer = get_tracer()
+    if tracer is None:
+        return nullcontext(attrs)
+    return tracer.span(name, **attrs)
+
+
+def traced_tool(run):
+    """Decorator for a tool's `_run` (or async `_arun`): each call becomes a "tool.<name>" span."""
+    if asyncio.iscoroutinefunction(run):
+        @functools.wraps(run)
+        async def async_wrapper(self, *args, **kwargs):
+            with span(f"tool.{self.name}"):
+                return await run(self, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        with span(f"tool.{self.name}"):
+            return run(self, *args, **kwargs)
+    return wrapper
+
+
+def instrument_imap(mail):
+    """
+    Count commands and bytes on an imaplib connection, per command type.
+
+    Wraps the connection's own `_command`, `send`, `read` and `readline`, so
+    bytes received are charged to the command most recently sent. UID
+    commands are reported as "UID FETCH", "UID STORE" and so on.
+    """
+    current = ["CONNECT"]
+    command, send, read, readline = mail._command, mail.send, mail.read, mail.readline
+
+    def _command(name, *args):
+        current[0] = f"UID {str(args[0]).upper()}" if name == "UID" and args else name
+        IMAP_COMMANDS.inc(command=current[0])
+        return command(name, *args)
+
+    def _send(data):
+        IMAP_BYTES.inc(len(data), command=current[0], direction="sent")
+        return send(data)
+
+    def _read(size):
+        data = read(size)
+        IMAP_BYTES.inc(len(data), command=current[0], direction="received")
+        return data
+
+    def _readline():
+        data = readline()
+        IMAP_BYTES.inc(len(data), command=current[0], direction="received")
+        return data
+
+    mail._command, mail.send, mail.read, mail.readline = _command, _send, _read, _readline
+    return mail
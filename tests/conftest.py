@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+# Read when the crew module is imported
+os.environ.setdefault("EMAIL_ADDRESS", "me@example.com")
+os.environ.setdefault("APP_PASSWORD", "app-password")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("SLACK_WEBHOOK_URL", "http://127.0.0.1:9/hook")
+
+from fake_imap import FakeGmail, build_corpus
+from stub_llm import StubLLM
+
+from gmail_crew_ai import llm_cache
+from gmail_crew_ai.tools import gmail_tools, imap_pool, special_use, sync_state, thread_index
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """A fresh state directory and fresh process-wide stores for every test."""
+    path = tmp_path / "state"
+    monkeypatch.setenv("GMAIL_CREW_STATE_DIR", str(path))
+    monkeypatch.delenv("IMAP_BACKEND", raising=False)
+    monkeypatch.delenv("LLM_CACHE_ENABLED", raising=False)
+    monkeypatch.setattr(sync_state, "_store", None)
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(special_use, "_resolver", None)
+    monkeypatch.setattr(thread_index, "_index", None)
+    monkeypatch.setattr(imap_pool, "_pool", None)
+    monkeypatch.setattr(gmail_tools, "_known_labels", {})
+    yield path
+    if imap_pool._pool is not None:
+        imap_pool._pool.close_all()
+
+
+@pytest.fixture
+def gmail():
+    """A FakeGmail with a small mixed inbox, installed for the duration of the test."""
+    server = FakeGmail(build_corpus(count=12, thread_depth=1, seed=3))
+    with server.install():
+        yield server
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    """Route the crew's LLM to a deterministic offline stub."""
+    from gmail_crew_ai.crew import GmailCrewAi
+
+    llm = StubLLM()
+    monkeypatch.setattr(GmailCrewAi, "llm", llm)
+    return llm
+
+
+@pytest.fixture
+def crew_inputs(tmp_path):
+    """Inputs for collect_emails that keep every email for the crew."""
+    return {
+        'email_limit': 50,
+        'rule_preclassify': False,
+        'rule_actions': False,
+        'output_dir': str(tmp_path / "output"),
+    }
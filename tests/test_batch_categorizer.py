@@ -0,0 +1,98 @@
+import json
+import os
+
+import yaml
+from stub_llm import StubLLM
+
+from gmail_crew_ai.batch_categorizer import RESULT_FIELDS, BatchCategorizer, categorization_rules
+from gmail_crew_ai.llm_cache import CONFIG_DIR
+from gmail_crew_ai.models import SimpleCategorizedEmail
+
+
+class RecordingLLM:
+    """Answers like the offline stub and keeps every prompt it was sent."""
+
+    def __init__(self, answer=None):
+        self.stub = StubLLM()
+        self.answer = answer
+        self.prompts = []
+
+    def call(self, messages):
+        self.prompts.append(messages)
+        return self.answer(messages) if self.answer else self.stub.call(messages)
+
+
+def _rules() -> str:
+    with open(os.path.join(CONFIG_DIR, "tasks.yaml")) as f:
+        return categorization_rules(yaml.safe_load(f)['categorization_task']['description'])
+
+
+def _emails(count: int):
+    return [{
+        'email_id': str(uid),
+        'subject': f"Lunch on day {uid}?",
+        'sender': f"Friend {uid} <friend{uid}@example.com>",
+        'date': "2026-10-01",
+        'age_days': 17,
+        'body': f"Are you free for lunch on day {uid}?",
+        'thread_info': {'thread_size': 1},
+    } for uid in range(1, count + 1)]
+
+
+def test_rules_drop_the_inlined_emails_and_the_single_object_format():
+    rules = _rules()
+
+    assert "{emails_json}" not in rules
+    assert "Here are the fetched emails" not in rules
+    assert "IMPORTANT FORMAT INSTRUCTIONS" not in rules
+    assert "Category (choose one)" in rules
+    assert "Priority (choose one)" in rules
+
+
+def test_prompt_sends_rules_as_system_and_emails_as_a_json_array():
+    llm = RecordingLLM()
+    categorizer = BatchCategorizer(llm, _rules())
+    categorizer.categorize(_emails(3))
+
+    [(system, user)] = llm.prompts
+    assert system['role'] == "system" and user['role'] == "user"
+    assert system['content'].startswith(_rules())
+    assert "You will receive 3 emails as a JSON array" in system['content']
+    assert ", ".join(RESULT_FIELDS) in system['content']
+    assert "{emails_json}" not in system['content'] + user['content']
+
+    sent = json.loads(user['content'])
+    assert [email['email_id'] for email in sent] == ["1", "2", "3"]
+    assert set(sent[0]) == {"email_id", "subject", "sender", "date", "age_days", "body"}
+    assert sent[0]['body'] == "Are you free for lunch on day 1?"
+
+
+def test_batches_respect_the_email_cap():
+    llm = RecordingLLM()
+    results = BatchCategorizer(llm, _rules(), max_batch=2).categorize(_emails(5))
+
+    assert [len(json.loads(prompt[1]['content'])) for prompt in llm.prompts] == [2, 2, 1]
+    assert sorted(results) == ["1", "2", "3", "4", "5"]
+
+
+def test_malformed_batch_answers_are_retried_one_email_at_a_time():
+    def answer(messages):
+        sent = json.loads(messages[1]['content'])
+        return "not json" if len(sent) > 1 else StubLLM().call(messages)
+
+    llm = RecordingLLM(answer)
+    results = BatchCategorizer(llm, _rules()).categorize(_emails(3))
+
+    assert len(llm.prompts) == 4
+    assert sorted(results) == ["1", "2", "3"]
+
+
+def test_known_emails_are_passed_through_without_a_call():
+    known = {"2": SimpleCategorizedEmail(email_id="2", category="PERSONAL", priority="MEDIUM", required_action="REPLY")}
+    llm = RecordingLLM()
+    pairs = list(BatchCategorizer(llm, _rules()).categorize_iter(_emails(3), known=known))
+
+    sent = [email['email_id'] for prompt in llm.prompts for email in json.loads(prompt[1]['content'])]
+    assert sent == ["1", "3"]
+    assert sorted(email['email_id'] for email, _ in pairs) == ["1", "2", "3"]
+    assert dict((email['email_id'], result) for email, result in pairs)["2"] is known["2"]
@@ -0,0 +1,67 @@
+from gmail_crew_ai.crew import GmailCrewAi
+from gmail_crew_ai.llm_cache import get_llm_cache
+from gmail_crew_ai.models import SimpleCategorizedEmail
+
+
+def _cache_verdicts(crew: GmailCrewAi, priorities):
+    """Store a categorization for each {email_id: priority} under that email's content key."""
+    cache = get_llm_cache()
+    for email_id, priority in priorities.items():
+        cache.put_model("categorization", crew._email_cache_keys[email_id], SimpleCategorizedEmail(
+            email_id=email_id,
+            category="NEWSLETTERS" if priority == "LOW" else "PERSONAL",
+            priority=priority,
+            required_action="IGNORE" if priority == "LOW" else "REPLY",
+        ))
+
+
+def test_cache_misses_on_the_first_run(gmail, stub_llm, crew_inputs):
+    crew = GmailCrewAi()
+    emails = crew.collect_emails(dict(crew_inputs, incremental_sync=False))
+
+    assert emails
+    assert crew.cached_categorizations() == {}
+    assert set(crew._email_cache_keys) == {email['email_id'] for email in emails}
+
+
+def test_cache_hits_by_priority(gmail, stub_llm, crew_inputs):
+    inputs = dict(crew_inputs, incremental_sync=False)
+    first = GmailCrewAi()
+    ids = [email['email_id'] for email in first.collect_emails(inputs)]
+    low, medium, high = ids[:3]
+    _cache_verdicts(first, {low: "LOW", medium: "MEDIUM", high: "HIGH"})
+
+    second = GmailCrewAi()
+    remaining = [email['email_id'] for email in second.collect_emails(inputs)]
+    cached = second.cached_categorizations()
+
+    # Low priority is settled by the cache alone; the others still go to the crew for drafts
+    assert low not in remaining
+    assert medium in remaining and high in remaining
+    assert set(cached) == {medium, high}
+    assert cached[medium].priority == "MEDIUM" and cached[high].priority == "HIGH"
+    assert cached[high].email_id == high
+
+
+def test_batch_mode_sends_only_uncached_emails_to_the_llm(gmail, stub_llm, crew_inputs):
+    inputs = dict(crew_inputs, incremental_sync=False, batch_categorization=True)
+    first = GmailCrewAi()
+    ids = [email['email_id'] for email in first.collect_emails(inputs)]
+    assert stub_llm.calls > 0
+    _cache_verdicts(first, {email_id: "MEDIUM" for email_id in ids})
+
+    stub_llm.calls = 0
+    second = GmailCrewAi()
+    emails = second.collect_emails(inputs)
+
+    assert stub_llm.calls == 0
+    assert sorted(second.categorize_emails(emails, inputs)) == sorted(ids)
+
+
+def test_disabled_cache_is_never_consulted(gmail, stub_llm, crew_inputs, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    crew = GmailCrewAi()
+    crew.collect_emails(dict(crew_inputs, incremental_sync=False))
+
+    assert get_llm_cache() is None
+    assert crew.cached_categorizations() == {}
@@ -0,0 +1,64 @@
+import imaplib
+
+import pytest
+
+from gmail_crew_ai.crew import GmailCrewAi
+from gmail_crew_ai.tools.sync_state import get_sync_state
+
+
+def _refuse(monkeypatch, command: str, section: str = ""):
+    """Make every UID <command> whose last argument mentions `section` come back NO."""
+    original = imaplib.IMAP4.uid
+
+    def uid(self, cmd, *args):
+        if cmd.upper() == command and section in str(args[-1]) and "HEADER" not in str(args[-1]):
+            return "NO", [b"[UNAVAILABLE] Temporary failure"]
+        return original(self, cmd, *args)
+
+    monkeypatch.setattr(imaplib.IMAP4, "uid", uid)
+
+
+def _checkpoint():
+    return get_sync_state().get("me@example.com", "INBOX")
+
+
+def test_checkpoint_advances_when_the_inbox_is_drained(gmail, stub_llm, crew_inputs):
+    crew = GmailCrewAi()
+    emails = crew.collect_emails(crew_inputs)
+    crew.save_sync_checkpoint(None)
+
+    assert emails and not crew._fetch_failed and crew._sync_drained
+    assert _checkpoint()['last_uid'] == max(gmail.messages)
+
+
+def test_second_run_only_sees_new_mail(gmail, stub_llm, crew_inputs):
+    first = GmailCrewAi()
+    first.collect_emails(crew_inputs)
+    first.save_sync_checkpoint(None)
+
+    second = GmailCrewAi()
+    assert second.collect_emails(crew_inputs) == []
+    assert second._sync_plan['unchanged']
+
+
+@pytest.mark.parametrize("two_phase", [True, False])
+def test_failed_search_keeps_the_checkpoint(gmail, stub_llm, crew_inputs, monkeypatch, two_phase):
+    _refuse(monkeypatch, "SEARCH")
+    crew = GmailCrewAi()
+    emails = crew.collect_emails(dict(crew_inputs, two_phase_fetch=two_phase))
+    crew.save_sync_checkpoint(None)
+
+    assert emails == []
+    assert crew._fetch_failed and not crew._sync_drained
+    assert _checkpoint() is None
+
+
+@pytest.mark.parametrize("two_phase", [True, False])
+def test_failed_body_fetch_keeps_the_checkpoint(gmail, stub_llm, crew_inputs, monkeypatch, two_phase):
+    _refuse(monkeypatch, "FETCH", section="BODY")
+    crew = GmailCrewAi()
+    crew.collect_emails(dict(crew_inputs, two_phase_fetch=two_phase, fetch_batch_size=3))
+    crew.save_sync_checkpoint(None)
+
+    assert crew._fetch_failed and not crew._sync_drained
+    assert _checkpoint() is None